@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.responses import JSONResponse
 from app.core.dependencies import get_current_user
 from app.models.user import User
 from app.schemas.user import AccessToken, LoginRequest, UserCreate, UserResponse
 from app.services.user import get_user_by_email, create_user
 from app.core.security import create_access_token
+from app.services.http_cache import ME, response_cache
 from app.core.deps import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/login", response_model=AccessToken)
@@ -62,17 +65,18 @@ async def register(
         if not new_user:
             raise HTTPException(status_code=404, detail="User not registered")
         return new_user 
-    except Exception as e:
-        print(f"Error creating user: {e}")
+    except Exception:
+        logger.exception("Error creating user")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
     
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_data(   
+    request: Request,
     db: AsyncSession = Depends(get_db), 
     current_user: User = Depends(get_current_user),
 ):
-    try:
+    async def build():
         return UserResponse(
             id=current_user.id,
             name_complete=current_user.name_complete,
@@ -81,9 +85,12 @@ async def get_current_user_data(
             active=current_user.active,
             created_at=current_user.created_at,
             updated_at=current_user.updated_at,
-        )
-    except Exception as e:
-        print(f"Error fetching current user: {e}")
+        ), {}
+
+    try:
+        return await response_cache.respond(request, current_user.id, ME, build)
+    except Exception:
+        logger.exception("Error fetching current user")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
 
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+import pytz
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from app.core.config import settings
 from app.core.deps import get_db
 from app.core.dependencies import get_current_user
 from app.models.user import User
-from app.models.logger import Logger
-from app.schemas.logger import LoggerResponse
+from app.models.logger import LogDailySummary, Logger
+from app.schemas.logger import LogSummaryResponse, LoggerResponse
+from app.services.audit import audit_status, run_audit_maintenance
+from app.services.pagination import InvalidCursor, keyset_page
 
 
 router = APIRouter()    
@@ -14,18 +19,21 @@ router = APIRouter()
 @router.get("/all", response_model=list[LoggerResponse])
 async def list_logger(
     request: Request,
+    response: Response,
+    limit: int = Query(default=settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(default=None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.role in ["Admin", "User"]:
-        query = (
-            select(Logger)
-            .options(
-                joinedload(Logger.user)
-            )
-        )
-        result = await db.execute(query)
-        loggers = result.unique().scalars().all()
+        # Solo columnas del log: sin join ni descifrado de usuarios
+        query = select(Logger.id, Logger.user_id, Logger.action, Logger.created_at)
+        try:
+            loggers, next_cursor = await keyset_page(db, query, Logger.created_at, Logger.id, limit, cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
 
         loggers_response = [
             LoggerResponse(
@@ -40,3 +48,44 @@ async def list_logger(
         return loggers_response
     else:
         raise HTTPException(status_code=403, detail="No tienes permisos para acceder a este recurso")
+
+
+@router.get("/summary", response_model=list[LogSummaryResponse])
+async def logs_summary(
+    days: int = Query(default=30, ge=1, le=366),
+    user_id: Optional[str] = Query(default=None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Actividad diaria desde la tabla agregada: nunca recorre `logs`.
+    # Un usuario normal solo ve la suya.
+    if current_user.role not in ["Admin", "User"]:
+        raise HTTPException(status_code=403, detail="No tienes permisos para acceder a este recurso")
+    if current_user.role != "Admin":
+        user_id = current_user.id
+
+    since = datetime.now(pytz.utc).date() - timedelta(days=days - 1)
+    query = select(LogDailySummary).where(LogDailySummary.day >= since)
+    if user_id is not None:
+        query = query.where(LogDailySummary.user_id == user_id)
+    result = await db.execute(query.order_by(LogDailySummary.day.desc(), LogDailySummary.action_type))
+    return result.scalars().all()
+
+
+@router.post("/admin/maintenance")
+async def logs_maintenance(
+    current_user: User = Depends(get_current_user)
+):
+    # Crea particiones, recalcula el resumen reciente y aplica la retención
+    if current_user.role not in ["Admin"]:
+        raise HTTPException(status_code=403, detail="No tienes permisos para acceder a este recurso")
+    return await run_audit_maintenance()
+
+
+@router.get("/admin/maintenance")
+async def logs_maintenance_status(
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin"]:
+        raise HTTPException(status_code=403, detail="No tienes permisos para acceder a este recurso")
+    return audit_status
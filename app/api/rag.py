@@ -1,7 +1,10 @@
 import aiofiles
 import os
+import time
+from typing import List, Optional
 from nanoid import generate
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, status
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse
 from nanoid import generate
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -9,18 +12,46 @@ from sqlalchemy.future import select
 # Importar modelos y schemas
 from app.models import Document, User
 from app.models.rag import History
-from app.schemas.rag import DocumentResponse, HistoryResponse, QueryRequest
+from app.schemas.rag import (
+    BulkUploadResponse,
+    DocumentResponse,
+    HistoryResponse,
+    QueryBatchRequest,
+    QueryRequest,
+    UploadSessionCreate,
+    UploadSessionResponse
+)
 
 # Importar dependencias para la base de datos y autenticación
 from app.core.deps import get_db
-from app.core.dependencies import get_current_user
+from app.core.dependencies import admission_control, admitted, get_current_user
+from app.core.config import settings
 
 # Importar funciones del servicio RAG (basado en SentenceTransformers local)
+from app.services.ingest import run_bulk_ingestion
+from app.services.uploads import (
+    UploadSessionError,
+    append_range,
+    create_upload_session,
+    delete_upload_session,
+    finalize_upload_session,
+    get_upload_session,
+    session_view
+)
 from app.services.rag import (
-    extract_text_from_pdf,
+    ingest_pdf,
     process_query,
-    store_embedding
+    process_query_batch
 )
+from app.services.reindex import IndexRebuildError, rebuild_status, start_index_rebuild
+from app.services.embedding_migration import migration_status, start_embedding_migration
+from app.services.dedup import dedup_stats
+from app.services.resilience import DependencyUnavailable, breakers
+from app.services.admission import policies, query_policy
+from app.services.pagination import InvalidCursor, keyset_page
+from app.services.http_cache import DOCUMENTS, HISTORY, response_cache
+from app.services.request_trace import profiles, request_trace
+from app.services.traffic_capture import capture_fields
 
 router = APIRouter()
 
@@ -36,6 +67,7 @@ internalServer_exception = HTTPException(
 
 @router.post("/upload-document", response_model=DocumentResponse)
 async def upload_document(
+    request: Request,
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -45,51 +77,216 @@ async def upload_document(
             raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")        
         if file.content_type != "application/pdf":
             raise HTTPException(status_code=400, detail="El archivo debe ser un PDF.")        
-        content = await file.read()       
-        
-        temp_file_path = f"/tmp/{file.filename}"
-        async with aiofiles.open(temp_file_path, "wb") as f:
-            await f.write(content)
-        
-        text = await extract_text_from_pdf(temp_file_path)        
-        doc_id = generate()        
-        document = await store_embedding(db, doc_id, text, file.filename, current_user.id)        
-        os.remove(temp_file_path)
+        async with request_trace(request, "upload-document", current_user) as timings:
+            started = time.perf_counter()
+            content = await file.read()       
+            capture_fields(request, f=len(content))
+            
+            temp_file_path = f"/tmp/{file.filename}"
+            async with aiofiles.open(temp_file_path, "wb") as f:
+                await f.write(content)
+            timings["receive"] = round((time.perf_counter() - started) * 1000, 2)
+            
+            document = await ingest_pdf(db, temp_file_path, file.filename, current_user.id, timings)        
+            os.remove(temp_file_path)
         
         return document
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al procesar el documento: {str(e)}")
 
+@router.post("/upload-documents", response_model=BulkUploadResponse)
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin", "User"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    if len(files) > settings.BULK_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.BULK_MAX_FILES} archivos por petición.")
+    try:
+        return await run_bulk_ingestion(files, current_user.id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al procesar los documentos: {str(e)}")
+
+def upload_session_exception(e: UploadSessionError) -> HTTPException:
+    headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else None
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+
+@router.post("/uploads", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    upload: UploadSessionCreate,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin", "User"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    try:
+        return session_view(create_upload_session(current_user.id, upload.filename, upload.total_size))
+    except UploadSessionError as e:
+        raise upload_session_exception(e)
+
+
+@router.put("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def upload_range(
+    upload_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin", "User"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    # Cuerpo: los bytes indicados en Content-Range (bytes inicio-fin/total)
+    try:
+        return await append_range(
+            upload_id, current_user.id, request.headers.get("content-range"), request.stream()
+        )
+    except UploadSessionError as e:
+        raise upload_session_exception(e)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(
+    upload_id: str,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin", "User"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    try:
+        view = session_view(get_upload_session(upload_id, current_user.id))
+    except UploadSessionError as e:
+        raise upload_session_exception(e)
+    response.headers["Upload-Offset"] = str(view["offset"])
+    return view
+
+
+@router.post("/uploads/{upload_id}/finalize", response_model=DocumentResponse)
+async def finalize_upload(
+    upload_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin", "User"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    try:
+        async with finalize_upload_session(upload_id, current_user.id) as session:
+            try:
+                document = await ingest_pdf(db, session["path"], session["filename"], current_user.id)
+            except Exception as e:
+                # La sesión se conserva: el cliente puede reintentar el finalize
+                raise HTTPException(status_code=500, detail=f"Error al procesar el documento: {str(e)}")
+            delete_upload_session(upload_id)
+    except UploadSessionError as e:
+        raise upload_session_exception(e)
+    return document
+
+def dependency_exception(e: DependencyUnavailable) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Servicio no disponible temporalmente: {e.detail}",
+        headers={"Retry-After": str(int(settings.BREAKER_RESET_SECONDS))},
+    )
+
 @router.post("/query", response_model=str)
 async def query_documents(
     query_req: QueryRequest,  
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    _admission: None = Depends(admission_control(query_policy))
 ):
     if current_user.role not in ["Admin", "User"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")        
 
     query = query_req.query  
-    response = await process_query(query, current_user.id, db)    
+    capture_fields(request, q=len(query))
+    try:
+        async with request_trace(request, "query", current_user) as timings:
+            answer = await process_query(query, current_user.id, db, timings)    
+    except DependencyUnavailable as e:
+        raise dependency_exception(e)
     
-    return response
+    return answer
+
+@router.post("/query/batch", response_model=List[str])
+async def query_documents_batch(
+    batch_req: QueryBatchRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin", "User"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    if not batch_req.queries:
+        raise HTTPException(status_code=400, detail="Debe enviar al menos una consulta.")
+    if len(batch_req.queries) > settings.QUERY_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.QUERY_BATCH_MAX_QUERIES} consultas por lote."
+        )
+
+    capture_fields(request, n=len(batch_req.queries), q=sum(len(query) for query in batch_req.queries))
+    # Cada consulta del lote consume un token de la cuota de /query
+    async with admitted(query_policy, current_user.id, len(batch_req.queries)):
+        try:
+            return await process_query_batch(batch_req.queries, current_user.id, db)
+        except DependencyUnavailable as e:
+            raise dependency_exception(e)
+
+def preview(text: str, full: bool) -> str:
+    limit = settings.HISTORY_PREVIEW_CHARS
+    if full or len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + "…"
+
 
 @router.get("/history", response_model=list[HistoryResponse])
 async def get_history(
+    request: Request,
+    limit: int = Query(default=settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(default=None),
+    full: bool = Query(default=False),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    # Página más reciente primero; la siguiente se pide con el cursor de la
+    # cabecera X-Next-Cursor. Sin `full` los textos se recortan a vistas previas.
+    async def build():
+        rows, next_cursor = await keyset_page(
+            db,
+            select(
+                History.id,
+                History.query_text,
+                History.response_text,
+                History.user_id,
+                History.deleted,
+                History.created_at,
+                History.updated_at,
+            ).where(History.user_id == current_user.id),
+            History.created_at,
+            History.id,
+            limit,
+            cursor,
+        )
+        histories = [
+            HistoryResponse(
+                id=row.id,
+                query_text=preview(row.query_text, full),
+                response_text=preview(row.response_text, full),
+                user_id=row.user_id,
+                deleted=row.deleted,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+            )
+            for row in rows
+        ]
+        return histories, {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
     try:
         if current_user.role not in ["Admin", "User"]:
             raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.") 
-        
-        result = await db.execute(
-            select(History)
-            .where(History.user_id == current_user.id)
-            .order_by(History.created_at.desc())
-            )
-        histories = result.scalars().all()
-        return histories
+        return await response_cache.respond(request, current_user.id, HISTORY, build)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener el historial: {str(e)}")
 
@@ -97,14 +294,129 @@ async def get_history(
 
 @router.get("/documents", response_model=list[DocumentResponse])
 async def get_user_documents(
+    request: Request,
+    limit: int = Query(default=settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(default=None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    # Solo las columnas de la respuesta: ni vector_data ni chunk_text
+    async def build():
+        rows, next_cursor = await keyset_page(
+            db,
+            select(
+                Document.id,
+                Document.filename,
+                Document.user_id,
+                Document.upload_date,
+                Document.deleted,
+                Document.created_at,
+                Document.updated_at,
+            ).where(Document.user_id == current_user.id, Document.deleted == False),
+            Document.created_at,
+            Document.id,
+            limit,
+            cursor,
+        )
+        documents = [DocumentResponse.from_orm(row) for row in rows]
+        return documents, {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
     try:
         if current_user.role not in ["Admin", "User"]:
             raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.") 
-        result = await db.execute(select(Document).where(Document.user_id == current_user.id))
-        documents = result.scalars().all()
-        return documents
+        return await response_cache.respond(request, current_user.id, DOCUMENTS, build)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener los documentos: {str(e)}")
+
+
+@router.post("/admin/rebuild-index", status_code=status.HTTP_202_ACCEPTED)
+async def rebuild_index(
+    batch_size: int = Query(default=settings.REINDEX_BATCH_SIZE, ge=1, le=10000),
+    workers: int = Query(default=settings.REINDEX_WORKERS, ge=1, le=32),
+    keep_old: bool = Query(default=False),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    try:
+        return start_index_rebuild(batch_size, workers, keep_old)
+    except IndexRebuildError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/admin/rebuild-index")
+async def get_rebuild_status(
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    return rebuild_status
+
+
+@router.post("/admin/embedding-migration", status_code=status.HTTP_202_ACCEPTED)
+async def start_migration(
+    target_version: str = Query(...),
+    batch_size: int = Query(default=settings.EMBEDDING_MIGRATION_BATCH_SIZE, ge=1, le=4096),
+    pause_seconds: float = Query(default=settings.EMBEDDING_MIGRATION_PAUSE_SECONDS, ge=0),
+    keep_old: bool = Query(default=False),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    try:
+        return start_embedding_migration(target_version, batch_size, pause_seconds, keep_old)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IndexRebuildError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/admin/embedding-migration")
+async def get_migration_status(
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    return migration_status
+
+
+@router.get("/admin/dedup-stats")
+async def get_dedup_stats(
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    return {"mode": settings.DEDUP_MODE, **dedup_stats}
+
+
+@router.get("/admin/breakers")
+async def get_breakers(
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+
+@router.get("/admin/admission")
+async def get_admission_status(
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["Admin"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    return {name: policy.snapshot() for name, policy in policies.items()}
+
+
+@router.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(
+    profile_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    # Pilas en formato "collapsed": flamegraph.pl, speedscope, inferno...
+    if current_user.role not in ["Admin"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar esta acción.")
+    if profile_id not in profiles:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado.")
+    return PlainTextResponse(profiles[profile_id])
@@ -1,8 +1,8 @@
+import logging
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from app.models.user import User
 from app.schemas.user import UserResponse, UserUpdate
 from app.services.user import (
@@ -10,12 +10,14 @@ from app.services.user import (
     get_users, 
     update_user, 
     deactivate_user, 
-    activate_user
+    activate_user,
+    filter_users
 ) 
 from app.core.deps import get_db
 from app.core.dependencies import get_current_user
 
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 permission_exception = HTTPException(
@@ -43,8 +45,8 @@ async def read_users(
             return users
         else:
             raise permission_exception
-    except Exception as e:
-        print(f"Error listing all users: {e}")
+    except Exception:
+        logger.exception("Error listing all users")
         raise internalServer_exception
 
 
@@ -63,8 +65,8 @@ async def read_user(
             return user
         else:
             raise permission_exception
-    except Exception as e:
-        print(f"Error showing user: {e}")
+    except Exception:
+        logger.exception("Error showing user")
         raise internalServer_exception
 
 
@@ -83,8 +85,8 @@ async def edit_user(
             return updated_user
         else:
             raise permission_exception
-    except Exception as e:
-        print(f"Error updating user: {e}")
+    except Exception:
+        logger.exception("Error updating user")
         raise internalServer_exception
     
 
@@ -102,8 +104,8 @@ async def delete_user(
             return JSONResponse(content={"status": "ok"}, status_code=status.HTTP_200_OK)
         else:
             raise permission_exception
-    except Exception as e:
-        print(f"Error deactivating user: {e}")
+    except Exception:
+        logger.exception("Error deactivating user")
         raise internalServer_exception
     
 @router.post("/activate/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -120,8 +122,8 @@ async def activat_user(
             return JSONResponse(content={"status": "ok"}, status_code=status.HTTP_200_OK)
         else:
             raise permission_exception
-    except Exception as e:
-        print(f"Error activating user: {e}")
+    except Exception:
+        logger.exception("Error activating user")
         raise internalServer_exception
     
     
@@ -135,63 +137,9 @@ async def filter_list_users(
 ):
     try:
         if current_user.role in ["Admin", "User"]:
-            result = await db.execute(select(User).where(User.active == True))
-            all_users = result.scalars().all()
-
-            users_dict = [{
-                'id': user.id,
-                'name_complete': user.name_complete,
-                'email': user.email,
-            } for user in all_users]
-
-            if search:
-                search_term = search.lower().strip()  # Convertir a minúsculas y eliminar espacios adicionales
-                filtered_users = []
-                
-                for user in users_dict:
-                    name_complete = user['name_complete'].lower()
-                    email = user['email'].lower()
-                                
-                    # Calcular la puntuación de coincidencia
-                    score = 0
-                    # Puntuar si el término de búsqueda está en el nombre completo
-                    if search_term in name_complete:
-                        # Mayor puntuación si el término está al principio del nombre
-                        if name_complete.startswith(search_term):
-                            score += 100
-                        else:
-                            score += 50  # Puntuar menos si está en otra parte del nombre
-                    # Puntuar si el término de búsqueda está en el email
-                    if search_term in email:
-                        # Mayor puntuación si el término está al principio del email
-                        if email.startswith(search_term):
-                            score += 100
-                        else:
-                            score += 50  # Puntuar menos si está en otra parte del email
-                                
-                    if score > 0:
-                        user['score'] = score
-                        filtered_users.append(user)
-                
-                # Ordenar los usuarios filtrados por puntuación (de mayor a menor) y luego por nombre completo
-                filtered_users.sort(key=lambda x: (-x['score'], x['name_complete']))
-            else:
-                # Si no hay término de búsqueda, usar todos los usuarios
-                filtered_users = users_dict
-        
-            # Aplicar paginación a los resultados ya filtrados
-            total_users = len(filtered_users)
-            paginated_users = filtered_users[offset:offset + limit]
-
-            # Retornar el total de usuarios y los usuarios paginados
-            return {
-                "total": total_users,
-                "users": paginated_users,
-                "limit": limit,
-                "offset": offset,
-            }
+            return await filter_users(db, limit=limit, offset=offset, search=search)
         else:
             raise permission_exception
-    except Exception as e:
-        print(f"Error filtering users: {e}")
+    except Exception:
+        logger.exception("Error filtering users")
         raise internalServer_exception
\ No newline at end of file
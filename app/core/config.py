@@ -1,3 +1,4 @@
+import logging
 import os
 from sqlalchemy.engine.url import URL
 from dotenv import load_dotenv
@@ -21,9 +22,146 @@ class Settings:
     DB_SECRET_KEY: str = os.getenv("DB_SECRET_KEY")
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY")
     
+    # LOG CONFIG (nivel y formato: json | text)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    
+    # TRAZAS CONFIG (Server-Timing, log de peticiones lentas y perfiles por muestreo;
+    # 0 ms = sin log de peticiones lentas; sin fichero = solo en stdout)
+    SLOW_REQUEST_MS: float = float(os.getenv("SLOW_REQUEST_MS", 2000))
+    SLOW_REQUEST_LOG_FILE: str = os.getenv("SLOW_REQUEST_LOG_FILE", "")
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5))
+    PROFILE_MAX_STORED: int = int(os.getenv("PROFILE_MAX_STORED", 20))
+    
+    # CAPTURA DE TRÁFICO CONFIG (sin fichero = desactivada; forma anónima de las
+    # peticiones para benchmarks/replay_traffic.py)
+    TRAFFIC_CAPTURE_FILE: str = os.getenv("TRAFFIC_CAPTURE_FILE", "")
+    TRAFFIC_CAPTURE_SAMPLE_RATE: float = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", 1.0))
+    TRAFFIC_CAPTURE_USER_BUCKETS: int = int(os.getenv("TRAFFIC_CAPTURE_USER_BUCKETS", 64))
+    
+    # AUTH CACHE CONFIG (usuarios autenticados en memoria; 0 segundos = sin caché)
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 30))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+    
+    # USER SEARCH CONFIG (índice en memoria de /users/filter; reconstrucción periódica)
+    USER_SEARCH_REFRESH_SECONDS: float = float(os.getenv("USER_SEARCH_REFRESH_SECONDS", 300))
+    
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")    
+    # Sin valor se usa la API pública de Groq (los benchmarks apuntan a un servidor falso)
+    GROQ_BASE_URL: str = os.getenv("GROQ_BASE_URL")
     QDRANT_URL: str = os.getenv("QDRANT_URL")
     
+    # EMBEDDINGS CONFIG (versión por defecto cuando aún no existe el alias en Qdrant)
+    EMBEDDING_MODEL_VERSION: str = os.getenv("EMBEDDING_MODEL_VERSION", "minilm-l6-v2")
+    EMBEDDING_VERSION_REFRESH_SECONDS: int = int(os.getenv("EMBEDDING_VERSION_REFRESH_SECONDS", 10))
+    EMBEDDING_MIGRATION_BATCH_SIZE: int = int(os.getenv("EMBEDDING_MIGRATION_BATCH_SIZE", 128))
+    EMBEDDING_MIGRATION_PAUSE_SECONDS: float = float(os.getenv("EMBEDDING_MIGRATION_PAUSE_SECONDS", 0.5))
+    
+    # RECUPERACIÓN CONFIG (chunks en caracteres; cambiar tamaño o solapamiento cambia
+    # los hashes y la siguiente ingesta de cada documento lo re-embebe entero;
+    # 0 de hnsw_ef = valor por defecto de la colección). Ver benchmarks/bench_retrieval.py
+    CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", 1000))
+    CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", 200))
+    RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", 3))
+    QDRANT_SEARCH_HNSW_EF: int = int(os.getenv("QDRANT_SEARCH_HNSW_EF", 0))
+    
+    # INGESTA CONFIG
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", 32))
+    # Planificador de embeddings: consultas antes que ingesta; los lotes de
+    # ingesta se ajustan para durar ~EMBED_BULK_TARGET_MS
+    EMBED_BULK_TARGET_MS: float = float(os.getenv("EMBED_BULK_TARGET_MS", 50))
+    EMBED_BULK_MIN_BATCH: int = int(os.getenv("EMBED_BULK_MIN_BATCH", 4))
+    EMBED_BULK_MAX_BATCH: int = int(os.getenv("EMBED_BULK_MAX_BATCH", 256))
+    EMBED_INTERACTIVE_MAX_BATCH: int = int(os.getenv("EMBED_INTERACTIVE_MAX_BATCH", 64))
+    QDRANT_UPSERT_BATCH_SIZE: int = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", 256))
+    
+    # INGESTA MASIVA CONFIG
+    BULK_MAX_FILES: int = int(os.getenv("BULK_MAX_FILES", 1000))
+    BULK_QUEUE_SIZE: int = int(os.getenv("BULK_QUEUE_SIZE", 4))
+    BULK_EXTRACT_WORKERS: int = int(os.getenv("BULK_EXTRACT_WORKERS", 2))
+    
+    # SUBIDAS REANUDABLES CONFIG
+    UPLOAD_SPOOL_DIR: str = os.getenv("UPLOAD_SPOOL_DIR", "/tmp/rag_uploads")
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", 2 * 1024 ** 3))
+    UPLOAD_SESSION_TTL_HOURS: int = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", 24))
+    
+    # CONSULTAS EN LOTE CONFIG
+    QUERY_BATCH_MAX_QUERIES: int = int(os.getenv("QUERY_BATCH_MAX_QUERIES", 100))
+    QUERY_BATCH_LLM_CONCURRENCY: int = int(os.getenv("QUERY_BATCH_LLM_CONCURRENCY", 8))
+    
+    # PAGINACIÓN CONFIG (listados por cursor; longitud de las vistas previas del historial)
+    PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", 50))
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", 500))
+    HISTORY_PREVIEW_CHARS: int = int(os.getenv("HISTORY_PREVIEW_CHARS", 200))
+    
+    # HTTP CACHE CONFIG (ETag/Last-Modified y cuerpos serializados de los listados)
+    HTTP_CACHE_VERSION_TTL_SECONDS: float = float(os.getenv("HTTP_CACHE_VERSION_TTL_SECONDS", 30))
+    HTTP_CACHE_MAX_ENTRIES: int = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", 1000))
+    HTTP_CACHE_MAX_BODY_BYTES: int = int(os.getenv("HTTP_CACHE_MAX_BODY_BYTES", 256 * 1024))
+    
+    # PROMPT CONFIG (presupuesto en tokens; codificación de tiktoken para contarlos)
+    PROMPT_MAX_TOKENS: int = int(os.getenv("PROMPT_MAX_TOKENS", 3000))
+    PROMPT_HISTORY_MAX_TOKENS: int = int(os.getenv("PROMPT_HISTORY_MAX_TOKENS", 800))
+    PROMPT_QUESTION_MAX_TOKENS: int = int(os.getenv("PROMPT_QUESTION_MAX_TOKENS", 500))
+    PROMPT_MIN_ITEM_TOKENS: int = int(os.getenv("PROMPT_MIN_ITEM_TOKENS", 50))
+    PROMPT_TOKEN_ENCODING: str = os.getenv("PROMPT_TOKEN_ENCODING", "cl100k_base")
+    
+    # RESILIENCIA CONFIG (plazos, timeouts y circuit breakers de Groq y Qdrant)
+    QUERY_DEADLINE_SECONDS: float = float(os.getenv("QUERY_DEADLINE_SECONDS", 30))
+    QUERY_BATCH_DEADLINE_SECONDS: float = float(os.getenv("QUERY_BATCH_DEADLINE_SECONDS", 120))
+    GROQ_TIMEOUT_SECONDS: float = float(os.getenv("GROQ_TIMEOUT_SECONDS", 20))
+    GROQ_MAX_RETRIES: int = int(os.getenv("GROQ_MAX_RETRIES", 0))
+    QDRANT_TIMEOUT_SECONDS: float = float(os.getenv("QDRANT_TIMEOUT_SECONDS", 5))
+    BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+    BREAKER_RESET_SECONDS: float = float(os.getenv("BREAKER_RESET_SECONDS", 30))
+    # Modos degradados: Qdrant caído -> skip_retrieval | fail; Groq caído -> context_only | fail
+    QDRANT_DEGRADED_MODE: str = os.getenv("QDRANT_DEGRADED_MODE", "skip_retrieval")
+    LLM_DEGRADED_MODE: str = os.getenv("LLM_DEGRADED_MODE", "context_only")
+    
+    # ADMISIÓN CONFIG (token buckets en peticiones/s, concurrencia y colas acotadas)
+    ADMISSION_QUERY_USER_RATE: float = float(os.getenv("ADMISSION_QUERY_USER_RATE", 1))
+    ADMISSION_QUERY_USER_BURST: float = float(os.getenv("ADMISSION_QUERY_USER_BURST", 10))
+    ADMISSION_QUERY_GLOBAL_RATE: float = float(os.getenv("ADMISSION_QUERY_GLOBAL_RATE", 20))
+    ADMISSION_QUERY_GLOBAL_BURST: float = float(os.getenv("ADMISSION_QUERY_GLOBAL_BURST", 100))
+    ADMISSION_QUERY_USER_CONCURRENCY: int = int(os.getenv("ADMISSION_QUERY_USER_CONCURRENCY", 4))
+    ADMISSION_QUERY_CONCURRENCY: int = int(os.getenv("ADMISSION_QUERY_CONCURRENCY", 32))
+    ADMISSION_QUERY_QUEUE: int = int(os.getenv("ADMISSION_QUERY_QUEUE", 64))
+    ADMISSION_UPLOAD_USER_RATE: float = float(os.getenv("ADMISSION_UPLOAD_USER_RATE", 0.2))
+    ADMISSION_UPLOAD_USER_BURST: float = float(os.getenv("ADMISSION_UPLOAD_USER_BURST", 5))
+    ADMISSION_UPLOAD_GLOBAL_RATE: float = float(os.getenv("ADMISSION_UPLOAD_GLOBAL_RATE", 2))
+    ADMISSION_UPLOAD_GLOBAL_BURST: float = float(os.getenv("ADMISSION_UPLOAD_GLOBAL_BURST", 20))
+    ADMISSION_UPLOAD_USER_CONCURRENCY: int = int(os.getenv("ADMISSION_UPLOAD_USER_CONCURRENCY", 2))
+    ADMISSION_UPLOAD_CONCURRENCY: int = int(os.getenv("ADMISSION_UPLOAD_CONCURRENCY", 4))
+    ADMISSION_UPLOAD_QUEUE: int = int(os.getenv("ADMISSION_UPLOAD_QUEUE", 8))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 10))
+    
+    # AUDITORÍA CONFIG (logs particionados por mes; 0 meses de retención = sin límite,
+    # 0 segundos de intervalo = sin mantenimiento en segundo plano)
+    AUDIT_RETENTION_MONTHS: int = int(os.getenv("AUDIT_RETENTION_MONTHS", 12))
+    AUDIT_PARTITIONS_AHEAD: int = int(os.getenv("AUDIT_PARTITIONS_AHEAD", 2))
+    AUDIT_SUMMARY_LOOKBACK_DAYS: int = int(os.getenv("AUDIT_SUMMARY_LOOKBACK_DAYS", 2))
+    AUDIT_MAINTENANCE_INTERVAL_SECONDS: float = float(os.getenv("AUDIT_MAINTENANCE_INTERVAL_SECONDS", 3600))
+    
+    # PDF CONFIG (motor: pypdf2 | pymupdf | pdfminer; 0 workers = sin pool de procesos)
+    PDF_EXTRACTOR: str = os.getenv("PDF_EXTRACTOR", "pypdf2")
+    PDF_EXTRACT_WORKERS: int = int(os.getenv("PDF_EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+    PDF_PAGE_TIMEOUT_SECONDS: float = float(os.getenv("PDF_PAGE_TIMEOUT_SECONDS", 30))
+    
+    # DEDUP CONFIG (casi-duplicados en la ingesta: off | flag | skip). Con
+    # "skip" un chunk omitido solo existe en el documento original: si ese
+    # documento se edita o se vuelve a subir sin él, desaparece de ambos.
+    DEDUP_MODE: str = os.getenv("DEDUP_MODE", "flag")
+    DEDUP_MAX_HAMMING: int = int(os.getenv("DEDUP_MAX_HAMMING", 3))
+    # Directorio compartido por todos los workers de la instancia (requiere flock)
+    DEDUP_INDEX_DIR: str = os.getenv("DEDUP_INDEX_DIR", "/tmp/rag_dedup")
+    
+    # REINDEX CONFIG (reconstrucción de Qdrant desde Postgres)
+    REINDEX_BATCH_SIZE: int = int(os.getenv("REINDEX_BATCH_SIZE", 512))
+    REINDEX_WORKERS: int = int(os.getenv("REINDEX_WORKERS", 4))
+    # Margen hacia atrás de la pasada de recuperación: cubre filas creadas antes
+    # del inicio de la reconstrucción pero confirmadas después
+    REINDEX_CATCHUP_MARGIN_SECONDS: int = int(os.getenv("REINDEX_CATCHUP_MARGIN_SECONDS", 60))
+    
     # DB GENERAL CONFIG
     DB_POOL_SIZE: int = 15
     DB_MAX_OVERFLOW: int = 0
@@ -46,6 +184,6 @@ class Settings:
         env_file_encoding = "utf-8"
 
 settings = Settings()
-print("----ENV DB Settings----")
-print(f"DB_HOST: {settings.DB_HOST}")
-print(f"DB_PORT: {settings.DB_PORT}")
+logging.getLogger(__name__).debug(
+    "Configuración de base de datos", extra={"db_host": settings.DB_HOST, "db_port": settings.DB_PORT}
+)
@@ -1,3 +1,6 @@
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
@@ -6,7 +9,11 @@ from app.services.user import get_user_by_email
 from app.models.user import User
 from app.core.deps import get_db
 from app.core.config import settings
+from app.services.admission import AdmissionPolicy, AdmissionRejected
+from app.services.auth_cache import principal_cache
+from app.services.traffic_capture import capture_fields, traffic_recorder
 
+logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
 
@@ -20,7 +27,7 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
     # Extraer el token de las cookies
     token = request.cookies.get("access_token")
     if not token:
-        print("No token found in cookies")
+        logger.debug("No token found in cookies")
         raise credentials_exception
 
     try:
@@ -28,17 +35,62 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
         payload = jwt.decode(token.split(" ")[1], settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_email: str = payload.get("sub")
         if not user_email:
-            print("No 'sub' field in payload")
+            logger.info("No 'sub' field in payload")
             raise credentials_exception
 
-        # Obtener el usuario de la base de datos
-        user = await get_user_by_email(db, email=user_email)
-        if not user:
-            print(f"No user found with email: {user_email}")
-            raise credentials_exception
+        # Obtener el usuario de la caché o, si no está, de la base de datos
+        user = principal_cache.get(user_email)
+        if user is None:
+            generation = principal_cache.generation
+            user = await get_user_by_email(db, email=user_email)
+            if not user:
+                logger.info("No user found for token subject", extra={"email": user_email})
+                raise credentials_exception
+            principal_cache.put(user_email, user, generation)
 
     except JWTError as e:
-        print(f"JWTError: {e}")
+        logger.info("Invalid token", extra={"error": str(e)})
         raise credentials_exception
 
-    return user
\ No newline at end of file
+    if traffic_recorder.enabled:
+        capture_fields(request, u=traffic_recorder.user_bucket(user.id))
+    return user
+
+
+def token_subject(token: Optional[str]) -> Optional[str]:
+    # `sub` de la cookie access_token ("Bearer <jwt>") si la firma es válida;
+    # no consulta la base de datos
+    try:
+        return jwt.decode(token.split(" ")[1], settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+    except (AttributeError, IndexError, JWTError):
+        return None
+
+
+def admission_exception(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code,
+        detail=e.detail,
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+@asynccontextmanager
+async def admitted(policy: AdmissionPolicy, user_id: str, cost: float = 1):
+    # Admite o rechaza rápido (429/503) y libera el hueco al terminar
+    try:
+        await policy.acquire(user_id, cost)
+    except AdmissionRejected as e:
+        raise admission_exception(e)
+    try:
+        yield
+    finally:
+        policy.release(user_id)
+
+
+def admission_control(policy: AdmissionPolicy):
+    # Dependencia para las rutas costosas de app/api/rag.py
+    async def dependency(current_user: User = Depends(get_current_user)):
+        async with admitted(policy, current_user.id):
+            yield
+
+    return dependency
@@ -0,0 +1,60 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from app.core.config import settings
+
+# Atributos estándar de LogRecord: el resto llega por `extra` y se emite como campo
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def record_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **record_fields(record),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+# ---------------------------
+# Logging estructurado: un handler en stdout con nivel LOG_LEVEL y formato
+# LOG_FORMAT (json | text). Los módulos usan logging.getLogger(__name__) y
+# pasan los datos como campos (`extra={...}`), no dentro del mensaje. Las
+# peticiones lentas se copian además en SLOW_REQUEST_LOG_FILE, si se indica.
+# ---------------------------
+def setup_logging():
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+    app_logger = logging.getLogger("app")
+    app_logger.handlers[:] = [handler]
+    app_logger.setLevel(settings.LOG_LEVEL.upper())
+    app_logger.propagate = False
+
+    slow_logger = logging.getLogger("app.slow_requests")
+    slow_logger.handlers[:] = []
+    if settings.SLOW_REQUEST_LOG_FILE:
+        file_handler = logging.FileHandler(settings.SLOW_REQUEST_LOG_FILE)
+        file_handler.setFormatter(JsonFormatter())
+        slow_logger.addHandler(file_handler)
@@ -0,0 +1,189 @@
+import re
+import time
+from typing import Optional
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse, RedirectResponse
+from app.core.dependencies import token_subject
+from app.services.admission import AdmissionRejected, upload_policy
+from app.services.metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS
+from app.services.request_trace import trace_headers
+from app.services.traffic_capture import traffic_recorder
+
+
+# ---------------------------
+# Métricas HTTP como middleware ASGI puro (sin BaseHTTPMiddleware: no envuelve
+# el cuerpo de la respuesta). La ruta se etiqueta con el nombre del endpoint
+# que resolvió el router, no con la URL, para no multiplicar las series.
+# ---------------------------
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            endpoint = scope.get("endpoint")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(endpoint, "__name__", "unmatched"),
+                str(status_code),
+            ).observe(time.perf_counter() - started)
+
+
+# ---------------------------
+# Redirige al login las respuestas 401. ASGI puro: solo mira el inicio de la
+# respuesta, sin la tarea y el stream intermedio de BaseHTTPMiddleware, así
+# que las respuestas en streaming pasan sin almacenarse.
+# ---------------------------
+class AuthRedirectMiddleware:
+    def __init__(self, app, login_url: str = "/api/v1/auth/login"):
+        self.app = app
+        self.login_url = login_url
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        redirected = False
+
+        async def send_wrapper(message):
+            nonlocal redirected
+            if message["type"] == "http.response.start" and message["status"] == 401:
+                redirected = True
+                await RedirectResponse(url=self.login_url)(scope, receive, send)
+                return
+            # El cuerpo del 401 original se descarta
+            if not redirected:
+                await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# ---------------------------
+# Admisión de las rutas de ingesta antes de leer el cuerpo: FastAPI procesa
+# todo el multipart antes de ejecutar las dependencias, así que una
+# dependencia solo rechazaría cuando el cliente ya lo ha enviado todo. Clave
+# de usuario: el `sub` del token; sin token válido la petición sigue y la
+# ruta responde 401.
+# ---------------------------
+UPLOAD_ROUTES = re.compile(r"^/api/v1/rags/(upload-document|upload-documents|uploads/[^/]+/finalize)$")
+
+
+class UploadAdmissionMiddleware:
+    def __init__(self, app, policy=upload_policy):
+        self.app = app
+        self.policy = policy
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not UPLOAD_ROUTES.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        subject = token_subject(HTTPConnection(scope).cookies.get("access_token"))
+        if subject is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.policy.acquire(subject)
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                {"detail": e.detail}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.policy.release(subject)
+
+
+# ---------------------------
+# Cabeceras de request_trace (Server-Timing, X-Profile-Id) en la respuesta
+# final, también en las de error generadas por los manejadores de excepciones.
+# ---------------------------
+class TraceHeadersMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                extra = trace_headers(scope)
+                if extra:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        *((name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in extra.items()),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# ---------------------------
+# Captura de tráfico (solo si TRAFFIC_CAPTURE_FILE está definido): escribe
+# la forma de cada petición enrutada, con la plantilla de la ruta.
+# ---------------------------
+class TrafficCaptureMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._templates = None
+
+    def _template(self, scope) -> Optional[str]:
+        if self._templates is None:
+            self._templates = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self._templates.get(scope.get("endpoint"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not traffic_recorder.sampled():
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._template(scope)
+            if route is not None:
+                headers = dict(scope["headers"])
+                entry = {
+                    "t": round(started_at, 3),
+                    "m": scope["method"],
+                    "r": route,
+                    "s": status_code,
+                    "ms": round((time.perf_counter() - started) * 1000, 2),
+                    "in": int(headers.get(b"content-length", 0) or 0),
+                }
+                entry.update(scope.get("state", {}).get("capture", {}))
+                traffic_recorder.record(entry)
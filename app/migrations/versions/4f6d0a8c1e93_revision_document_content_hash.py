@@ -0,0 +1,30 @@
+"""Revision document content hash
+
+Revision ID: 4f6d0a8c1e93
+Revises: c3a9e51f7b24
+Create Date: 2025-03-28 16:05:52.671430
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f6d0a8c1e93'
+down_revision = 'c3a9e51f7b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # content_hash existía desde la migración inicial con un índice único; ahora
+    # es el hash del chunk y puede repetirse entre documentos y usuarios.
+    op.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(200)")
+    op.execute("DROP INDEX IF EXISTS ix_documents_content_hash")
+    op.create_index(op.f('ix_documents_content_hash'), 'documents', ['content_hash'], unique=False)
+    op.create_index('ix_documents_user_id_filename', 'documents', ['user_id', 'filename'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_user_id_filename', table_name='documents')
+    op.drop_index(op.f('ix_documents_content_hash'), table_name='documents')
@@ -0,0 +1,27 @@
+"""Revision document chunk text
+
+Revision ID: 8b1f4c2d9e07
+Revises: 593d6f168aed
+Create Date: 2025-03-20 18:02:11.104332
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1f4c2d9e07'
+down_revision = '593d6f168aed'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # El texto del chunk permite reconstruir Qdrant desde Postgres sin re-embeddings
+    op.add_column('documents', sa.Column('chunk_text', sa.Text(), nullable=True))
+    op.add_column('documents', sa.Column('chunk_index', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('documents', 'chunk_index')
+    op.drop_column('documents', 'chunk_text')
@@ -0,0 +1,38 @@
+"""Revision keyset pagination indexes
+
+Revision ID: 9c2e7a4d5b18
+Revises: 4f6d0a8c1e93
+Create Date: 2025-04-02 10:14:27.530918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2e7a4d5b18'
+down_revision = '4f6d0a8c1e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # El cursor es (created_at, id): un NULL rompería encode_cursor y la
+    # comparación de tuplas saltaría esas filas. Se rellena y pasa a NOT NULL.
+    op.execute("UPDATE documents SET created_at = COALESCE(upload_date, updated_at, now()) WHERE created_at IS NULL")
+    op.execute("UPDATE history SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL")
+    op.alter_column('documents', 'created_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+    op.alter_column('history', 'created_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+    # Índices compuestos para la paginación por cursor en orden (created_at, id)
+    op.create_index('ix_history_user_id_created_at_id', 'history', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_documents_user_id_created_at_id', 'documents', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_logs_created_at_id', 'logs', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_logs_created_at_id', table_name='logs')
+    op.drop_index('ix_documents_user_id_created_at_id', table_name='documents')
+    op.drop_index('ix_history_user_id_created_at_id', table_name='history')
+    op.alter_column('history', 'created_at', existing_type=sa.DateTime(timezone=True), nullable=True)
+    op.alter_column('documents', 'created_at', existing_type=sa.DateTime(timezone=True), nullable=True)
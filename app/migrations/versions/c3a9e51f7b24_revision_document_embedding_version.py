@@ -0,0 +1,33 @@
+"""Revision document embedding version
+
+Revision ID: c3a9e51f7b24
+Revises: 8b1f4c2d9e07
+Create Date: 2025-03-24 11:37:45.218906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9e51f7b24'
+down_revision = '8b1f4c2d9e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('embedding_version', sa.String(length=100), nullable=True))
+    # Todas las filas existentes se generaron con all-MiniLM-L6-v2
+    op.execute("UPDATE documents SET embedding_version = 'minilm-l6-v2'")
+    op.create_index(op.f('ix_documents_embedding_version'), 'documents', ['embedding_version'], unique=False)
+    # vector sin dimensión fija para admitir modelos con otro tamaño. La migración
+    # inicial crea la columna como VARCHAR: el cast necesita USING y pgvector.
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    op.execute("ALTER TABLE documents ALTER COLUMN vector_data TYPE vector USING vector_data::vector")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE documents ALTER COLUMN vector_data TYPE vector(384) USING vector_data::vector(384)")
+    op.drop_index(op.f('ix_documents_embedding_version'), table_name='documents')
+    op.drop_column('documents', 'embedding_version')
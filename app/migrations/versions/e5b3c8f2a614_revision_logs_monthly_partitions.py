@@ -0,0 +1,107 @@
+"""Revision logs monthly partitions
+
+Revision ID: e5b3c8f2a614
+Revises: 9c2e7a4d5b18
+Create Date: 2025-04-07 17:42:09.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b3c8f2a614'
+down_revision = '9c2e7a4d5b18'
+branch_labels = None
+depends_on = None
+
+
+ACTION_TYPE_CASE = """
+    CASE
+        WHEN action LIKE 'Documento %' THEN 'upload'
+        WHEN action LIKE 'Query %' THEN 'query'
+        WHEN action LIKE 'User %' THEN 'user'
+        ELSE 'other'
+    END
+"""
+
+
+def upgrade() -> None:
+    # `logs` pasa a estar particionada por mes (RANGE sobre created_at, en UTC).
+    # La clave de partición tiene que formar parte de la clave primaria.
+    op.execute("ALTER TABLE logs RENAME TO logs_legacy")
+    op.execute("ALTER TABLE logs_legacy RENAME CONSTRAINT logs_pkey TO logs_legacy_pkey")
+    op.execute("""
+        CREATE TABLE logs (
+            id VARCHAR(40) NOT NULL,
+            action TEXT NOT NULL,
+            action_type VARCHAR(50),
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            user_id VARCHAR(40) REFERENCES users (id),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    # Red de seguridad para filas fuera de las particiones creadas
+    op.execute("CREATE TABLE logs_default PARTITION OF logs DEFAULT")
+    # Una partición por mes desde el primer log hasta AUDIT_PARTITIONS_AHEAD
+    # (2 por defecto) meses después del actual; después las crea el
+    # mantenimiento de app/services/audit.py
+    op.execute("""
+        DO $$
+        DECLARE
+            part_month DATE := date_trunc('month', COALESCE(
+                (SELECT min(created_at) FROM logs_legacy), now()) AT TIME ZONE 'UTC')::date;
+            last_month DATE := (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '2 months')::date;
+        BEGIN
+            WHILE part_month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF logs FOR VALUES FROM (%L) TO (%L)',
+                    'logs_' || to_char(part_month, 'YYYY_MM'),
+                    to_char(part_month, 'YYYY-MM-DD') || ' 00:00:00+00',
+                    to_char(part_month + interval '1 month', 'YYYY-MM-DD') || ' 00:00:00+00'
+                );
+                part_month := (part_month + interval '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+    op.execute(f"""
+        INSERT INTO logs (id, action, action_type, created_at, user_id)
+        SELECT id, action, {ACTION_TYPE_CASE}, created_at, user_id FROM logs_legacy
+    """)
+    op.execute("DROP TABLE logs_legacy")
+    op.create_index('ix_logs_created_at_id', 'logs', ['created_at', 'id'], unique=False)
+
+    op.create_table('logs_daily_summary',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.String(length=40), nullable=False, server_default=''),
+    sa.Column('action_type', sa.String(length=50), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'user_id', 'action_type')
+    )
+    op.execute("""
+        INSERT INTO logs_daily_summary (day, user_id, action_type, total, updated_at)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, COALESCE(user_id, ''),
+               COALESCE(action_type, 'other'), count(*), now()
+        FROM logs GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('logs_daily_summary')
+    op.execute("ALTER TABLE logs RENAME TO logs_partitioned")
+    op.execute("""
+        CREATE TABLE logs (
+            id VARCHAR(40) NOT NULL,
+            action TEXT NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            user_id VARCHAR(40) REFERENCES users (id)
+        )
+    """)
+    op.execute("""
+        INSERT INTO logs (id, action, created_at, user_id)
+        SELECT id, action, created_at, user_id FROM logs_partitioned
+    """)
+    op.execute("DROP TABLE logs_partitioned CASCADE")
+    op.execute("ALTER TABLE logs ADD CONSTRAINT logs_pkey PRIMARY KEY (id)")
+    op.create_index('ix_logs_created_at_id', 'logs', ['created_at', 'id'], unique=False)
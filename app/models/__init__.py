@@ -1,3 +1,3 @@
 from .user import User
-from .logger import Logger
+from .logger import LogDailySummary, Logger
 from .rag import Document, History
\ No newline at end of file
@@ -1,7 +1,7 @@
 import pytz
 from datetime import datetime
 from nanoid import generate
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, Date, String, DateTime, ForeignKey, Index, Integer
 from sqlalchemy.orm import relationship
 from sqlalchemy import Text
 from app.core.database import Base
@@ -12,11 +12,29 @@ key = settings.DB_SECRET_KEY
 
 class Logger(Base):
     __tablename__ = "logs"
+    __table_args__ = (
+        # Paginación por cursor de /loggers/all
+        Index("ix_logs_created_at_id", "created_at", "id"),
+        # Particionada por mes (app/services/audit.py); la clave de partición
+        # forma parte de la clave primaria
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(String(40), primary_key=True, default=generate)
     action = Column(Text, nullable=False) 
-    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(pytz.utc))  
+    action_type = Column(String(50), nullable=True)  # upload, query, user
+    created_at = Column(DateTime(timezone=True), primary_key=True, nullable=False, default=lambda: datetime.now(pytz.utc))  
        
     user_id = Column(String(40), ForeignKey("users.id"))
-    user = relationship("User", back_populates="logs", lazy="joined")
-    
\ No newline at end of file
+    user = relationship("User", back_populates="logs", lazy="select")
+
+
+class LogDailySummary(Base):
+    # Actividad diaria por usuario y tipo de acción, agregada desde `logs`
+    __tablename__ = "logs_daily_summary"
+
+    day = Column(Date, primary_key=True)
+    user_id = Column(String(40), primary_key=True, default="")
+    action_type = Column(String(50), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(pytz.utc))
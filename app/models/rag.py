@@ -1,7 +1,7 @@
 from sqlalchemy import Text
 import pytz
 from nanoid import generate
-from sqlalchemy import Boolean, Column, ForeignKey, String, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 from sqlalchemy_utils import StringEncryptedType
 from datetime import datetime
@@ -13,25 +13,39 @@ key = settings.DB_SECRET_KEY
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_user_id_filename", "user_id", "filename"),
+        # Paginación por cursor de /documents: filtro por usuario, orden (created_at, id)
+        Index("ix_documents_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
     id = Column(String(200), primary_key=True, index=True)
     filename = Column(StringEncryptedType(String(200), key), index=True)
     upload_date = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.utc))  
-    vector_data = Column(Vector(384), nullable=False)
+    # Sin dimensión fija: depende de la versión del modelo de embeddings
+    vector_data = Column(Vector(), nullable=False)
+    embedding_version = Column(String(100), nullable=True, index=True)
+    chunk_text = Column(StringEncryptedType(Text, key), nullable=True)
+    chunk_index = Column(Integer, nullable=True)
+    content_hash = Column(String(200), nullable=True, index=True)
     deleted = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.utc))
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(pytz.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.utc), onupdate=lambda: datetime.now(pytz.utc))
     
     user_id = Column(String(40), ForeignKey("users.id"))
-    user = relationship("User", back_populates="documents", lazy="joined")
+    user = relationship("User", back_populates="documents", lazy="select")
 
 class History(Base):
     __tablename__ = "history"
+    __table_args__ = (
+        # Paginación por cursor de /history y lectura de la memoria reciente
+        Index("ix_history_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
     id = Column(String(40), primary_key=True, default=generate)
     query_text = Column(StringEncryptedType(Text, key), nullable=False)
     response_text = Column(StringEncryptedType(Text, key), nullable=False)    
     deleted = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.utc))
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(pytz.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.utc), onupdate=lambda: datetime.now(pytz.utc))
     
     user_id = Column(String(40), ForeignKey("users.id"))
-    user = relationship("User", back_populates="histories", lazy="joined")
\ No newline at end of file
+    user = relationship("User", back_populates="histories", lazy="select")
\ No newline at end of file
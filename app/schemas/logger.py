@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 
 
 class LoggerBase(BaseModel):
@@ -22,4 +22,14 @@ class LoggerResponse(LoggerBase):
     user_id: str
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class LogSummaryResponse(BaseModel):
+    day: date
+    user_id: str
+    action_type: str
+    total: int
+
+    class Config:
+        orm_mode = True
@@ -1,10 +1,13 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 class QueryRequest(BaseModel):
     query: str
 
+class QueryBatchRequest(BaseModel):
+    queries: List[str]
+
 class DocumentBase(BaseModel):
     filename: str
     vector_data: str
@@ -42,3 +45,41 @@ class HistoryResponse(HistoryBase):
 
     class Config:
         orm_mode = True
+
+
+class BulkFileResult(BaseModel):
+    filename: Optional[str]
+    status: str
+    document_id: Optional[str]
+    chunks_new: int
+    chunks_kept: int
+    chunks_removed: int
+    chunks_skipped: int
+    bytes: int
+    error: Optional[str]
+    seconds: float
+
+
+class BulkUploadResponse(BaseModel):
+    results: List[BulkFileResult]
+    files: int
+    files_ok: int
+    chunks: int
+    bytes: int
+    seconds: float
+    files_per_second: float
+    chunks_per_second: float
+    mb_per_second: float
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    total_size: int
+
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    filename: str
+    total_size: int
+    offset: int
+    complete: bool
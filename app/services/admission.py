@@ -0,0 +1,205 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from prometheus_client import Counter, Gauge
+from app.core.config import settings
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Peticiones esperando un hueco de ejecución.",
+    ["policy"],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Peticiones admitidas en ejecución.",
+    ["policy"],
+)
+ADMISSION_ADMITTED = Counter(
+    "admission_admitted_total",
+    "Peticiones admitidas.",
+    ["policy"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Peticiones rechazadas por el control de admisión.",
+    ["policy", "reason"],
+)
+
+# Usuarios con estado en memoria (buckets y contadores), con límite LRU
+MAX_TRACKED_USERS = 10000
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+# ---------------------------
+# Token bucket: `rate` tokens por segundo con un máximo de `burst`
+# ---------------------------
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, cost: float = 1) -> float:
+        # Devuelve 0 si se consumen los tokens, o los segundos hasta que haya suficientes
+        self._refill()
+        cost = min(cost, self.burst)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def refund(self, cost: float = 1):
+        self.tokens = min(self.burst, self.tokens + min(cost, self.burst))
+
+
+# ---------------------------
+# Política de admisión de un grupo de rutas: ritmo por usuario y global,
+# concurrencia por usuario y global, y una cola de espera acotada.
+# ---------------------------
+class AdmissionPolicy:
+    def __init__(
+        self,
+        name: str,
+        user_rate: float,
+        user_burst: float,
+        global_rate: float,
+        global_burst: float,
+        user_concurrency: int,
+        concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+    ):
+        self.name = name
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.user_concurrency = user_concurrency
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.user_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.user_in_flight: Dict[str, int] = {}
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _reject(self, status_code: int, reason: str, detail: str, retry_after: float):
+        ADMISSION_REJECTIONS.labels(self.name, reason).inc()
+        raise AdmissionRejected(status_code, detail, retry_after)
+
+    def _user_bucket(self, user_id: str) -> TokenBucket:
+        bucket = self.user_buckets.get(user_id)
+        if bucket is None:
+            bucket = self.user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            if len(self.user_buckets) > MAX_TRACKED_USERS:
+                self.user_buckets.popitem(last=False)
+        else:
+            self.user_buckets.move_to_end(user_id)
+        return bucket
+
+    async def _acquire_slot(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            self._reject(503, "queue_full", "Servidor saturado, inténtelo más tarde.", self.queue_timeout)
+
+        self.waiting += 1
+        ADMISSION_QUEUE_DEPTH.labels(self.name).set(self.waiting)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject(503, "queue_timeout", "Servidor saturado, inténtelo más tarde.", self.queue_timeout)
+        finally:
+            self.waiting -= 1
+            ADMISSION_QUEUE_DEPTH.labels(self.name).set(self.waiting)
+
+    async def acquire(self, user_id: str, cost: float = 1):
+        # 429: el usuario supera su cuota; 503: el servicio está saturado.
+        # Cada acquire() admitido debe cerrarse con release().
+        if self.user_in_flight.get(user_id, 0) >= self.user_concurrency:
+            self._reject(429, "user_concurrency", "Demasiadas peticiones simultáneas.", 1)
+
+        user_bucket = self._user_bucket(user_id)
+        wait = user_bucket.try_acquire(cost)
+        if wait:
+            self._reject(429, "user_rate", "Demasiadas peticiones, inténtelo más tarde.", wait)
+        wait = self.global_bucket.try_acquire(cost)
+        if wait:
+            user_bucket.refund(cost)
+            self._reject(503, "global_rate", "Servidor saturado, inténtelo más tarde.", wait)
+
+        self.user_in_flight[user_id] = self.user_in_flight.get(user_id, 0) + 1
+        try:
+            await self._acquire_slot()
+        except BaseException:
+            # Rechazada en la cola: no consume cuota
+            user_bucket.refund(cost)
+            self.global_bucket.refund(cost)
+            self._release_user(user_id)
+            raise
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.labels(self.name).set(self.in_flight)
+        ADMISSION_ADMITTED.labels(self.name).inc()
+
+    def _release_user(self, user_id: str):
+        remaining = self.user_in_flight.get(user_id, 1) - 1
+        if remaining:
+            self.user_in_flight[user_id] = remaining
+        else:
+            self.user_in_flight.pop(user_id, None)
+
+    def release(self, user_id: str):
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.labels(self.name).set(self.in_flight)
+        self._slots.release()
+        self._release_user(user_id)
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "users_in_flight": len(self.user_in_flight),
+            "global_tokens": round(self.global_bucket.tokens, 2),
+        }
+
+
+# Consultas: protege el límite de Groq. Ingesta: protege la CPU (embeddings).
+query_policy = AdmissionPolicy(
+    "query",
+    user_rate=settings.ADMISSION_QUERY_USER_RATE,
+    user_burst=settings.ADMISSION_QUERY_USER_BURST,
+    global_rate=settings.ADMISSION_QUERY_GLOBAL_RATE,
+    global_burst=settings.ADMISSION_QUERY_GLOBAL_BURST,
+    user_concurrency=settings.ADMISSION_QUERY_USER_CONCURRENCY,
+    concurrency=settings.ADMISSION_QUERY_CONCURRENCY,
+    max_queue=settings.ADMISSION_QUERY_QUEUE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+upload_policy = AdmissionPolicy(
+    "upload",
+    user_rate=settings.ADMISSION_UPLOAD_USER_RATE,
+    user_burst=settings.ADMISSION_UPLOAD_USER_BURST,
+    global_rate=settings.ADMISSION_UPLOAD_GLOBAL_RATE,
+    global_burst=settings.ADMISSION_UPLOAD_GLOBAL_BURST,
+    user_concurrency=settings.ADMISSION_UPLOAD_USER_CONCURRENCY,
+    concurrency=settings.ADMISSION_UPLOAD_CONCURRENCY,
+    max_queue=settings.ADMISSION_UPLOAD_QUEUE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+
+policies: Dict[str, AdmissionPolicy] = {policy.name: policy for policy in (query_policy, upload_policy)}
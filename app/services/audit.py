@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import pytz
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import async_session
+from app.core.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Tipos de acción de `logs.action_type`
+ACTION_UPLOAD = "upload"
+ACTION_QUERY = "query"
+ACTION_USER = "user"
+
+# Un solo worker hace el mantenimiento a la vez (pg_try_advisory_xact_lock)
+MAINTENANCE_LOCK_ID = 7_411_044
+PARTITION_RE = re.compile(r"^logs_(\d{4})_(\d{2})$")
+
+audit_status: dict = {}
+_maintenance_task: Optional[asyncio.Task] = None
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"logs_{month:%Y_%m}"
+
+
+# ---------------------------
+# Particiones mensuales de `logs` (en UTC). Se crean con antelación; las que
+# quedan fuera de la retención se eliminan con DROP TABLE, sin DELETE.
+# ---------------------------
+DEFAULT_PARTITION = "logs_default"
+
+
+def month_bounds(month: date) -> str:
+    return (
+        f"FROM ('{month:%Y-%m-%d} 00:00:00+00') "
+        f"TO ('{add_months(month, 1):%Y-%m-%d} 00:00:00+00')"
+    )
+
+
+async def default_partition_months(db: AsyncSession) -> List[date]:
+    # Meses con filas en la partición por defecto (mantenimiento desactivado o
+    # retrasado más de AUDIT_PARTITIONS_AHEAD meses)
+    result = await db.execute(text(
+        f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')::date FROM {DEFAULT_PARTITION}"
+    ))
+    return sorted(month for (month,) in result.all())
+
+
+async def create_partition(db: AsyncSession, month: date, from_default: bool):
+    name = partition_name(month)
+    if not from_default:
+        await db.execute(text(f"CREATE TABLE {name} PARTITION OF logs FOR VALUES {month_bounds(month)}"))
+        return
+    # Postgres no crea una partición si la de por defecto ya tiene filas de su
+    # rango: se separa la de por defecto, se crea la mensual, se mueven las
+    # filas y se vuelve a adjuntar
+    bounds = {
+        "start": datetime.combine(month, datetime.min.time(), pytz.utc),
+        "end": datetime.combine(add_months(month, 1), datetime.min.time(), pytz.utc),
+    }
+    await db.execute(text(f"ALTER TABLE logs DETACH PARTITION {DEFAULT_PARTITION}"))
+    await db.execute(text(f"CREATE TABLE {name} PARTITION OF logs FOR VALUES {month_bounds(month)}"))
+    await db.execute(
+        text(
+            f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} "
+            "WHERE created_at >= :start AND created_at < :end"
+        ),
+        bounds,
+    )
+    await db.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end"),
+        bounds,
+    )
+    await db.execute(text(f"ALTER TABLE logs ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int) -> Tuple[List[str], Dict[str, str]]:
+    created, failed = [], {}
+    current = month_start(datetime.now(pytz.utc).date())
+    stranded = await default_partition_months(db)
+    months = sorted(set(stranded) | {add_months(current, i) for i in range(months_ahead + 1)})
+    for month in months:
+        exists = await db.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": partition_name(month)})
+        if exists:
+            continue
+        try:
+            # Un fallo se deshace solo (savepoint) y se reintenta en la siguiente pasada
+            async with db.begin_nested():
+                await create_partition(db, month, month in stranded)
+            created.append(partition_name(month))
+        except Exception as e:
+            failed[partition_name(month)] = str(e)
+            logger.warning("No se pudo crear la partición", extra={"partition": partition_name(month), "error": str(e)})
+    return created, failed
+
+
+async def list_partitions(db: AsyncSession) -> List[date]:
+    result = await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'logs'::regclass"
+    ))
+    months = []
+    for (name,) in result.all():
+        match = PARTITION_RE.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+async def refresh_daily_summary(db: AsyncSession, start: date, end: date) -> int:
+    # Recalcula por completo los días [start, end): es idempotente y las
+    # filas que lleguen tarde se recogen en la siguiente pasada
+    result = await db.execute(
+        text(
+            "INSERT INTO logs_daily_summary (day, user_id, action_type, total, updated_at) "
+            "SELECT (created_at AT TIME ZONE 'UTC')::date, COALESCE(user_id, ''), "
+            "       COALESCE(action_type, 'other'), count(*), now() "
+            "FROM logs WHERE created_at >= :start AND created_at < :end "
+            "GROUP BY 1, 2, 3 "
+            "ON CONFLICT (day, user_id, action_type) "
+            "DO UPDATE SET total = EXCLUDED.total, updated_at = EXCLUDED.updated_at"
+        ),
+        {
+            "start": datetime.combine(start, datetime.min.time(), pytz.utc),
+            "end": datetime.combine(end, datetime.min.time(), pytz.utc),
+        },
+    )
+    return result.rowcount
+
+
+async def drop_expired_partitions(db: AsyncSession, retention_months: int) -> List[str]:
+    cutoff = add_months(month_start(datetime.now(pytz.utc).date()), -retention_months)
+    dropped = []
+    for month in await list_partitions(db):
+        if add_months(month, 1) > cutoff:
+            continue
+        # El resumen diario sobrevive a la partición
+        await refresh_daily_summary(db, month, add_months(month, 1))
+        await db.execute(text(f"DROP TABLE {partition_name(month)}"))
+        dropped.append(partition_name(month))
+    return dropped
+
+
+async def run_audit_maintenance(
+    retention_months: Optional[int] = None,
+    months_ahead: Optional[int] = None,
+    lookback_days: Optional[int] = None,
+) -> dict:
+    retention_months = settings.AUDIT_RETENTION_MONTHS if retention_months is None else retention_months
+    months_ahead = settings.AUDIT_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    lookback_days = settings.AUDIT_SUMMARY_LOOKBACK_DAYS if lookback_days is None else lookback_days
+
+    async with async_session() as db:
+        if not await db.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": MAINTENANCE_LOCK_ID}):
+            return {"state": "skipped", "reason": "mantenimiento en curso en otro proceso"}
+
+        created, failed = await ensure_partitions(db, months_ahead)
+        today = datetime.now(pytz.utc).date()
+        summarized = await refresh_daily_summary(db, today - timedelta(days=lookback_days), today + timedelta(days=1))
+        dropped = await drop_expired_partitions(db, retention_months) if retention_months > 0 else []
+        await db.commit()
+
+    audit_status.update(
+        state="partial" if failed else "ok",
+        last_run=datetime.now(pytz.utc).isoformat(),
+        partitions_created=created,
+        partitions_failed=failed,
+        partitions_dropped=dropped,
+        summary_rows=summarized,
+    )
+    logger.info(
+        "Mantenimiento de logs completado",
+        extra={"partitions_created": len(created), "partitions_dropped": len(dropped), "summary_rows": summarized},
+    )
+    return dict(audit_status)
+
+
+async def audit_maintenance_loop():
+    while True:
+        try:
+            await run_audit_maintenance()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            audit_status.update(state="error", error=str(e))
+            logger.exception("Error en el mantenimiento de logs")
+        await asyncio.sleep(settings.AUDIT_MAINTENANCE_INTERVAL_SECONDS)
+
+
+def start_audit_maintenance():
+    global _maintenance_task
+    if settings.AUDIT_MAINTENANCE_INTERVAL_SECONDS <= 0 or _maintenance_task is not None:
+        return
+    _maintenance_task = asyncio.create_task(audit_maintenance_loop())
+
+
+def stop_audit_maintenance():
+    global _maintenance_task
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        _maintenance_task = None
+
+
+async def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Particiones, retención y resumen diario de los logs.")
+    parser.add_argument("--retention-months", type=int, default=settings.AUDIT_RETENTION_MONTHS)
+    parser.add_argument("--months-ahead", type=int, default=settings.AUDIT_PARTITIONS_AHEAD)
+    parser.add_argument("--lookback-days", type=int, default=settings.AUDIT_SUMMARY_LOOKBACK_DAYS)
+    args = parser.parse_args()
+
+    print(await run_audit_maintenance(args.retention_months, args.months_ahead, args.lookback_days))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
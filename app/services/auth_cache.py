@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from prometheus_client import Counter
+from app.core.config import settings
+from app.models.user import User
+
+AUTH_CACHE_LOOKUPS = Counter(
+    "auth_cache_lookups_total",
+    "Resoluciones del usuario autenticado, según se sirvieron desde la caché o desde la base de datos.",
+    ["result"],
+)
+
+
+# ---------------------------
+# Caché TTL de usuarios autenticados, indexada por el `sub` del token (email).
+# Guarda la instancia ya descifrada (desligada de su sesión al cerrarse;
+# expire_on_commit=False mantiene sus columnas cargadas). Los cambios de
+# update/deactivate/activate la invalidan; la caché es por proceso, así que
+# en otros workers el cambio se ve como mucho AUTH_CACHE_TTL_SECONDS después.
+# ---------------------------
+class PrincipalCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[User, float]]" = OrderedDict()
+        # Cambia con cada invalidación: una búsqueda en la base de datos que
+        # empezó antes no debe volver a guardar un usuario ya modificado
+        self.generation = 0
+
+    def get(self, subject: str) -> Optional[User]:
+        entry = self._entries.get(subject)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[subject]
+            AUTH_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        self._entries.move_to_end(subject)
+        AUTH_CACHE_LOOKUPS.labels("hit").inc()
+        return entry[0]
+
+    def put(self, subject: str, user: User, generation: int):
+        if self.ttl <= 0 or generation != self.generation:
+            return
+        self._entries[subject] = (user, time.monotonic() + self.ttl)
+        self._entries.move_to_end(subject)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: str):
+        # Por id: cubre también el email anterior si el cambio fue de email
+        self.generation += 1
+        for subject in [s for s, (user, _) in self._entries.items() if user.id == user_id]:
+            del self._entries[subject]
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+
+principal_cache = PrincipalCache(settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_ENTRIES)
@@ -0,0 +1,240 @@
+import fcntl
+import hashlib
+import os
+import re
+import struct
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.models.rag import Document
+
+# ---------------------------
+# SimHash de 64 bits sobre shingles de palabras
+# ---------------------------
+SHINGLE_SIZE = 3
+# 4 bandas de 16 bits: con una distancia de Hamming <= 3, por el principio
+# del palomar al menos una banda coincide exactamente.
+BANDS = 4
+BAND_BITS = 64 // BANDS
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def simhash(text: str) -> int:
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return 0
+    shingles = [
+        " ".join(words[i:i + SHINGLE_SIZE])
+        for i in range(max(1, len(words) - SHINGLE_SIZE + 1))
+    ]
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles],
+        dtype="<u8",
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0) * 2 > len(shingles)
+    return int(np.packbits(votes, bitorder="little").view("<u8")[0])
+
+
+def is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+# ---------------------------
+# Índice de firmas por usuario, persistido como registros de tamaño fijo:
+# operación (1 = alta, 0 = baja) + firma + id del chunk (uuid en 16 bytes).
+# Varios workers comparten el fichero: cada uno aplica los registros que
+# añaden los demás antes de consultar o escribir, y las escrituras se
+# serializan con flock sobre un fichero aparte (compact() reemplaza el de datos).
+# ---------------------------
+RECORD = struct.Struct("<BQ16s")
+
+
+@contextmanager
+def file_lock(path: str, exclusive: bool):
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SignatureIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.lock = threading.Lock()
+        self._reset()
+        # Fichero leído (dispositivo, inodo) y bytes ya aplicados de él
+        self.file_id: Optional[Tuple[int, int]] = None
+
+    def _reset(self):
+        self.signatures: Dict[str, int] = {}
+        self.bands: Dict[Tuple[int, int], set] = defaultdict(set)
+        self.tombstones = 0
+        self.offset = 0
+
+    @staticmethod
+    def band_keys(signature: int):
+        mask = (1 << BAND_BITS) - 1
+        return [(band, (signature >> (band * BAND_BITS)) & mask) for band in range(BANDS)]
+
+    def _add(self, signature: int, chunk_id: str):
+        self.signatures[chunk_id] = signature
+        for key in self.band_keys(signature):
+            self.bands[key].add(chunk_id)
+
+    def _remove(self, chunk_id: str):
+        signature = self.signatures.pop(chunk_id, None)
+        if signature is None:
+            return
+        for key in self.band_keys(signature):
+            self.bands[key].discard(chunk_id)
+
+    def _read_new_records(self):
+        # Llamar con el flock tomado. El fichero solo crece salvo al compactarse,
+        # que lo sustituye por otro inodo: entonces se vuelve a leer entero.
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self.file_id or stat.st_size < self.offset:
+            self._reset()
+            self.file_id = file_id
+        if stat.st_size == self.offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        usable = len(data) - len(data) % RECORD.size
+        for op, signature, raw_id in RECORD.iter_unpack(data[:usable]):
+            chunk_id = str(uuid.UUID(bytes=raw_id))
+            if op:
+                self._add(signature, chunk_id)
+            else:
+                self._remove(chunk_id)
+                self.tombstones += 1
+        self.offset += usable
+
+    def _written(self):
+        # Tras escribir con el flock exclusivo, todo el fichero está aplicado
+        stat = os.stat(self.path)
+        self.file_id, self.offset = (stat.st_dev, stat.st_ino), stat.st_size
+        # Compacta el fichero cuando las bajas dominan
+        if self.tombstones > len(self.signatures):
+            self.compact()
+
+    def load(self):
+        with self.lock, file_lock(self.lock_path, exclusive=True):
+            self._read_new_records()
+            if self.file_id is not None:
+                self._written()
+
+    def refresh(self):
+        with self.lock, file_lock(self.lock_path, exclusive=False):
+            self._read_new_records()
+
+    def compact(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk_id, signature in self.signatures.items():
+                f.write(RECORD.pack(1, signature, uuid.UUID(chunk_id).bytes))
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self.file_id, self.offset = (stat.st_dev, stat.st_ino), stat.st_size
+        self.tombstones = 0
+
+    def find_near_duplicate(self, signature: int) -> Optional[str]:
+        self.refresh()
+        best_id, best_distance = None, settings.DEDUP_MAX_HAMMING + 1
+        candidates = set()
+        for key in self.band_keys(signature):
+            candidates |= self.bands.get(key, set())
+        for chunk_id in candidates:
+            distance = hamming_distance(signature, self.signatures[chunk_id])
+            if distance < best_distance:
+                best_id, best_distance = chunk_id, distance
+        return best_id
+
+    def add(self, items: List[Tuple[int, str]]):
+        with self.lock, file_lock(self.lock_path, exclusive=True):
+            self._read_new_records()
+            with open(self.path, "ab") as f:
+                for signature, chunk_id in items:
+                    self._add(signature, chunk_id)
+                    f.write(RECORD.pack(1, signature, uuid.UUID(chunk_id).bytes))
+            self._written()
+
+    def remove(self, chunk_ids: List[str]):
+        with self.lock, file_lock(self.lock_path, exclusive=True):
+            self._read_new_records()
+            with open(self.path, "ab") as f:
+                for chunk_id in chunk_ids:
+                    if chunk_id in self.signatures:
+                        f.write(RECORD.pack(0, self.signatures[chunk_id], uuid.UUID(chunk_id).bytes))
+                        self._remove(chunk_id)
+                        self.tombstones += 1
+            self._written()
+
+
+# Índices cargados en memoria, con un límite de usuarios (LRU)
+_indexes: "OrderedDict[str, SignatureIndex]" = OrderedDict()
+MAX_LOADED_INDEXES = 256
+
+# Ahorro acumulado desde el arranque del proceso
+dedup_stats = {
+    "chunks_seen": 0,
+    "chunks_skipped": 0,
+    "chunks_flagged": 0,
+    "embeddings_saved": 0,
+    "bytes_saved": 0,
+}
+
+
+async def get_signature_index(db: AsyncSession, user_id: str) -> SignatureIndex:
+    index = _indexes.get(user_id)
+    if index is not None:
+        _indexes.move_to_end(user_id)
+        # Recoge lo que otros workers hayan escrito desde la última consulta
+        index.refresh()
+        return index
+
+    os.makedirs(settings.DEDUP_INDEX_DIR, exist_ok=True)
+    index = SignatureIndex(os.path.join(settings.DEDUP_INDEX_DIR, f"{user_id}.sig"))
+    if os.path.exists(index.path):
+        index.load()
+    else:
+        # Primera vez: se calculan las firmas de los chunks ya almacenados
+        result = await db.execute(
+            select(Document.id, Document.chunk_text).where(
+                Document.user_id == user_id,
+                Document.deleted == False,
+                Document.chunk_text.isnot(None),
+            )
+        )
+        index.add([
+            (simhash(text), chunk_id)
+            for chunk_id, text in result.all()
+            if is_uuid(chunk_id)
+        ])
+
+    _indexes[user_id] = index
+    if len(_indexes) > MAX_LOADED_INDEXES:
+        _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+import pytz
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from qdrant_client.models import PointStruct
+from app.core.config import settings
+from app.core.database import async_session
+from app.core.logging_config import setup_logging
+from app.models.rag import Document
+from app.services.embedding_scheduler import BULK, embedding_scheduler
+from app.services.embeddings import get_model_spec, load_embedding_model, set_active_version
+from app.services.rag import (
+    COLLECTION_NAME,
+    create_versioned_collection,
+    get_alias_target,
+    qdrant_client,
+    refresh_active_version,
+    swap_alias,
+)
+from app.services.reindex import IndexRebuildError, index_maintenance_lock, row_to_point
+
+logger = logging.getLogger(__name__)
+
+migration_status: dict = {"state": "idle"}
+_migration_task: Optional[asyncio.Task] = None
+
+
+# ---------------------------
+# Copia a la colección sombra las filas que ya tienen la versión destino
+# (permite reanudar una migración interrumpida sin re-embeddings)
+# ---------------------------
+async def copy_migrated_rows(db: AsyncSession, shadow: str, target_version: str, batch_size: int) -> int:
+    copied = 0
+    stmt = (
+        select(
+            Document.id,
+            Document.vector_data,
+            Document.chunk_text,
+            Document.chunk_index,
+            Document.filename,
+            Document.user_id,
+            Document.upload_date,
+            Document.embedding_version,
+        )
+        .where(Document.deleted == False, Document.embedding_version == target_version)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(stmt)
+    async for rows in result.partitions():
+        points = [row_to_point(row) for row in rows]
+        await asyncio.to_thread(qdrant_client.upsert, collection_name=shadow, points=points, wait=True)
+        copied += len(points)
+    return copied
+
+
+# ---------------------------
+# Filas anteriores a guardar el texto de los chunks: no se pueden re-embeber
+# y desaparecerían de la búsqueda al cambiar el alias
+# ---------------------------
+async def count_missing_text(db: AsyncSession, target_version: str) -> int:
+    result = await db.execute(
+        select(func.count())
+        .select_from(Document)
+        .where(
+            Document.deleted == False,
+            Document.chunk_text.is_(None),
+            Document.embedding_version.is_distinct_from(target_version),
+        )
+    )
+    return result.scalar_one()
+
+
+# ---------------------------
+# Una pasada de re-embedding por lotes (keyset por id) con pausa entre lotes
+# ---------------------------
+async def reembed_pass(
+    db: AsyncSession,
+    target_version: str,
+    shadow: str,
+    batch_size: int,
+    pause_seconds: float,
+) -> int:
+    model = await asyncio.to_thread(load_embedding_model, target_version)
+    migrated = 0
+    last_id = ""
+    while True:
+        result = await db.execute(
+            select(
+                Document.id,
+                Document.chunk_text,
+                Document.chunk_index,
+                Document.filename,
+                Document.user_id,
+                Document.upload_date,
+            )
+            .where(
+                Document.deleted == False,
+                Document.chunk_text.isnot(None),
+                Document.embedding_version.is_distinct_from(target_version),
+                Document.id > last_id,
+            )
+            .order_by(Document.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            return migrated
+        last_id = rows[-1].id
+
+        texts = [row.chunk_text for row in rows]
+        vectors = (await embedding_scheduler.encode(texts, BULK, model=model)).tolist()
+        points = [
+            PointStruct(
+                id=row.id,
+                vector=vector,
+                payload={
+                    "text": row.chunk_text,
+                    "filename": row.filename,
+                    "user_id": row.user_id,
+                    "upload_date": str(row.upload_date),
+                    "chunk_index": row.chunk_index,
+                    "model_version": target_version,
+                },
+            )
+            for row, vector in zip(rows, vectors)
+        ]
+        await asyncio.to_thread(qdrant_client.upsert, collection_name=shadow, points=points, wait=True)
+
+        await db.execute(
+            update(Document),
+            [
+                {"id": row.id, "vector_data": vector, "embedding_version": target_version}
+                for row, vector in zip(rows, vectors)
+            ],
+        )
+        await db.commit()
+
+        migrated += len(rows)
+        migration_status["migrated"] += len(rows)
+        # Throttling: deja CPU libre para las consultas que siguen usando la colección anterior
+        await asyncio.sleep(pause_seconds)
+
+
+async def run_embedding_migration(
+    target_version: str,
+    batch_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None,
+    keep_old: bool = False,
+) -> dict:
+    batch_size = batch_size or settings.EMBEDDING_MIGRATION_BATCH_SIZE
+    pause_seconds = settings.EMBEDDING_MIGRATION_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+    get_model_spec(target_version)
+
+    async with index_maintenance_lock:
+        started = time.perf_counter()
+        old_collection = get_alias_target(COLLECTION_NAME)
+        source_version = refresh_active_version(force=True)
+        if source_version == target_version:
+            raise IndexRebuildError(f"La versión '{target_version}' ya está activa.")
+        async with async_session() as db:
+            missing_text = await count_missing_text(db, target_version)
+        migration_status["missing_text"] = missing_text
+        if missing_text:
+            error = (
+                f"{missing_text} chunks no tienen texto guardado (subidos antes de guardarlo) y no se pueden "
+                "re-embeber; vuelva a subir esos documentos antes de migrar."
+            )
+            migration_status.update(state="failed", source_version=source_version, error=error)
+            raise IndexRebuildError(error)
+
+        shadow = create_versioned_collection(target_version)
+        migration_status.update(
+            state="running",
+            source_version=source_version,
+            target_version=target_version,
+            shadow_collection=shadow,
+            migrated=0,
+            started_at=str(datetime.now(pytz.utc)),
+            error=None,
+        )
+        logger.info(
+            "Migrando embeddings",
+            extra={"source_version": source_version, "target_version": target_version, "collection": shadow},
+        )
+
+        try:
+            async with async_session() as db:
+                migration_status["resumed"] = await copy_migrated_rows(db, shadow, target_version, batch_size)
+                # Se repiten pasadas hasta que no queden filas: los ids no son
+                # crecientes y las subidas concurrentes pueden caer detrás del cursor.
+                while await reembed_pass(db, target_version, shadow, batch_size, pause_seconds):
+                    pass
+
+                migration_status["state"] = "cutover"
+                swap_alias(COLLECTION_NAME, shadow, old_collection)
+                set_active_version(target_version)
+                # Espera a que los demás procesos detecten el nuevo alias y recoge
+                # las subidas que entraron con el modelo anterior durante el cambio.
+                await asyncio.sleep(settings.EMBEDDING_VERSION_REFRESH_SECONDS)
+                await reembed_pass(db, target_version, shadow, batch_size, 0)
+        except BaseException as e:
+            migration_status.update(state="failed", error=str(e))
+            if get_alias_target(COLLECTION_NAME) != shadow:
+                qdrant_client.delete_collection(shadow)
+            raise
+
+        if old_collection and not keep_old:
+            qdrant_client.delete_collection(old_collection)
+
+        elapsed = time.perf_counter() - started
+        migration_status.update(
+            state="completed",
+            previous_collection=old_collection,
+            points=qdrant_client.count(collection_name=shadow, exact=True).count,
+            seconds=round(elapsed, 2),
+        )
+        logger.info("Migración de embeddings completada", extra={"seconds": round(elapsed, 1)})
+        return dict(migration_status)
+
+
+def start_embedding_migration(
+    target_version: str,
+    batch_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None,
+    keep_old: bool = False,
+) -> dict:
+    global _migration_task
+    get_model_spec(target_version)
+    if index_maintenance_lock.locked() or (_migration_task and not _migration_task.done()):
+        raise IndexRebuildError("Ya hay una operación de mantenimiento del índice en curso.")
+
+    migration_status.clear()
+    migration_status.update(state="starting", target_version=target_version)
+    _migration_task = asyncio.create_task(
+        run_embedding_migration(target_version, batch_size, pause_seconds, keep_old)
+    )
+    _migration_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return dict(migration_status)
+
+
+async def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Re-embebe los documentos con otra versión del modelo.")
+    parser.add_argument("--target", required=True, help="Versión destino (ver EMBEDDING_MODELS).")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_MIGRATION_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=settings.EMBEDDING_MIGRATION_PAUSE_SECONDS)
+    parser.add_argument("--keep-old", action="store_true", help="No eliminar la colección anterior.")
+    args = parser.parse_args()
+
+    print(await run_embedding_migration(args.target, args.batch_size, args.pause, args.keep_old))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,168 @@
+import asyncio
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional
+import numpy as np
+from prometheus_client import Gauge, Histogram
+from app.core.config import settings
+from app.services.embeddings import get_embedding_model
+from app.services.metrics import EMBEDDING_BATCH_SECONDS, batch_size_label, observe
+
+# Clases de prioridad: menor valor = se atiende antes
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+EMBED_QUEUE_DEPTH = Gauge(
+    "embedding_queue_depth",
+    "Trabajos de embeddings en cola por prioridad.",
+    ["priority"],
+)
+EMBED_QUEUE_WAIT = Histogram(
+    "embedding_queue_wait_seconds",
+    "Espera en cola antes de ejecutar un trabajo de embeddings.",
+    ["priority"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+EMBED_BULK_BATCH_SIZE = Gauge(
+    "embedding_bulk_batch_size",
+    "Tamaño actual de los lotes de ingesta (se adapta al objetivo de latencia).",
+)
+
+
+class EmbeddingJob:
+    def __init__(self, priority: int, sequence: int, model, texts: List[str]):
+        self.priority = priority
+        self.sequence = sequence
+        self.model = model
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+    def __lt__(self, other: "EmbeddingJob") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+# ---------------------------
+# Planificador delante del modelo de embeddings: un único hilo ejecuta los
+# trabajos por prioridad. Las consultas se agrupan entre sí y pasan por
+# delante de la ingesta, que se trocea en lotes cuya duración se ajusta a
+# EMBED_BULK_TARGET_MS: es lo máximo que una consulta espera detrás de un lote.
+# ---------------------------
+class EmbeddingScheduler:
+    def __init__(self):
+        self._queue: "queue.PriorityQueue[EmbeddingJob]" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._depth = {INTERACTIVE: 0, BULK: 0}
+        self._depth_lock = threading.Lock()
+        self.bulk_batch_size = settings.EMBED_BATCH_SIZE
+        self.ms_per_text: Optional[float] = None
+        EMBED_BULK_BATCH_SIZE.set(self.bulk_batch_size)
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-scheduler", daemon=True)
+                    self._thread.start()
+
+    def _track(self, priority: int, delta: int):
+        with self._depth_lock:
+            self._depth[priority] += delta
+            EMBED_QUEUE_DEPTH.labels(PRIORITY_NAMES[priority]).set(self._depth[priority])
+
+    def submit(self, model, texts: List[str], priority: int) -> Future:
+        self._ensure_worker()
+        job = EmbeddingJob(priority, next(self._sequence), model, texts)
+        self._track(priority, 1)
+        self._queue.put(job)
+        return job.future
+
+    def _take_interactive(self, first: EmbeddingJob) -> List[EmbeddingJob]:
+        # Agrupa las consultas pendientes del mismo modelo en un solo encode
+        jobs, texts = [first], len(first.texts)
+        while texts < settings.EMBED_INTERACTIVE_MAX_BATCH:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job.priority != INTERACTIVE or job.model is not first.model:
+                self._queue.put(job)
+                break
+            jobs.append(job)
+            texts += len(job.texts)
+        return jobs
+
+    def _adapt_bulk_batch(self, texts: int, elapsed_ms: float):
+        sample = elapsed_ms / texts
+        self.ms_per_text = sample if self.ms_per_text is None else 0.8 * self.ms_per_text + 0.2 * sample
+        size = int(settings.EMBED_BULK_TARGET_MS / self.ms_per_text) if self.ms_per_text > 0 else settings.EMBED_BULK_MAX_BATCH
+        self.bulk_batch_size = max(settings.EMBED_BULK_MIN_BATCH, min(settings.EMBED_BULK_MAX_BATCH, size))
+        EMBED_BULK_BATCH_SIZE.set(self.bulk_batch_size)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            taken = self._take_interactive(job) if job.priority == INTERACTIVE else [job]
+            started = time.perf_counter()
+            jobs = []
+            for pending in taken:
+                self._track(pending.priority, -1)
+                EMBED_QUEUE_WAIT.labels(PRIORITY_NAMES[pending.priority]).observe(started - pending.enqueued_at)
+                # Se descartan los trabajos cuya petición ya se canceló
+                if pending.future.set_running_or_notify_cancel():
+                    jobs.append(pending)
+            if not jobs:
+                continue
+
+            texts = [text for pending in jobs for text in pending.texts]
+            try:
+                with observe(
+                    EMBEDDING_BATCH_SECONDS,
+                    priority=PRIORITY_NAMES[job.priority],
+                    batch_size=batch_size_label(len(texts)),
+                ):
+                    vectors = np.asarray(jobs[0].model.encode(texts, batch_size=len(texts)))
+            except Exception as e:
+                for pending in jobs:
+                    pending.future.set_exception(e)
+                continue
+
+            if job.priority == BULK:
+                self._adapt_bulk_batch(len(texts), (time.perf_counter() - started) * 1000)
+            offset = 0
+            for pending in jobs:
+                pending.future.set_result(vectors[offset:offset + len(pending.texts)])
+                offset += len(pending.texts)
+
+    async def encode(self, texts: List[str], priority: int = INTERACTIVE, model=None) -> np.ndarray:
+        model = model or get_embedding_model()
+        if not texts:
+            return np.empty((0, 0))
+        if priority == INTERACTIVE:
+            return await asyncio.wrap_future(self.submit(model, texts, INTERACTIVE))
+
+        # Ingesta: un lote en cola por llamada, así las consultas que lleguen
+        # mientras tanto se atienden entre un lote y el siguiente
+        parts, start = [], 0
+        while start < len(texts):
+            size = self.bulk_batch_size
+            parts.append(await asyncio.wrap_future(self.submit(model, texts[start:start + size], BULK)))
+            start += size
+        return np.concatenate(parts)
+
+    def snapshot(self) -> dict:
+        return {
+            "queued_interactive": self._depth[INTERACTIVE],
+            "queued_bulk": self._depth[BULK],
+            "bulk_batch_size": self.bulk_batch_size,
+            "ms_per_text": round(self.ms_per_text, 3) if self.ms_per_text is not None else None,
+        }
+
+
+embedding_scheduler = EmbeddingScheduler()
@@ -0,0 +1,64 @@
+import time
+from functools import lru_cache
+from typing import Optional
+from sentence_transformers import SentenceTransformer
+from app.core.config import settings
+
+# ---------------------------
+# Registro de modelos de embeddings: versión -> modelo y dimensión
+# ---------------------------
+EMBEDDING_MODELS = {
+    "minilm-l6-v2": {"model_name": "all-MiniLM-L6-v2", "size": 384},
+    "minilm-l3-v2": {"model_name": "paraphrase-MiniLM-L3-v2", "size": 384},
+    "multilingual-minilm-l12-v2": {"model_name": "paraphrase-multilingual-MiniLM-L12-v2", "size": 384},
+    "glove-6b-300d": {"model_name": "average_word_embeddings_glove.6B.300d", "size": 300},
+}
+
+_active_version: str = settings.EMBEDDING_MODEL_VERSION
+_last_refresh: float = 0.0
+
+
+def get_model_spec(version: str) -> dict:
+    if version not in EMBEDDING_MODELS:
+        raise ValueError(f"Versión de embeddings desconocida: '{version}'.")
+    return EMBEDDING_MODELS[version]
+
+
+@lru_cache(maxsize=None)
+def load_embedding_model(version: str) -> SentenceTransformer:
+    return SentenceTransformer(get_model_spec(version)["model_name"])
+
+
+def get_active_version() -> str:
+    return _active_version
+
+
+def set_active_version(version: str):
+    global _active_version, _last_refresh
+    get_model_spec(version)
+    _active_version = version
+    _last_refresh = time.monotonic()
+
+
+def get_embedding_model() -> SentenceTransformer:
+    return load_embedding_model(_active_version)
+
+
+def refresh_due() -> bool:
+    return time.monotonic() - _last_refresh >= settings.EMBEDDING_VERSION_REFRESH_SECONDS
+
+
+# ---------------------------
+# Nombres de colecciones versionadas: <alias>__<versión>__<marca de tiempo>
+# ---------------------------
+def versioned_collection_name(alias_name: str, version: str) -> str:
+    return f"{alias_name}__{version}__{int(time.time() * 1000)}"
+
+
+def version_from_collection(collection_name: Optional[str]) -> Optional[str]:
+    if not collection_name:
+        return None
+    parts = collection_name.split("__")
+    if len(parts) >= 3 and parts[1] in EMBEDDING_MODELS:
+        return parts[1]
+    return None
@@ -0,0 +1,140 @@
+import hashlib
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter
+from app.core.config import settings
+
+HTTP_CACHE_RESPONSES = Counter(
+    "http_cache_responses_total",
+    "Respuestas de los listados cacheables: 304, cuerpo desde la caché o generado.",
+    ["resource", "result"],
+)
+
+# Recursos versionados por usuario
+DOCUMENTS = "documents"
+HISTORY = "history"
+ME = "me"
+
+
+class ResourceVersion:
+    def __init__(self, ttl: float):
+        # El token aleatorio distingue esta versión de las de otros procesos
+        # y de la anterior a una expiración
+        self.token = secrets.token_hex(4)
+        self.counter = 0
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self.expires_at = time.monotonic() + ttl
+
+    @property
+    def tag(self) -> str:
+        return f"{self.token}.{self.counter}"
+
+
+# ---------------------------
+# GET condicional para los listados que el front consulta en bucle: cada
+# (usuario, recurso) tiene un contador que suben las subidas, las consultas y
+# los cambios de usuario. Con If-None-Match/If-Modified-Since vigentes se
+# responde 304 sin tocar la base de datos; si no, el cuerpo ya serializado se
+# sirve desde una caché LRU pequeña. Los contadores son por proceso y caducan
+# cada HTTP_CACHE_VERSION_TTL_SECONDS: un cambio hecho en otro worker se ve
+# como mucho ese tiempo después.
+# ---------------------------
+class ResponseCache:
+    def __init__(self, ttl: float, max_entries: int, max_body_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self._versions: Dict[Tuple[str, str], ResourceVersion] = {}
+        self._bodies: "OrderedDict[Tuple[str, str, str], Tuple[str, bytes, Dict[str, str]]]" = OrderedDict()
+
+    def _version(self, user_id: str, resource: str) -> ResourceVersion:
+        version = self._versions.get((user_id, resource))
+        if version is None or version.expires_at <= time.monotonic():
+            if len(self._versions) >= self.max_entries * 4:
+                now = time.monotonic()
+                self._versions = {k: v for k, v in self._versions.items() if v.expires_at > now}
+            version = self._versions[(user_id, resource)] = ResourceVersion(self.ttl)
+        return version
+
+    def tag(self, user_id: str, resource: str) -> str:
+        return self._version(user_id, resource).tag
+
+    def bump(self, user_id: str, *resources: str):
+        for resource in resources:
+            version = self._versions.get((user_id, resource))
+            if version is not None:
+                version.counter += 1
+                # Last-Modified tiene precisión de segundos: siempre avanza
+                version.last_modified = max(
+                    datetime.now(timezone.utc).replace(microsecond=0),
+                    version.last_modified + timedelta(seconds=1),
+                )
+
+    @staticmethod
+    def _not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # Con If-None-Match se ignora If-Modified-Since
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since) >= last_modified
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def respond(
+        self,
+        request: Request,
+        user_id: str,
+        resource: str,
+        build: Callable[[], Awaitable[Tuple[Any, Dict[str, str]]]],
+    ) -> Response:
+        # `build` devuelve (contenido, cabeceras extra) y solo se ejecuta si
+        # hay que generar el cuerpo
+        version = self._version(user_id, resource)
+        variant = request.url.query
+        variant_tag = hashlib.blake2b(variant.encode(), digest_size=4).hexdigest()
+        etag = f'W/"{version.tag}.{variant_tag}"'
+        validators = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(version.last_modified, usegmt=True),
+            "Cache-Control": "private, no-cache",
+        }
+        if self._not_modified(request, etag, version.last_modified):
+            HTTP_CACHE_RESPONSES.labels(resource, "not_modified").inc()
+            return Response(status_code=304, headers=validators)
+
+        key = (user_id, resource, variant)
+        cached = self._bodies.get(key)
+        if cached is not None and cached[0] == etag:
+            self._bodies.move_to_end(key)
+            HTTP_CACHE_RESPONSES.labels(resource, "cached").inc()
+            return Response(cached[1], media_type="application/json", headers={**cached[2], **validators})
+
+        counter = version.counter
+        content, headers = await build()
+        body = JSONResponse(jsonable_encoder(content)).body
+        # Si hubo un cambio mientras se generaba, el cuerpo no se guarda
+        if version.counter == counter and len(body) <= self.max_body_bytes:
+            self._bodies[key] = (etag, body, headers)
+            self._bodies.move_to_end(key)
+            if len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+        HTTP_CACHE_RESPONSES.labels(resource, "generated").inc()
+        return Response(body, media_type="application/json", headers={**headers, **validators})
+
+
+response_cache = ResponseCache(
+    settings.HTTP_CACHE_VERSION_TTL_SECONDS,
+    settings.HTTP_CACHE_MAX_ENTRIES,
+    settings.HTTP_CACHE_MAX_BODY_BYTES,
+)
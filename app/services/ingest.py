@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import zipfile
+from typing import List
+from fastapi import UploadFile
+from app.core.config import settings
+from app.core.database import async_session
+from app.services.pdf_extraction import extract_pages
+from app.services.rag import (
+    discard_plan,
+    embed_chunks,
+    persist_ingestion,
+    plan_ingestion,
+    refresh_active_version,
+    split_pages_into_chunks,
+)
+
+logger = logging.getLogger(__name__)
+
+# Marca de fin de flujo entre etapas
+_DONE = object()
+
+
+def is_zip(upload: UploadFile) -> bool:
+    return upload.content_type in ("application/zip", "application/x-zip-compressed") or (
+        upload.filename or ""
+    ).lower().endswith(".zip")
+
+
+class SpoolLimitExceeded(Exception):
+    pass
+
+
+def spool_to_disk(source, directory: str, max_bytes: int) -> str:
+    # Copia por bloques: nunca se carga el fichero completo en memoria. Se
+    # cuentan los bytes reales, no el tamaño que declara el origen.
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".pdf")
+    written = 0
+    with os.fdopen(fd, "wb") as out:
+        while block := source.read(1024 * 1024):
+            written += len(block)
+            if written > max_bytes:
+                out.close()
+                os.remove(path)
+                raise SpoolLimitExceeded(f"El archivo supera el máximo de {max_bytes} bytes.")
+            out.write(block)
+    return path
+
+
+def iter_sources(uploads: List[UploadFile], directory: str):
+    # Genera (nombre, ruta temporal o error) en orden; las entradas de un ZIP se
+    # descomprimen de una en una, solo cuando la etapa siguiente tiene hueco.
+    # Un ZIP admite como mucho BULK_MAX_FILES entradas y UPLOAD_MAX_BYTES
+    # descomprimidos en total (contra ZIP bombs).
+    for upload in uploads:
+        if is_zip(upload):
+            try:
+                archive = zipfile.ZipFile(upload.file)
+            except zipfile.BadZipFile:
+                yield upload.filename, None, "ZIP inválido."
+                continue
+            with archive:
+                entries = [info for info in archive.infolist() if not info.is_dir()]
+                if len(entries) > settings.BULK_MAX_FILES:
+                    yield upload.filename, None, f"El ZIP tiene más de {settings.BULK_MAX_FILES} archivos."
+                    continue
+                if sum(info.file_size for info in entries) > settings.UPLOAD_MAX_BYTES:
+                    yield upload.filename, None, f"El ZIP descomprimido supera {settings.UPLOAD_MAX_BYTES} bytes."
+                    continue
+                remaining = settings.UPLOAD_MAX_BYTES
+                for info in entries:
+                    name = os.path.basename(info.filename)
+                    if not name.lower().endswith(".pdf"):
+                        yield name, None, "El archivo debe ser un PDF."
+                        continue
+                    with archive.open(info) as entry:
+                        try:
+                            path = spool_to_disk(entry, directory, remaining)
+                        except SpoolLimitExceeded:
+                            # Los tamaños declarados mentían: se descarta el resto del ZIP
+                            yield name, None, f"El ZIP descomprimido supera {settings.UPLOAD_MAX_BYTES} bytes."
+                            break
+                    remaining -= os.path.getsize(path)
+                    yield name, path, None
+        elif upload.content_type == "application/pdf":
+            upload.file.seek(0)
+            try:
+                path = spool_to_disk(upload.file, directory, settings.UPLOAD_MAX_BYTES)
+            except SpoolLimitExceeded as e:
+                yield upload.filename, None, str(e)
+                continue
+            yield upload.filename, path, None
+        else:
+            yield upload.filename, None, "El archivo debe ser un PDF."
+
+
+def new_result(filename: str) -> dict:
+    return {
+        "filename": filename,
+        "status": "error",
+        "document_id": None,
+        "chunks_new": 0,
+        "chunks_kept": 0,
+        "chunks_removed": 0,
+        "chunks_skipped": 0,
+        "bytes": 0,
+        "error": None,
+        "seconds": 0.0,
+        "_started": time.perf_counter(),
+    }
+
+
+# ---------------------------
+# Ingesta masiva: origen -> extracción+división -> plan -> embeddings -> escritura,
+# etapas conectadas por colas acotadas para solapar CPU e I/O.
+# ---------------------------
+async def run_bulk_ingestion(uploads: List[UploadFile], user_id: str) -> dict:
+    started = time.perf_counter()
+    queue_size = settings.BULK_QUEUE_SIZE
+    to_extract: asyncio.Queue = asyncio.Queue(queue_size)
+    to_plan: asyncio.Queue = asyncio.Queue(queue_size)
+    to_embed: asyncio.Queue = asyncio.Queue(queue_size)
+    to_write: asyncio.Queue = asyncio.Queue(queue_size)
+    results: List[dict] = []
+    model_version = refresh_active_version()
+
+    def finish(result: dict, error: Exception = None):
+        if error is not None:
+            result["error"] = str(error)
+        result["seconds"] = round(time.perf_counter() - result.pop("_started"), 3)
+
+    async def source(directory: str):
+        seen = set()
+        iterator = iter_sources(uploads, directory)
+        try:
+            while True:
+                item = await asyncio.to_thread(next, iterator, None)
+                if item is None:
+                    break
+                filename, path, error = item
+                result = new_result(filename)
+                results.append(result)
+                # Dos versiones del mismo documento en un lote se pisarían en el diff
+                if filename in seen and error is None:
+                    error = "Nombre duplicado en el lote."
+                    os.remove(path)
+                if error is not None:
+                    finish(result, Exception(error))
+                    continue
+                seen.add(filename)
+                result["bytes"] = os.path.getsize(path)
+                await to_extract.put((result, path))
+        finally:
+            for _ in range(settings.BULK_EXTRACT_WORKERS):
+                await to_extract.put(_DONE)
+
+    async def extract_all():
+        await asyncio.gather(*(extract() for _ in range(settings.BULK_EXTRACT_WORKERS)))
+        await to_plan.put(_DONE)
+
+    async def extract():
+        while (item := await to_extract.get()) is not _DONE:
+            result, path = item
+            try:
+                pages = await extract_pages(path)
+                chunks = await asyncio.to_thread(split_pages_into_chunks, pages)
+                await to_plan.put((result, chunks))
+            except Exception as e:
+                finish(result, e)
+            finally:
+                os.remove(path)
+
+    async def plan(db):
+        while (item := await to_plan.get()) is not _DONE:
+            result, chunks = item
+            try:
+                ingestion_plan = await plan_ingestion(db, chunks, result["filename"], user_id)
+            except Exception as e:
+                finish(result, e)
+                continue
+            finally:
+                # Solo lectura: no se mantiene una transacción abierta durante el lote
+                await db.rollback()
+            await to_embed.put((result, ingestion_plan))
+        await to_embed.put(_DONE)
+
+    async def embed():
+        while (item := await to_embed.get()) is not _DONE:
+            result, ingestion_plan = item
+            try:
+                vectors = await embed_chunks([c["text"] for c in ingestion_plan["new"]])
+                await to_write.put((result, ingestion_plan, vectors))
+            except Exception as e:
+                discard_plan(ingestion_plan)
+                finish(result, e)
+        await to_write.put(_DONE)
+
+    async def write(db):
+        while (item := await to_write.get()) is not _DONE:
+            result, ingestion_plan, vectors = item
+            try:
+                document = await persist_ingestion(db, ingestion_plan, vectors, model_version)
+                result.update(
+                    status="ok",
+                    document_id=document.id if document else None,
+                    chunks_new=len(ingestion_plan["new"]),
+                    chunks_kept=len(ingestion_plan["kept"]),
+                    chunks_removed=len(ingestion_plan["removed"]),
+                    chunks_skipped=ingestion_plan["skipped"],
+                )
+                finish(result)
+            except Exception as e:
+                await db.rollback()
+                discard_plan(ingestion_plan)
+                finish(result, e)
+
+    with tempfile.TemporaryDirectory(prefix="rag_bulk_") as directory:
+        # Plan y escritura usan sesiones distintas: una AsyncSession no admite
+        # operaciones concurrentes. Si una etapa falla se cancelan las demás:
+        # quedarían bloqueadas en put()/get() de las colas.
+        async with async_session() as plan_db, async_session() as write_db:
+            tasks = [
+                asyncio.create_task(source(directory)),
+                asyncio.create_task(extract_all()),
+                asyncio.create_task(plan(plan_db)),
+                asyncio.create_task(embed()),
+                asyncio.create_task(write(write_db)),
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+    elapsed = time.perf_counter() - started
+    for result in results:
+        result.pop("_started", None)
+    ok = [r for r in results if r["status"] == "ok"]
+    chunks = sum(r["chunks_new"] for r in ok)
+    total_bytes = sum(r["bytes"] for r in ok)
+    logger.info(
+        "Ingesta masiva completada",
+        extra={"files_ok": len(ok), "files": len(results), "chunks": chunks, "seconds": round(elapsed, 1)},
+    )
+    return {
+        "results": results,
+        "files": len(results),
+        "files_ok": len(ok),
+        "chunks": chunks,
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "chunks_per_second": round(chunks / elapsed, 2) if elapsed else 0.0,
+        "mb_per_second": round(total_bytes / elapsed / 1e6, 3) if elapsed else 0.0,
+    }
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Dict
+from prometheus_client import Gauge, Histogram
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import engine
+
+# ---------------------------
+# Métricas de las etapas del pipeline RAG (se exponen en GET /metrics junto
+# con las de admisión, circuit breakers, planificador de embeddings, etc.)
+# ---------------------------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Duración de cada etapa de las consultas y de la ingesta.",
+    ["pipeline", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+PDF_EXTRACTION_SECONDS = Histogram(
+    "pdf_extraction_seconds",
+    "Extracción de texto de un PDF completo por motor.",
+    ["engine"],
+    buckets=LATENCY_BUCKETS,
+)
+TEXT_SPLIT_SECONDS = Histogram(
+    "text_split_seconds",
+    "División del texto de un documento en chunks.",
+    buckets=LATENCY_BUCKETS,
+)
+EMBEDDING_BATCH_SECONDS = Histogram(
+    "embedding_batch_seconds",
+    "Llamadas a encode del modelo de embeddings por prioridad y tamaño de lote.",
+    ["priority", "batch_size"],
+    buckets=LATENCY_BUCKETS,
+)
+DEPENDENCY_SECONDS = Histogram(
+    "dependency_call_seconds",
+    "Llamadas a Qdrant y Groq por operación y resultado.",
+    ["dependency", "operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Histogram(
+    "llm_tokens",
+    "Tokens por llamada al LLM (prompt = entrada, completion = salida).",
+    ["direction"],
+    buckets=(50, 100, 250, 500, 1000, 2000, 3000, 4000, 8000),
+)
+DB_COMMIT_SECONDS = Histogram(
+    "db_commit_seconds",
+    "Duración de los commits de la base de datos por operación.",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Duración de las peticiones HTTP por ruta y código de estado.",
+    ["method", "handler", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Peticiones HTTP en curso.",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Conexiones del pool de SQLAlchemy por estado.",
+    ["state"],
+)
+
+
+def _pool_stat(method: str):
+    # Se lee en el momento del scrape; los pools sin esa cuenta (NullPool) dan 0
+    def read() -> float:
+        pool = engine.sync_engine.pool
+        return max(0, getattr(pool, method)()) if hasattr(pool, method) else 0
+    return read
+
+
+for _state, _method in (("size", "size"), ("checked_out", "checkedout"), ("idle", "checkedin"), ("overflow", "overflow")):
+    DB_POOL_CONNECTIONS.labels(_state).set_function(_pool_stat(_method))
+
+
+def batch_size_label(size: int) -> str:
+    for limit in (1, 8, 32, 128):
+        if size <= limit:
+            return f"<={limit}"
+    return ">128"
+
+
+@contextmanager
+def observe(histogram, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def observe_dependency(dependency: str, operation: str):
+    # Como call_dependency: la etiqueta outcome depende de cómo terminó el bloque
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        DEPENDENCY_SECONDS.labels(dependency, operation, outcome).observe(time.perf_counter() - started)
+
+
+def observe_stages(pipeline: str, timings: Dict[str, float]):
+    # `timings` en milisegundos, como los que rellenan process_query e ingest_pdf
+    for stage, ms in timings.items():
+        STAGE_SECONDS.labels(pipeline, stage).observe(ms / 1000)
+
+
+async def timed_commit(db: AsyncSession, operation: str):
+    with observe(DB_COMMIT_SECONDS, operation=operation):
+        await db.commit()
@@ -0,0 +1,52 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(row_id)
+    except Exception:
+        raise InvalidCursor("Cursor de paginación no válido.")
+
+
+# ---------------------------
+# Paginación por cursor (keyset) en orden (created_at, id) descendente: cada
+# página continúa justo después de la última fila de la anterior, así el coste
+# no crece con la profundidad como con OFFSET. Los índices compuestos
+# (…, created_at, id) de los modelos cubren el filtro y el orden.
+# ---------------------------
+async def keyset_page(
+    db: AsyncSession,
+    stmt,
+    created_col,
+    id_col,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List, Optional[str]]:
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(created_col, id_col) < tuple_(created_at, row_id))
+    stmt = stmt.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+    rows = (await db.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
+    return rows, next_cursor
@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import os
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.metrics import PDF_EXTRACTION_SECONDS, observe
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------
+# Motores de extracción de texto
+# ---------------------------
+class PDFExtractor(ABC):
+    name = "base"
+
+    @abstractmethod
+    def page_count(self, file_path: str) -> int:
+        ...
+
+    @abstractmethod
+    def extract_page(self, file_path: str, page_number: int) -> str:
+        ...
+
+
+class PyPDF2Extractor(PDFExtractor):
+    name = "pypdf2"
+
+    def __init__(self):
+        self._reader = None
+        self._reader_key = None
+
+    def _get_reader(self, file_path: str):
+        # Cada proceso del pool reutiliza el lector del último fichero abierto
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+        if self._reader_key != key:
+            import PyPDF2
+            self._reader = PyPDF2.PdfReader(file_path)
+            self._reader_key = key
+        return self._reader
+
+    def page_count(self, file_path: str) -> int:
+        return len(self._get_reader(file_path).pages)
+
+    def extract_page(self, file_path: str, page_number: int) -> str:
+        return self._get_reader(file_path).pages[page_number].extract_text() or ""
+
+
+class PyMuPDFExtractor(PDFExtractor):
+    name = "pymupdf"
+
+    def __init__(self):
+        import fitz  # pymupdf (opcional)
+        self._fitz = fitz
+        self._document = None
+        self._document_key = None
+
+    def _get_document(self, file_path: str):
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+        if self._document_key != key:
+            if self._document is not None:
+                self._document.close()
+            self._document = self._fitz.open(file_path)
+            self._document_key = key
+        return self._document
+
+    def page_count(self, file_path: str) -> int:
+        return self._get_document(file_path).page_count
+
+    def extract_page(self, file_path: str, page_number: int) -> str:
+        return self._get_document(file_path).load_page(page_number).get_text()
+
+
+class PdfminerExtractor(PDFExtractor):
+    name = "pdfminer"
+
+    def __init__(self):
+        from pdfminer import high_level  # pdfminer.six (opcional)
+        from pdfminer.pdfpage import PDFPage
+        self._high_level = high_level
+        self._pdf_page = PDFPage
+
+    def page_count(self, file_path: str) -> int:
+        # Solo recorre el árbol de páginas, sin análisis de layout
+        with open(file_path, "rb") as f:
+            return sum(1 for _ in self._pdf_page.get_pages(f))
+
+    def extract_page(self, file_path: str, page_number: int) -> str:
+        return self._high_level.extract_text(file_path, page_numbers=[page_number])
+
+
+EXTRACTORS = {
+    extractor.name: extractor
+    for extractor in (PyPDF2Extractor, PyMuPDFExtractor, PdfminerExtractor)
+}
+
+# Instancias por proceso (en el proceso principal y en cada worker del pool)
+_instances: Dict[str, PDFExtractor] = {}
+
+
+def get_extractor(engine: str) -> PDFExtractor:
+    if engine not in EXTRACTORS:
+        raise ValueError(f"Motor de extracción desconocido: '{engine}'. Opciones: {', '.join(EXTRACTORS)}.")
+    if engine not in _instances:
+        _instances[engine] = EXTRACTORS[engine]()
+    return _instances[engine]
+
+
+def available_extractors() -> List[str]:
+    available = []
+    for engine in EXTRACTORS:
+        try:
+            get_extractor(engine)
+            available.append(engine)
+        except ImportError:
+            pass
+    return available
+
+
+def _page_count_worker(engine: str, file_path: str) -> int:
+    return get_extractor(engine).page_count(file_path)
+
+
+def _extract_page_worker(engine: str, file_path: str, page_number: int) -> str:
+    return get_extractor(engine).extract_page(file_path, page_number)
+
+
+# ---------------------------
+# Pool de procesos compartido
+# ---------------------------
+_pool: Optional[ProcessPoolExecutor] = None
+# Limita las tareas enviadas al número de workers: así cada página empieza a
+# ejecutarse al enviarse y el timeout mide solo su extracción, no la cola.
+_slots: Optional[asyncio.Semaphore] = None
+# Pools retirados por el timeout de otra página: sus tareas no tienen la culpa
+_retired_for_timeout: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.PDF_EXTRACT_WORKERS)
+    return _pool
+
+
+def retire_pool(pool: ProcessPoolExecutor, timed_out: bool = False):
+    # Un worker bloqueado en una página patológica no se puede cancelar: se
+    # reemplaza el pool y se terminan sus procesos. Las páginas de otras
+    # subidas que estuvieran en él reciben BrokenProcessPool y se reintentan
+    # en el pool nuevo tantas veces como haga falta (ver _run_in_pool).
+    global _pool
+    if _pool is pool:
+        _pool = None
+    if timed_out:
+        _retired_for_timeout.add(pool)
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False)
+    for process in processes:
+        process.terminate()
+
+
+def shutdown_pool():
+    global _pool, _slots
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+    _slots = None
+
+
+async def _run_in_pool(timeout: float, func, *args):
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.PDF_EXTRACT_WORKERS)
+    loop = asyncio.get_running_loop()
+    crashes = 0
+    async with _slots:
+        while True:
+            pool = get_pool()
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(pool, func, *args), timeout)
+            except asyncio.TimeoutError:
+                retire_pool(pool, timed_out=True)
+                raise
+            except BrokenProcessPool:
+                if pool in _retired_for_timeout:
+                    # Lo retiró el timeout de otra página: se reintenta sin límite
+                    continue
+                # El pool se rompió solo (un worker murió): un único reintento
+                retire_pool(pool)
+                crashes += 1
+                if crashes > 1:
+                    raise
+
+
+async def extract_pages(file_path: str, engine: Optional[str] = None) -> List[str]:
+    engine = engine or settings.PDF_EXTRACTOR
+    with observe(PDF_EXTRACTION_SECONDS, engine=engine):
+        return await _extract_pages(file_path, engine)
+
+
+async def _extract_pages(file_path: str, engine: str) -> List[str]:
+    get_extractor(engine)  # valida el motor y sus dependencias antes de usar el pool
+
+    if settings.PDF_EXTRACT_WORKERS <= 0:
+        # Modo sin pool (depuración / benchmarks): todo en un hilo
+        def extract_inline():
+            extractor = get_extractor(engine)
+            return [extractor.extract_page(file_path, n) for n in range(extractor.page_count(file_path))]
+        return await asyncio.to_thread(extract_inline)
+
+    timeout = settings.PDF_PAGE_TIMEOUT_SECONDS
+    page_count = await _run_in_pool(timeout, _page_count_worker, engine, file_path)
+
+    async def extract_one(page_number: int) -> str:
+        try:
+            return await _run_in_pool(timeout, _extract_page_worker, engine, file_path, page_number)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Página omitida por timeout",
+                extra={"file_path": file_path, "page": page_number, "timeout_s": timeout},
+            )
+            return ""
+        except BrokenProcessPool:
+            # Solo se marca esta página como fallida; el resto del documento sigue
+            logger.warning(
+                "Página omitida: el worker de extracción terminó de forma inesperada",
+                extra={"file_path": file_path, "page": page_number},
+            )
+            return ""
+
+    return list(await asyncio.gather(*(extract_one(n) for n in range(page_count))))
@@ -0,0 +1,42 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Una etapa: (nombres de las etapas de las que depende, función async que
+# recibe sus resultados en ese mismo orden)
+Stage = Tuple[List[str], Callable[..., Awaitable[Any]]]
+
+
+# ---------------------------
+# Grafo de etapas async: cada etapa arranca en cuanto terminan sus
+# dependencias, las independientes corren a la vez y cada una anota su
+# duración (ms) en `timings`.
+# ---------------------------
+async def run_stage_graph(stages: Dict[str, Stage], timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    timings = {} if timings is None else timings
+    for name, (deps, _) in stages.items():
+        missing = [dep for dep in deps if dep not in stages]
+        if missing:
+            raise ValueError(f"La etapa '{name}' depende de etapas inexistentes: {', '.join(missing)}.")
+
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(name: str, deps: List[str], func):
+        inputs = [await tasks[dep] for dep in deps]
+        started = time.perf_counter()
+        try:
+            return await func(*inputs)
+        finally:
+            timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    # Todas las tareas se crean antes de que ninguna se ejecute, así que el
+    # orden de declaración no importa
+    for name, (deps, func) in stages.items():
+        tasks[name] = asyncio.create_task(run(name, deps, func))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return {name: task.result() for name, task in tasks.items()}
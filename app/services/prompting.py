@@ -0,0 +1,96 @@
+import logging
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------
+# Conteo de tokens con tiktoken (codificación cacheada por proceso). Si
+# tiktoken o su codificación no están disponibles se estiman ~4 caracteres
+# por token.
+# ---------------------------
+@lru_cache(maxsize=None)
+def get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(settings.PROMPT_TOKEN_ENCODING)
+    except Exception as e:
+        logger.warning("tiktoken no disponible; se estiman 4 caracteres por token", extra={"error": str(e)})
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[: max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def fit_items(items: List[str], budget: int) -> Tuple[List[str], int]:
+    # `items` va de mayor a menor valor: se conservan enteros mientras caben,
+    # el primero que no cabe se trunca (si queda sitio útil) y el resto se descarta
+    kept, used = [], 0
+    for item in items:
+        remaining = budget - used
+        tokens = count_tokens(item)
+        if tokens <= remaining:
+            kept.append(item)
+            used += tokens
+            continue
+        if remaining >= settings.PROMPT_MIN_ITEM_TOKENS:
+            kept.append(truncate_to_tokens(item, remaining))
+            used += remaining
+        break
+    return kept, used
+
+
+# ---------------------------
+# Reparto del presupuesto del prompt: instrucciones y pregunta primero,
+# después el historial (hasta PROMPT_HISTORY_MAX_TOKENS) y el resto para el
+# contexto recuperado.
+# ---------------------------
+def assemble_prompt(
+    template: str,
+    query: str,
+    history: List[str],
+    documents: Optional[List[str]],
+    empty_context: str,
+) -> Tuple[str, Optional[str], dict]:
+    question = truncate_to_tokens(query, settings.PROMPT_QUESTION_MAX_TOKENS)
+    instructions = count_tokens(template.format(history="", context="", query=question))
+    available = max(0, settings.PROMPT_MAX_TOKENS - instructions)
+
+    kept_history, history_tokens = fit_items(history, min(settings.PROMPT_HISTORY_MAX_TOKENS, available))
+    kept_documents, context_tokens = fit_items(documents or [], available - history_tokens)
+
+    context = None
+    if documents is not None:
+        context = " ".join(kept_documents) or empty_context
+    prompt = template.format(
+        history="\n\n".join(kept_history),
+        context=context or "",
+        query=question,
+    )
+    stats = {
+        "total": count_tokens(prompt),
+        "instructions": instructions,
+        "history": history_tokens,
+        "history_items": f"{len(kept_history)}/{len(history)}",
+        "context": context_tokens,
+        "context_items": f"{len(kept_documents)}/{len(documents or [])}",
+    }
+    return prompt, context, stats
@@ -1,31 +1,85 @@
-from datetime import datetime
-import aiofiles
-import io
-import PyPDF2
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
 import pytz
 import uuid
+from nanoid import generate
 from groq import Groq
-from typing import List
+from typing import Dict, List, Optional, Tuple, Union
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
+from qdrant_client.models import (
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    PointIdsList,
+    PointStruct,
+    SearchParams,
+    SearchRequest,
+    SetPayload,
+    SetPayloadOperation,
+)
 from app.core.config import settings
+from app.core.database import async_session
 from app.models.logger import Logger
 from app.models.rag import Document, History
+from app.services.pdf_extraction import extract_pages
+from app.services.embedding_scheduler import BULK, embedding_scheduler
+from app.services.pipeline import run_stage_graph
+from app.services.prompting import assemble_prompt
+from app.services.singleflight import SingleFlight, normalize_query
+from app.services.resilience import Deadline, DependencyUnavailable, call_dependency
+from app.services.audit import ACTION_QUERY, ACTION_UPLOAD
+from app.services.dedup import dedup_stats, get_signature_index, simhash
+from app.services.http_cache import DOCUMENTS, HISTORY, response_cache
+from app.services.metrics import (
+    LLM_TOKENS,
+    TEXT_SPLIT_SECONDS,
+    observe,
+    observe_dependency,
+    observe_stages,
+    timed_commit,
+)
+from app.services.embeddings import (
+    get_active_version,
+    get_embedding_model,
+    get_model_spec,
+    refresh_due,
+    set_active_version,
+    version_from_collection,
+    versioned_collection_name,
+)
 from langchain.memory import ConversationBufferMemory
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+logger = logging.getLogger(__name__)
+
 groq_api_key = settings.GROQ_API_KEY
 
 if groq_api_key is None:
     raise ValueError("GROQ_API_KEY não está definido. Por favor, verifique o seu .env file.")
 
-client = Groq(api_key=groq_api_key)
+# Sin reintentos internos: los fallos los gestiona el circuit breaker
+client = Groq(
+    api_key=groq_api_key,
+    base_url=settings.GROQ_BASE_URL,
+    timeout=settings.GROQ_TIMEOUT_SECONDS,
+    max_retries=settings.GROQ_MAX_RETRIES,
+)
 
-qdrant_client = QdrantClient(settings.QDRANT_URL)
+# Mismo timeout que call_dependency: el hilo de to_thread no sigue ocupado tras el plazo
+qdrant_client = QdrantClient(settings.QDRANT_URL, timeout=settings.QDRANT_TIMEOUT_SECONDS)
+# Nombre lógico de la colección: un alias de Qdrant que apunta a la colección
+# de la versión de embeddings activa (documents__<versión>__<marca>)
 COLLECTION_NAME = "documents"
+# Cambia con cada cambio de alias: junto a la versión de DOCUMENTS de cada
+# usuario identifica los documentos visibles para sus consultas (clave del singleflight)
+index_state = {"generation": 0}
 
 
 def validate_or_generate_uuid(doc_id: str) -> str:
@@ -34,15 +88,81 @@ def validate_or_generate_uuid(doc_id: str) -> str:
     except ValueError:
         return str(uuid.uuid4())
 
-try:
-    qdrant_client.get_collection(COLLECTION_NAME)
-except:
-    qdrant_client.recreate_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config={"size": 384, "distance": "Cosine"}  # Ajusta el tamaño según el modelo de embeddings
+# ---------------------------
+# Alias de Qdrant y versión activa de embeddings
+# ---------------------------
+def get_alias_target(alias_name: str) -> Optional[str]:
+    for alias in qdrant_client.get_aliases().aliases:
+        if alias.alias_name == alias_name:
+            return alias.collection_name
+    return None
+
+
+def collection_exists(collection_name: str) -> bool:
+    collections = qdrant_client.get_collections().collections
+    return any(collection.name == collection_name for collection in collections)
+
+
+def create_versioned_collection(version: str) -> str:
+    collection_name = versioned_collection_name(COLLECTION_NAME, version)
+    qdrant_client.create_collection(
+        collection_name=collection_name,
+        vectors_config={"size": get_model_spec(version)["size"], "distance": "Cosine"},
     )
+    return collection_name
+
+
+def swap_alias(alias_name: str, new_collection: str, old_collection: Optional[str]):
+    operations = []
+    if old_collection is None and collection_exists(alias_name):
+        # Instalaciones antiguas: "documents" todavía es una colección real y hay
+        # que eliminarla antes de poder crear el alias. Se comprueba antes con un
+        # alias provisional que la colección nueva admite alias, para que el
+        # hueco sin colección sea solo el de la operación final.
+        staging_alias = f"{alias_name}__staging"
+        staging = []
+        if get_alias_target(staging_alias) is not None:  # restos de un intento fallido
+            staging.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=staging_alias)))
+        staging.append(
+            CreateAliasOperation(create_alias=CreateAlias(collection_name=new_collection, alias_name=staging_alias))
+        )
+        qdrant_client.update_collection_aliases(change_aliases_operations=staging)
+        qdrant_client.delete_collection(alias_name)
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=staging_alias)))
+    elif old_collection is not None:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias_name)))
+    operations.append(
+        CreateAliasOperation(
+            create_alias=CreateAlias(collection_name=new_collection, alias_name=alias_name)
+        )
+    )
+    # Qdrant aplica la lista de operaciones de forma atómica
+    try:
+        qdrant_client.update_collection_aliases(change_aliases_operations=operations)
+    except Exception:
+        logger.critical(
+            "No se pudo apuntar el alias a la colección nueva; la colección nueva se conserva",
+            extra={"alias": alias_name, "collection": new_collection, "previous_collection": old_collection},
+        )
+        raise
+    index_state["generation"] += 1
+
 
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+def refresh_active_version(force: bool = False) -> str:
+    # Otros procesos pueden haber cambiado el alias tras una migración
+    if force or refresh_due():
+        target = get_alias_target(COLLECTION_NAME)
+        set_active_version(version_from_collection(target) or settings.EMBEDDING_MODEL_VERSION)
+    return get_active_version()
+
+
+if get_alias_target(COLLECTION_NAME) is None and not collection_exists(COLLECTION_NAME):
+    swap_alias(
+        COLLECTION_NAME,
+        create_versioned_collection(settings.EMBEDDING_MODEL_VERSION),
+        None,
+    )
+refresh_active_version(force=True)
 
 memory = ConversationBufferMemory()
 
@@ -50,15 +170,19 @@ memory = ConversationBufferMemory()
 # Funciones de Memoria
 # ---------------------------
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,  # Tamaño máximo de cada chunk (en caracteres)
-    chunk_overlap=200,  # Solapamiento entre chunks (opcional)
-    length_function=len,  # Función para calcular la longitud del texto
-    separators=["\n\n", "\n", " ", ""]  # Separadores para dividir el texto
-)
+def make_text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,  # Tamaño máximo de cada chunk (en caracteres)
+        chunk_overlap=chunk_overlap,  # Solapamiento entre chunks (opcional)
+        length_function=len,  # Función para calcular la longitud del texto
+        separators=["\n\n", "\n", " ", ""]  # Separadores para dividir el texto
+    )
+
 
-def split_text_into_chunks(text: str) -> List[str]:
-    chunks = text_splitter.split_text(text)
+text_splitter = make_text_splitter(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+
+def split_text_into_chunks(text: str, splitter: Optional[RecursiveCharacterTextSplitter] = None) -> List[str]:
+    chunks = (splitter or text_splitter).split_text(text)
     return chunks
 
 
@@ -74,7 +198,11 @@ async def summarize_memory(history: str) -> str:
     Resumen:
     """
 
-    response = client.chat.completions.create(
+    response = await call_dependency(
+        "groq",
+        settings.GROQ_TIMEOUT_SECONDS,
+        None,
+        client.chat.completions.create,
         model="llama-3.3-70b-versatile",
         messages=[{"role": "system", "content": prompt_summary}],
         max_tokens=100,  # Limitando o resumo a 100 tokens
@@ -93,9 +221,11 @@ async def add_memory(user_id: str, user_input: str, bot_response: str, db: Async
         user_id=user_id
     )
     db.add(history_entry)
-    await db.commit()
+    await timed_commit(db, "add_memory")
+    response_cache.bump(user_id, HISTORY)
 
-async def get_memory(user_id: str, db: AsyncSession) -> str:
+async def get_memory_entries(user_id: str, db: AsyncSession) -> List[str]:
+    # Últimas 5 interacciones, de la más reciente a la más antigua
     stmt = (
         select(History.query_text, History.response_text, History.created_at)
         .where(History.user_id == user_id)
@@ -105,27 +235,262 @@ async def get_memory(user_id: str, db: AsyncSession) -> str:
     result = await db.execute(stmt)
     history_data = result.fetchall()
 
-    conversation_history = ""
-    for query_text, response_text, created_at in history_data:
-        conversation_history += f"- **Fecha:** {created_at.strftime('%Y-%m-%d %H:%M:%S')}\n"
-        conversation_history += f"  **Pregunta:** {query_text}\n"
-        conversation_history += f"  **Respuesta:** {response_text}\n\n"
+    return [
+        f"- **Fecha:** {created_at.strftime('%Y-%m-%d %H:%M:%S')}\n"
+        f"  **Pregunta:** {query_text}\n"
+        f"  **Respuesta:** {response_text}"
+        for query_text, response_text, created_at in history_data
+    ]
 
-    return conversation_history.strip()
+
+async def get_memory(user_id: str, db: AsyncSession) -> str:
+    return "\n\n".join(await get_memory_entries(user_id, db))
 
 # ---------------------------
 # Extraer texto de PDF de forma asíncrona
 # ---------------------------
-async def extract_text_from_pdf(file_path: str) -> str:   
-    text = ""
-    async with aiofiles.open(file_path, "rb") as file:
-        content = await file.read()
-    reader = PyPDF2.PdfReader(io.BytesIO(content))
-    for page in reader.pages:
-        page_text = page.extract_text()
-        if page_text:
-            text += page_text + " "
-    return text.strip()
+async def extract_text_from_pdf(file_path: str, engine: Optional[str] = None) -> str:
+    # Extracción por página en paralelo con el motor configurado (PDF_EXTRACTOR)
+    pages = await extract_pages(file_path, engine)
+    return " ".join(page_text for page_text in pages if page_text).strip()
+
+
+def split_pages_into_chunks(pages: List[str], splitter: Optional[RecursiveCharacterTextSplitter] = None) -> List[str]:
+    # Se divide cada página por separado: una edición solo cambia los chunks de
+    # su página y el resto conserva su hash en una re-ingesta incremental.
+    chunks = []
+    for page_text in pages:
+        if page_text and page_text.strip():
+            chunks.extend(split_text_into_chunks(page_text, splitter))
+    return chunks
+
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+# ---------------------------
+# Ingesta por etapas: plan (diff + casi-duplicados), embeddings y escritura
+# ---------------------------
+async def plan_ingestion(db: AsyncSession, chunks: List[str], filename: str, user_id: str) -> dict:
+    # Chunks ya almacenados del mismo documento lógico (mismo nombre y usuario)
+    result = await db.execute(
+        select(Document.id, Document.content_hash, Document.chunk_text, Document.chunk_index)
+        .where(
+            Document.user_id == user_id,
+            Document.filename == filename,
+            Document.deleted == False,
+        )
+    )
+    existing = {}
+    for chunk_id, content_hash, chunk_text, chunk_index in result.all():
+        content_hash = content_hash or (chunk_hash(chunk_text) if chunk_text is not None else None)
+        existing.setdefault(content_hash, []).append((chunk_id, chunk_index))
+
+    new, kept, reindexed, previous_index = [], [], {}, {}
+    for i, chunk in enumerate(chunks):
+        content_hash = chunk_hash(chunk)
+        if existing.get(content_hash):
+            chunk_id, old_index = existing[content_hash].pop()
+            kept.append(chunk_id)
+            if old_index != i:
+                reindexed[chunk_id] = i
+                previous_index[chunk_id] = old_index
+        else:
+            new.append({"index": i, "text": chunk, "hash": content_hash})
+    removed = [chunk_id for rows in existing.values() for chunk_id, _ in rows]
+
+    # Los chunks que desaparecen salen del índice de firmas antes de buscar
+    # casi-duplicados, para que su versión editada no se descarte.
+    signature_index = await get_signature_index(db, user_id)
+    removed_signatures = [
+        (signature_index.signatures[chunk_id], chunk_id)
+        for chunk_id in removed
+        if chunk_id in signature_index.signatures
+    ]
+    signature_index.remove(removed)
+
+    to_embed, skipped, skipped_bytes, flagged, first_duplicate_of = [], 0, 0, 0, None
+    for item in new:
+        item["signature"] = simhash(item["text"])
+        duplicate_of = signature_index.find_near_duplicate(item["signature"]) if settings.DEDUP_MODE != "off" else None
+        if duplicate_of and settings.DEDUP_MODE == "skip":
+            skipped += 1
+            skipped_bytes += len(item["text"].encode("utf-8"))
+            first_duplicate_of = first_duplicate_of or duplicate_of
+            continue
+        if duplicate_of:
+            item["near_duplicate_of"] = duplicate_of
+            flagged += 1
+        item["id"] = str(uuid.uuid4())
+        to_embed.append(item)
+        # Se registra ya para detectar repeticiones dentro del mismo documento
+        # o lote; discard_plan lo revierte si la escritura falla.
+        signature_index.add([(item["signature"], item["id"])])
+
+    return {
+        "filename": filename,
+        "user_id": user_id,
+        "total": len(chunks),
+        "new": to_embed,
+        "kept": kept,
+        "reindexed": reindexed,
+        "previous_index": previous_index,
+        "removed": removed,
+        "skipped": skipped,
+        "skipped_bytes": skipped_bytes,
+        "flagged": flagged,
+        # Primer chunk existente del que se omitió un casi-duplicado
+        "duplicate_of": first_duplicate_of,
+        "signature_index": signature_index,
+        "removed_signatures": removed_signatures,
+    }
+
+
+def discard_plan(plan: dict):
+    plan["signature_index"].remove([item["id"] for item in plan["new"]])
+    plan["signature_index"].add(plan["removed_signatures"])
+
+
+async def embed_chunks(texts: List[str]) -> List[List[float]]:
+    if not texts:
+        return []
+    # Prioridad de ingesta: las consultas interactivas pasan por delante
+    return (await embedding_scheduler.encode(texts, BULK)).tolist()
+
+
+async def persist_ingestion(
+    db: AsyncSession,
+    plan: dict,
+    vectors: List[List[float]],
+    model_version: str,
+) -> Optional[Document]:
+    filename, user_id = plan["filename"], plan["user_id"]
+    upload_date = datetime.now(pytz.utc)
+    points, documents = [], []
+    for item, vector in zip(plan["new"], vectors):
+        payload = {
+            "text": item["text"],
+            "filename": filename,
+            "user_id": user_id,
+            "upload_date": str(upload_date),
+            "chunk_index": item["index"],
+            "model_version": model_version
+        }
+        if item.get("near_duplicate_of"):
+            payload["near_duplicate_of"] = item["near_duplicate_of"]
+        points.append(PointStruct(id=item["id"], vector=vector, payload=payload))
+        documents.append(Document(
+            id=item["id"],
+            filename=filename,
+            vector_data=vector,
+            chunk_text=item["text"],
+            chunk_index=item["index"],
+            content_hash=item["hash"],
+            embedding_version=model_version,
+            user_id=user_id,
+            upload_date=upload_date
+        ))
+
+    # Qdrant no participa en la transacción: cada cambio aplicado registra su
+    # inverso y, si algo falla antes de confirmar el commit, se deshacen.
+    undo = []
+    try:
+        for start in range(0, len(points), settings.QDRANT_UPSERT_BATCH_SIZE):
+            batch = points[start:start + settings.QDRANT_UPSERT_BATCH_SIZE]
+            undo.append(("delete", PointIdsList(points=[point.id for point in batch])))
+            with observe_dependency("qdrant", "upsert"):
+                await asyncio.to_thread(qdrant_client.upsert, collection_name=COLLECTION_NAME, points=batch)
+        if plan["removed"]:
+            # Se leen antes de borrarlos para poder restaurarlos
+            with observe_dependency("qdrant", "retrieve"):
+                records = await asyncio.to_thread(
+                    qdrant_client.retrieve,
+                    collection_name=COLLECTION_NAME,
+                    ids=plan["removed"],
+                    with_payload=True,
+                    with_vectors=True,
+                )
+            undo.append(("upsert", [
+                PointStruct(id=record.id, vector=record.vector, payload=record.payload) for record in records
+            ]))
+            with observe_dependency("qdrant", "delete"):
+                await asyncio.to_thread(
+                    qdrant_client.delete,
+                    collection_name=COLLECTION_NAME,
+                    points_selector=PointIdsList(points=plan["removed"]),
+                )
+            await db.execute(
+                update(Document).where(Document.id.in_(plan["removed"])).values(deleted=True, updated_at=upload_date)
+            )
+        if plan["reindexed"]:
+            undo.append(("set_payload", plan["previous_index"]))
+            with observe_dependency("qdrant", "set_payload"):
+                await set_chunk_indexes(plan["reindexed"])
+            await db.execute(
+                update(Document),
+                [
+                    {"id": chunk_id, "chunk_index": index, "updated_at": upload_date}
+                    for chunk_id, index in plan["reindexed"].items()
+                ],
+            )
+
+        db.add_all(documents)
+        db.add(Logger(
+            action=(
+                f"Documento '{filename}' up-loaded: {len(documents)} chunks nuevos, "
+                f"{len(plan['kept'])} sin cambios, {len(plan['removed'])} eliminados, "
+                f"{plan['skipped']} casi-duplicados omitidos."
+            ),
+            created_at=datetime.now(pytz.utc),
+            user_id=user_id,
+            action_type=ACTION_UPLOAD
+        ))
+        await timed_commit(db, "persist_ingestion")
+    except BaseException:
+        await undo_qdrant_changes(undo)
+        raise
+
+    vector_bytes = get_model_spec(model_version)["size"] * 4
+    response_cache.bump(user_id, DOCUMENTS)
+    dedup_stats["chunks_seen"] += plan["total"]
+    dedup_stats["chunks_skipped"] += plan["skipped"]
+    dedup_stats["chunks_flagged"] += plan["flagged"]
+    dedup_stats["embeddings_saved"] += plan["skipped"]
+    dedup_stats["bytes_saved"] += plan["skipped"] * vector_bytes + plan["skipped_bytes"]
+
+    if documents:
+        return documents[-1]
+    # Nada nuevo que guardar: se devuelve un chunk existente del documento o,
+    # si todo eran casi-duplicados, el primero de los que ya estaban guardados
+    fallback_id = plan["kept"][-1] if plan["kept"] else plan["duplicate_of"]
+    return await db.get(Document, fallback_id) if fallback_id else None
+
+
+async def set_chunk_indexes(indexes: Dict[str, int]):
+    await asyncio.to_thread(
+        qdrant_client.batch_update_points,
+        collection_name=COLLECTION_NAME,
+        update_operations=[
+            SetPayloadOperation(set_payload=SetPayload(payload={"chunk_index": index}, points=[chunk_id]))
+            for chunk_id, index in indexes.items()
+        ],
+    )
+
+
+async def undo_qdrant_changes(undo: list):
+    # Del último cambio al primero; un fallo aquí se registra y no oculta el original
+    for operation, argument in reversed(undo):
+        try:
+            if operation == "delete":
+                await asyncio.to_thread(
+                    qdrant_client.delete, collection_name=COLLECTION_NAME, points_selector=argument
+                )
+            elif operation == "upsert" and argument:
+                await asyncio.to_thread(qdrant_client.upsert, collection_name=COLLECTION_NAME, points=argument)
+            elif operation == "set_payload":
+                await set_chunk_indexes(argument)
+        except Exception:
+            logger.exception("No se pudo deshacer un cambio en Qdrant", extra={"operation": operation})
 
 # ---------------------------
 # Función para almacenar embeddings en Qdrant
@@ -133,96 +498,144 @@ async def extract_text_from_pdf(file_path: str) -> str:
 async def store_embedding(
     db: AsyncSession, 
     doc_id: str, 
-    text_content: str, 
+    text_content: Union[str, List[str]], 
     filename: str, 
-    user_id: str
+    user_id: str,
+    timings: Optional[Dict[str, float]] = None,
 ):
-    print(f"📥 Guardando documento en Qdrant - ID: {doc_id}")
-    
-    chunks = split_text_into_chunks(text_content)
+    logger.debug("Guardando documento en Qdrant", extra={"doc_id": doc_id, "file": filename})
+    timings = {} if timings is None else timings
+
+    def lap(stage: str, started: float):
+        timings[stage] = round((time.perf_counter() - started) * 1000, 2)
+
+    # text_content puede ser el texto completo o la lista de páginas del PDF
+    started = time.perf_counter()
+    with observe(TEXT_SPLIT_SECONDS):
+        if isinstance(text_content, list):
+            chunks = split_pages_into_chunks(text_content)
+        else:
+            chunks = split_text_into_chunks(text_content)
+    lap("split", started)
+    model_version = refresh_active_version()
     
-    for i, chunk in enumerate(chunks):
-        chunk_id = str(uuid.uuid4())
-        
-        embedding = embedding_model.encode(chunk).tolist()
-        
-        qdrant_client.upsert(
-            collection_name=COLLECTION_NAME,
-            points=[
-                PointStruct(
-                    id=chunk_id,
-                    vector=embedding,
-                    payload={
-                        "text": chunk,
-                        "filename": filename,
-                        "user_id": user_id,
-                        "upload_date": str(datetime.now(pytz.utc)),
-                        "chunk_index": i  
-                    }
-                )
-            ]
-        )        
-        document = Document(
-            id=chunk_id,
-            filename=filename,
-            vector_data=embedding,
-            user_id=user_id,
-            upload_date=datetime.now(pytz.utc)
-        )
-        db.add(document)
-        await db.commit()
-        await db.refresh(document)
+    started = time.perf_counter()
+    plan = await plan_ingestion(db, chunks, filename, user_id)
+    lap("plan", started)
+    try:
+        started = time.perf_counter()
+        vectors = await embed_chunks([item["text"] for item in plan["new"]])
+        lap("embed", started)
+        started = time.perf_counter()
+        document = await persist_ingestion(db, plan, vectors, model_version)
+        lap("persist", started)
+    except BaseException:
+        discard_plan(plan)
+        raise
     
-    db_log = Logger(
-        action=f"Documento '{filename}' up-loaded en {len(chunks)} chunks.",
-        created_at=datetime.now(pytz.utc),
-        user_id=user_id
+    observe_stages("ingest", timings)
+    logger.info(
+        "Documento guardado en Qdrant",
+        extra={
+            "file": filename,
+            "chunks_new": len(plan["new"]),
+            "chunks_kept": len(plan["kept"]),
+            "chunks_removed": len(plan["removed"]),
+            "chunks_skipped": plan["skipped"],
+            "timings_ms": timings,
+        },
     )
-    db.add(db_log)
-    await db.commit()
-    await db.refresh(db_log)
-    
-    print(f"✅ Documento guardado en Qdrant en {len(chunks)} chunks.")
     return document
 
+async def ingest_pdf(
+    db: AsyncSession,
+    file_path: str,
+    filename: str,
+    user_id: str,
+    timings: Optional[Dict[str, float]] = None,
+):
+    # Se pasan las páginas por separado para que la re-ingesta sea incremental
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    pages = await extract_pages(file_path)
+    timings["extract"] = round((time.perf_counter() - started) * 1000, 2)
+    return await store_embedding(db, generate(), pages, filename, user_id, timings)
+
 # ---------------------------
 # Consultar documentos más cercanos en base a embeddings
 # ---------------------------
-async def query_embedding(query_vector: List[float], top_k: int = 3):
-    print(f"🔍 Consultando documentos similares en Qdrant")
-    
-    search_results = qdrant_client.search(
+def search_params() -> Optional[SearchParams]:
+    if settings.QDRANT_SEARCH_HNSW_EF <= 0:
+        return None
+    return SearchParams(hnsw_ef=settings.QDRANT_SEARCH_HNSW_EF)
+
+
+async def query_embedding(query_vector: List[float], top_k: Optional[int] = None, deadline: Optional[Deadline] = None):
+    search_results = await call_dependency(
+        "qdrant",
+        settings.QDRANT_TIMEOUT_SECONDS,
+        deadline,
+        qdrant_client.search,
         collection_name=COLLECTION_NAME,
         query_vector=query_vector,
-        limit=top_k
+        limit=top_k or settings.RETRIEVAL_TOP_K,
+        search_params=search_params()
     )
     
     if not search_results:
-        print("⚠️ No hay documentos en Qdrant.")
+        logger.debug("No hay documentos en Qdrant")
         return {"documents": []}
     
     documents = [hit.payload["text"] for hit in search_results if "text" in hit.payload]
-    print("🔍 Documentos recuperados:", documents)
+    logger.debug("Documentos recuperados de Qdrant", extra={"documents": len(documents)})
     return {"documents": documents}
 
+
+async def query_embedding_batch(
+    query_vectors: List[List[float]],
+    top_k: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+) -> List[List[str]]:
+    # Una sola petición a Qdrant para todas las consultas del lote
+    if not query_vectors:
+        return []
+
+    batch_results = await call_dependency(
+        "qdrant",
+        settings.QDRANT_TIMEOUT_SECONDS,
+        deadline,
+        qdrant_client.search_batch,
+        collection_name=COLLECTION_NAME,
+        requests=[
+            SearchRequest(
+                vector=vector,
+                limit=top_k or settings.RETRIEVAL_TOP_K,
+                params=search_params(),
+                with_payload=True,
+            )
+            for vector in query_vectors
+        ],
+    )
+    return [
+        [hit.payload["text"] for hit in hits if hit.payload and "text" in hit.payload]
+        for hits in batch_results
+    ]
+
 # ---------------------------
 # Procesar consulta (RAG)
 # ---------------------------
+DATE_KEYWORDS = ["fecha", "cuándo", "día", "momento"]
 
 
+def is_date_related(query: str) -> bool:
+    return any(keyword in query.lower() for keyword in DATE_KEYWORDS)
 
-async def process_query(query: str, user_id: str, db: AsyncSession) -> str:
-    raw_history = await get_memory(user_id, db)  # Obtém histórico
-    #summarized_history = await summarize_memory(raw_history)  # Resumo do histórico
-    is_date_related_query = any(keyword in query.lower() for keyword in ["fecha", "cuándo", "día", "momento"])
-   
 
-    if is_date_related_query:
-        prompt = f"""
+DATE_PROMPT = """
         Eres un asistente de IA especializado en documentos. Usa la información a continuación para responder.        
                 
         **Historial de conversación resumido:**
-        {raw_history}
+        {history}
         
         **Instrucción adicional:**
         - Si la pregunta está relacionada con fechas, responde indicando la fecha exacta en que se realizó la pregunta.
@@ -231,16 +644,12 @@ async def process_query(query: str, user_id: str, db: AsyncSession) -> str:
         **Pregunta:** {query}
         **Respuesta esperada:**
         """
-    else:
-        query_embedding_vector = embedding_model.encode(query).tolist()
-        results = await query_embedding(query_embedding_vector)
-        context = " ".join(results["documents"]) or "Sin contexto adicional."
 
-        prompt = f"""
+CONTEXT_PROMPT = """
         Eres un asistente de IA especializado en documentos. Usa la información a continuación para responder.
         
         **Historial de conversación resumido:**
-        {raw_history}
+        {history}
 
         **Contexto relevante:**
         {context}
@@ -248,26 +657,222 @@ async def process_query(query: str, user_id: str, db: AsyncSession) -> str:
         **Pregunta:** {query}
         **Respuesta esperada:**
         """
-        
+
+NO_CONTEXT = "Sin contexto adicional."
+
+
+def build_prompt(query: str, history: List[str], documents: Optional[List[str]] = None) -> Tuple[str, Optional[str]]:
+    # Sin documentos (None) se usa el prompt de preguntas sobre fechas. El
+    # historial llega del más reciente al más antiguo y los documentos por
+    # relevancia: al recortar se descarta primero lo último de cada lista.
+    template = DATE_PROMPT if documents is None else CONTEXT_PROMPT
+    prompt, context, stats = assemble_prompt(template, query, history, documents, NO_CONTEXT)
+    logger.info("Prompt ensamblado", extra={"prompt_tokens": stats})
+    return prompt, context
+
+
+def generate_answer(prompt: str) -> str:
     response = client.chat.completions.create(
         model="llama-3.3-70b-versatile",
         messages=[{"role": "system", "content": prompt}],
         max_tokens=600,
         temperature=0.5
     )
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        LLM_TOKENS.labels("prompt").observe(usage.prompt_tokens or 0)
+        LLM_TOKENS.labels("completion").observe(usage.completion_tokens or 0)
+    return response.choices[0].message.content.strip()
+
+# ---------------------------
+# Modos degradados cuando Qdrant o Groq no responden
+# ---------------------------
+
+
+def skip_retrieval(e: DependencyUnavailable):
+    if settings.QDRANT_DEGRADED_MODE != "skip_retrieval":
+        raise e
+    logger.warning("Se responde sin recuperar contexto", extra={"reason": e.detail})
+
+
+async def retrieve_context(query_vector: List[float], deadline: Deadline) -> List[str]:
+    try:
+        results = await query_embedding(query_vector, deadline=deadline)
+    except DependencyUnavailable as e:
+        skip_retrieval(e)
+        return []
+    return results["documents"]
+
+
+async def retrieve_contexts(query_vectors: List[List[float]], deadline: Deadline) -> List[List[str]]:
+    try:
+        return await query_embedding_batch(query_vectors, deadline=deadline)
+    except DependencyUnavailable as e:
+        skip_retrieval(e)
+        return [[] for _ in query_vectors]
+
+
+async def answer_with_fallback(prompt: str, context: Optional[str], deadline: Deadline) -> str:
+    try:
+        return await call_dependency("groq", settings.GROQ_TIMEOUT_SECONDS, deadline, generate_answer, prompt)
+    except DependencyUnavailable as e:
+        if settings.LLM_DEGRADED_MODE != "context_only" or context in (None, NO_CONTEXT):
+            raise
+        logger.warning("Se responde solo con el contexto recuperado", extra={"reason": e.detail})
+        return (
+            "El servicio de generación no está disponible en este momento. "
+            f"Fragmentos relevantes de sus documentos:\n\n{context}"
+        )
 
-    assistant_response = response.choices[0].message.content.strip()
 
+query_flight = SingleFlight("query")
+
+
+async def process_query(
+    query: str,
+    user_id: str,
+    db: AsyncSession,
+    timings: Optional[Dict[str, float]] = None,
+) -> str:
+    # Grafo de etapas: el historial (BD) y embedding -> búsqueda (Qdrant) son
+    # independientes y corren a la vez; la generación espera a ambos.
+    timings = {} if timings is None else timings
+    deadline = Deadline(settings.QUERY_DEADLINE_SECONDS)
+    date_query = is_date_related(query)
+
+    async def memory():
+        # Sesión propia: el cálculo compartido puede sobrevivir a la petición
+        # que lo inició (y a su sesión de get_db)
+        async with async_session() as memory_db:
+            return await get_memory_entries(user_id, memory_db)  # Obtém histórico
+
+    async def embed():
+        if date_query:
+            return None
+        refresh_active_version()
+        return (await embedding_scheduler.encode([query]))[0].tolist()
+
+    async def retrieve(query_embedding_vector):
+        if query_embedding_vector is None:
+            return None
+        return await retrieve_context(query_embedding_vector, deadline)
+
+    async def generate(history, documents):
+        prompt, context = build_prompt(query, history, documents)
+        return await answer_with_fallback(prompt, context, deadline)
+
+    async def compute():
+        # Devuelve también los tiempos de cada etapa: todos los que comparten
+        # el cálculo los incluyen en su Server-Timing
+        stage_timings: Dict[str, float] = {}
+        results = await run_stage_graph(
+            {
+                "memory": ([], memory),
+                "embed": ([], embed),
+                "retrieve": (["embed"], retrieve),
+                "generate": (["memory", "retrieve"], generate),
+            },
+            stage_timings,
+        )
+        return results["generate"], stage_timings
+
+    # Consultas idénticas y simultáneas del mismo usuario comparten el cálculo
+    # (historial, búsqueda y LLM); cada una guarda después su propio historial.
+    # La versión de DOCUMENTS es por usuario: la subida de otro no impide coalescer
+    key = (
+        user_id,
+        normalize_query(query),
+        get_active_version(),
+        index_state["generation"],
+        response_cache.tag(user_id, DOCUMENTS),
+    )
+    (assistant_response, stage_timings), shared = await query_flight.do(key, compute)
+    timings.update(stage_timings)
+
+    started = time.perf_counter()
     await add_memory(user_id, query, assistant_response, db)
-    
+
     db_log = Logger(
         action=f"Query '{query}' up-loaded.",
         created_at=datetime.now(pytz.utc),
-        user_id=user_id
+        user_id=user_id,
+        action_type=ACTION_QUERY
     )
     db.add(db_log)
-    await db.commit()
-    await db.refresh(db_log)
+    await timed_commit(db, "query_log")
+    timings["persist"] = round((time.perf_counter() - started) * 1000, 2)
 
+    observe_stages("query", timings)
+    logger.info("Consulta procesada", extra={"shared": shared, "timings_ms": timings})
     return assistant_response
 
+# ---------------------------
+# Procesar un lote de consultas: un encode, una búsqueda en Qdrant y
+# llamadas al LLM concurrentes (con límite); respuestas en el orden recibido
+# ---------------------------
+async def process_query_batch(
+    queries: List[str],
+    user_id: str,
+    db: AsyncSession,
+    timings: Optional[Dict[str, float]] = None,
+) -> List[str]:
+    if not queries:
+        return []
+    timings = {} if timings is None else timings
+    deadline = Deadline(settings.QUERY_BATCH_DEADLINE_SECONDS)
+    retrieval_positions = [i for i, query in enumerate(queries) if not is_date_related(query)]
+
+    async def retrieve():
+        documents: List[Optional[List[str]]] = [None] * len(queries)
+        if not retrieval_positions:
+            return documents
+        refresh_active_version()
+        texts = [queries[i] for i in retrieval_positions]
+        vectors = (await embedding_scheduler.encode(texts)).tolist()
+        for position, docs in zip(retrieval_positions, await retrieve_contexts(vectors, deadline)):
+            documents[position] = docs
+        return documents
+
+    # Todas las consultas del lote ven el mismo historial (el previo al lote)
+    results = await run_stage_graph(
+        {
+            "memory": ([], lambda: get_memory_entries(user_id, db)),
+            "retrieve": ([], retrieve),
+        },
+        timings,
+    )
+    history, documents = results["memory"], results["retrieve"]
+
+    semaphore = asyncio.Semaphore(settings.QUERY_BATCH_LLM_CONCURRENCY)
+
+    async def answer(query: str, docs: Optional[List[str]]) -> str:
+        async with semaphore:
+            prompt, context = build_prompt(query, history, docs)
+            return await answer_with_fallback(prompt, context, deadline)
+
+    started = time.perf_counter()
+    answers = await asyncio.gather(*(answer(q, d) for q, d in zip(queries, documents)))
+    timings["generate"] = round((time.perf_counter() - started) * 1000, 2)
+
+    # Escritura única del historial y del log; marcas de tiempo crecientes para
+    # conservar el orden del lote en get_memory
+    now = datetime.now(pytz.utc)
+    db.add_all([
+        History(
+            query_text=query,
+            response_text=response,
+            user_id=user_id,
+            created_at=now + timedelta(microseconds=i),
+        )
+        for i, (query, response) in enumerate(zip(queries, answers))
+    ])
+    db.add_all([
+        Logger(action=f"Query '{query}' up-loaded.", created_at=now, user_id=user_id, action_type=ACTION_QUERY)
+        for query in queries
+    ])
+    await timed_commit(db, "query_batch")
+    response_cache.bump(user_id, HISTORY)
+    observe_stages("query_batch", timings)
+    logger.info("Lote de consultas procesado", extra={"queries": len(queries), "timings_ms": timings})
+
+    return list(answers)
@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+import pytz
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from qdrant_client.models import PointIdsList, PointStruct
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.rag import Document
+from app.services.rag import (
+    COLLECTION_NAME,
+    create_versioned_collection,
+    get_alias_target,
+    qdrant_client,
+    refresh_active_version,
+    swap_alias,
+)
+
+logger = logging.getLogger(__name__)
+
+# Evita reconstrucciones o migraciones de embeddings simultáneas en el mismo proceso
+index_maintenance_lock = asyncio.Lock()
+
+rebuild_status: dict = {"state": "idle"}
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+class IndexRebuildError(Exception):
+    pass
+
+
+def row_to_point(row) -> PointStruct:
+    payload = {
+        "filename": row.filename,
+        "user_id": row.user_id,
+        "upload_date": str(row.upload_date),
+        "chunk_index": row.chunk_index,
+        "model_version": row.embedding_version,
+    }
+    if row.chunk_text is not None:
+        payload["text"] = row.chunk_text
+    return PointStruct(id=row.id, vector=[float(value) for value in row.vector_data], payload=payload)
+
+
+DOCUMENT_COLUMNS = (
+    Document.id,
+    Document.vector_data,
+    Document.chunk_text,
+    Document.chunk_index,
+    Document.filename,
+    Document.user_id,
+    Document.upload_date,
+    Document.embedding_version,
+    Document.deleted,
+)
+
+
+# ---------------------------
+# Pasada de recuperación: las subidas, borrados y cambios confirmados mientras
+# se copiaba la instantánea fueron a la colección anterior (por el alias); se
+# aplican también a la nueva. Es idempotente y puede repetirse.
+# ---------------------------
+async def catch_up_changes(
+    db: AsyncSession,
+    collection: str,
+    model_version: str,
+    since: datetime,
+    batch_size: int,
+) -> dict:
+    changes = {"upserted": 0, "deleted": 0}
+    # Transacción nueva: tiene que ver lo confirmado después de la instantánea
+    await db.rollback()
+    stmt = (
+        select(*DOCUMENT_COLUMNS)
+        .where(Document.updated_at >= since)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(stmt)
+    async for rows in result.partitions():
+        points = [row_to_point(row) for row in rows if not row.deleted and row.embedding_version == model_version]
+        gone = [row.id for row in rows if row.deleted or row.embedding_version != model_version]
+        if points:
+            await asyncio.to_thread(qdrant_client.upsert, collection_name=collection, points=points, wait=True)
+        if gone:
+            await asyncio.to_thread(
+                qdrant_client.delete,
+                collection_name=collection,
+                points_selector=PointIdsList(points=gone),
+                wait=True,
+            )
+        changes["upserted"] += len(points)
+        changes["deleted"] += len(gone)
+    await db.rollback()
+    return changes
+
+
+# ---------------------------
+# Reconstrucción del índice
+# ---------------------------
+async def rebuild_qdrant_index(
+    db: AsyncSession,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    keep_old: bool = False,
+) -> dict:
+    batch_size = batch_size or settings.REINDEX_BATCH_SIZE
+    workers = workers or settings.REINDEX_WORKERS
+
+    if index_maintenance_lock.locked():
+        raise IndexRebuildError("Ya hay una operación de mantenimiento del índice en curso.")
+
+    async with index_maintenance_lock:
+        started = time.perf_counter()
+        since = datetime.now(pytz.utc) - timedelta(seconds=settings.REINDEX_CATCHUP_MARGIN_SECONDS)
+        old_collection = get_alias_target(COLLECTION_NAME)
+        model_version = refresh_active_version(force=True)
+        new_collection = create_versioned_collection(model_version)
+        logger.info("Reconstruyendo Qdrant desde Postgres", extra={"collection": new_collection})
+
+        semaphore = asyncio.Semaphore(workers)
+        pending: List[asyncio.Task] = []
+        total_rows = 0
+        missing_text = 0
+
+        async def upsert_batch(points: List[PointStruct]):
+            try:
+                await asyncio.to_thread(
+                    qdrant_client.upsert,
+                    collection_name=new_collection,
+                    points=points,
+                    wait=True,
+                )
+            finally:
+                semaphore.release()
+
+        try:
+            # yield_per abre un cursor de servidor: las filas llegan por lotes
+            # y nunca se cargan todas en memoria.
+            stmt = (
+                select(*DOCUMENT_COLUMNS)
+                .where(Document.deleted == False, Document.embedding_version == model_version)
+                .execution_options(yield_per=batch_size)
+            )
+            result = await db.stream(stmt)
+            async for rows in result.partitions():
+                points = [row_to_point(row) for row in rows]
+                total_rows += len(points)
+                missing_text += sum(1 for row in rows if row.chunk_text is None)
+                # Se adquiere antes de crear la tarea para limitar los lotes en vuelo
+                await semaphore.acquire()
+                pending.append(asyncio.create_task(upsert_batch(points)))
+            await asyncio.gather(*pending)
+
+            indexed = (await asyncio.to_thread(qdrant_client.count, collection_name=new_collection, exact=True)).count
+            if indexed != total_rows:
+                raise IndexRebuildError(
+                    f"Conteo inconsistente: {total_rows} filas en Postgres, {indexed} puntos en Qdrant."
+                )
+            caught_up = await catch_up_changes(db, new_collection, model_version, since, batch_size)
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            await asyncio.to_thread(qdrant_client.delete_collection, new_collection)
+            raise
+
+        swap_alias(COLLECTION_NAME, new_collection, old_collection)
+        # Lo confirmado entre la pasada anterior y el cambio de alias también
+        # cayó en la colección anterior: se espera a que terminen las ingestas
+        # en curso y se repite antes de borrarla.
+        await asyncio.sleep(settings.EMBEDDING_VERSION_REFRESH_SECONDS)
+        late = await catch_up_changes(db, new_collection, model_version, since, batch_size)
+        if old_collection and not keep_old:
+            await asyncio.to_thread(qdrant_client.delete_collection, old_collection)
+
+        elapsed = time.perf_counter() - started
+        logger.info("Índice reconstruido", extra={"points": indexed, "seconds": round(elapsed, 1)})
+        return {
+            "collection": new_collection,
+            "model_version": model_version,
+            "previous_collection": old_collection,
+            "rows": total_rows,
+            "points": indexed,
+            "caught_up": {key: caught_up[key] + late[key] for key in caught_up},
+            "missing_text": missing_text,
+            "seconds": round(elapsed, 2),
+        }
+
+
+# ---------------------------
+# Reconstrucción en segundo plano (endpoint de administración): puede durar más
+# que los timeouts de un proxy o cliente HTTP; el estado se consulta aparte.
+# ---------------------------
+async def run_index_rebuild(batch_size: Optional[int], workers: Optional[int], keep_old: bool) -> dict:
+    rebuild_status.update(state="running", started_at=str(datetime.now(pytz.utc)))
+    try:
+        async with async_session() as db:
+            report = await rebuild_qdrant_index(db, batch_size, workers, keep_old)
+    except BaseException as e:
+        rebuild_status.update(state="failed", error=str(e) or type(e).__name__)
+        raise
+    rebuild_status.update(state="completed", **report)
+    return dict(rebuild_status)
+
+
+def start_index_rebuild(
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    keep_old: bool = False,
+) -> dict:
+    global _rebuild_task
+    if index_maintenance_lock.locked() or (_rebuild_task and not _rebuild_task.done()):
+        raise IndexRebuildError("Ya hay una operación de mantenimiento del índice en curso.")
+
+    rebuild_status.clear()
+    rebuild_status.update(state="starting", error=None)
+    _rebuild_task = asyncio.create_task(run_index_rebuild(batch_size, workers, keep_old))
+    _rebuild_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return dict(rebuild_status)
+
+
+async def main():
+    from app.core.logging_config import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Reconstruye la colección de Qdrant desde Postgres.")
+    parser.add_argument("--batch-size", type=int, default=settings.REINDEX_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=settings.REINDEX_WORKERS)
+    parser.add_argument("--keep-old", action="store_true", help="No eliminar la colección anterior.")
+    args = parser.parse_args()
+
+    async with async_session() as db:
+        report = await rebuild_qdrant_index(db, args.batch_size, args.workers, args.keep_old)
+    print(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
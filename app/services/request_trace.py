@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from fastapi import Request
+from nanoid import generate
+from app.core.config import settings
+from app.models.user import User
+
+slow_logger = logging.getLogger("app.slow_requests")
+
+PROFILE_HEADER = "x-profile"
+# Módulos donde esperan los hilos sin trabajo (pools, planificador): se omiten
+IDLE_MODULES = ("threading", "queue", "concurrent.futures.thread")
+
+
+class SamplingProfiler:
+    # Muestrea las pilas de todos los hilos (bucle de eventos, pools y
+    # planificador de embeddings) y las agrega en formato "collapsed"
+    # (una línea `pila;de;llamadas N`), el que leen flamegraph.pl y speedscope.
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self.samples: Counter = Counter()
+        self.loop_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        # Solo avisa: join() bloquea hasta el siguiente muestreo, fuera del bucle de eventos
+        self._stop.set()
+
+    def join(self):
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident != self.loop_thread and frame.f_globals.get("__name__") in IDLE_MODULES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+profiles: "OrderedDict[str, str]" = OrderedDict()
+# Un solo perfil a la vez: el muestreo cubre todo el proceso
+_profile_slot = threading.Lock()
+
+
+def store_profile(profiler: SamplingProfiler) -> str:
+    profile_id = generate(size=12)
+    profiles[profile_id] = profiler.collapsed()
+    while len(profiles) > settings.PROFILE_MAX_STORED:
+        profiles.popitem(last=False)
+    return profile_id
+
+
+def server_timing(timings: Dict[str, float], total_ms: float) -> str:
+    # Las etapas concurrentes se solapan: su suma puede superar `total`
+    entries = [f"{stage};dur={ms}" for stage, ms in timings.items()]
+    entries.append(f"total;dur={total_ms}")
+    return ", ".join(entries)
+
+
+def trace_headers(scope) -> Dict[str, str]:
+    # Las cabeceras las añade TraceHeadersMiddleware a la respuesta, sea cual
+    # sea: también a la de una HTTPException, que descarta la `Response`
+    # inyectada en el endpoint
+    return scope.get("state", {}).get("trace_headers", {})
+
+
+# ---------------------------
+# Traza de una petición: las etapas que rellena el servicio (en ms) salen en
+# la cabecera Server-Timing y, por encima de SLOW_REQUEST_MS, en el log de
+# peticiones lentas. Un Admin puede pedir con `X-Profile: 1` un perfil por
+# muestreo de la petición; se descarga en /admin/profiles/{X-Profile-Id}.
+# ---------------------------
+@asynccontextmanager
+async def request_trace(request: Request, endpoint: str, user: User):
+    timings: Dict[str, float] = {}
+    headers = request.scope.setdefault("state", {}).setdefault("trace_headers", {})
+    profiler: Optional[SamplingProfiler] = None
+    if (
+        request.headers.get(PROFILE_HEADER)
+        and user.role == "Admin"
+        and _profile_slot.acquire(blocking=False)
+    ):
+        profiler = SamplingProfiler(settings.PROFILE_SAMPLE_INTERVAL_MS)
+        profiler.start()
+
+    started = time.perf_counter()
+    failed = True
+    try:
+        yield timings
+        failed = False
+    finally:
+        total_ms = round((time.perf_counter() - started) * 1000, 2)
+        if profiler is not None:
+            profiler.stop()
+            try:
+                await asyncio.to_thread(profiler.join)
+            finally:
+                _profile_slot.release()
+            headers["X-Profile-Id"] = store_profile(profiler)
+        headers["Server-Timing"] = server_timing(timings, total_ms)
+        if settings.SLOW_REQUEST_MS > 0 and total_ms >= settings.SLOW_REQUEST_MS:
+            slow_logger.warning(
+                "Petición lenta",
+                extra={
+                    "endpoint": endpoint,
+                    "user_id": user.id,
+                    "total_ms": total_ms,
+                    "timings_ms": timings,
+                    "failed": failed,
+                },
+            )
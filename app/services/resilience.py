@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from prometheus_client import Counter, Gauge
+from app.core.config import settings
+from app.services.metrics import DEPENDENCY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Estado del circuit breaker (0 = cerrado, 1 = semiabierto, 2 = abierto).",
+    ["dependency"],
+)
+BREAKER_FAILURES = Counter(
+    "circuit_breaker_failures_total",
+    "Fallos (errores o timeouts) registrados por dependencia.",
+    ["dependency"],
+)
+BREAKER_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total",
+    "Llamadas rechazadas sin intentar porque el circuito estaba abierto.",
+    ["dependency"],
+)
+BREAKER_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total",
+    "Cambios de estado del circuit breaker.",
+    ["dependency", "state"],
+)
+
+STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class DependencyUnavailable(Exception):
+    def __init__(self, dependency: str, detail: str):
+        super().__init__(detail)
+        self.dependency = dependency
+        self.detail = detail
+
+
+# ---------------------------
+# Plazo (deadline) de una petición: se crea al entrar y cada etapa consume
+# del mismo presupuesto de tiempo
+# ---------------------------
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+# ---------------------------
+# Circuit breaker: tras N fallos seguidos se abre y rechaza las llamadas
+# durante `reset_seconds`; después deja pasar una de prueba (semiabierto).
+# ---------------------------
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+        BREAKER_STATE.labels(name).set(STATE_VALUES["closed"])
+
+    def _transition(self, state: str):
+        if state != self.state:
+            self.state = state
+            BREAKER_STATE.labels(self.name).set(STATE_VALUES[state])
+            BREAKER_TRANSITIONS.labels(self.name, state).inc()
+            logger.warning("Cambio de estado del circuit breaker", extra={"dependency": self.name, "state": state})
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    BREAKER_REJECTIONS.labels(self.name).inc()
+                    return False
+                self._transition("half_open")
+                return True
+            if self.state == "half_open":
+                # Solo una llamada de prueba a la vez
+                BREAKER_REJECTIONS.labels(self.name).inc()
+                return False
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self._transition("closed")
+
+    def record_failure(self):
+        with self.lock:
+            BREAKER_FAILURES.labels(self.name).inc()
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition("open")
+
+    def release(self):
+        # Llamada de prueba abortada sin resultado (p. ej. sin tiempo restante)
+        with self.lock:
+            if self.state == "half_open":
+                self.opened_at = time.monotonic() - self.reset_seconds
+                self._transition("open")
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+breakers: Dict[str, CircuitBreaker] = {
+    "groq": CircuitBreaker("groq", settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_SECONDS),
+    "qdrant": CircuitBreaker("qdrant", settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_SECONDS),
+}
+
+
+async def call_dependency(
+    dependency: str,
+    timeout: float,
+    deadline: Optional[Deadline],
+    func,
+    *args,
+    **kwargs,
+):
+    # Ejecuta una llamada bloqueante en un hilo con el menor de los dos límites:
+    # el timeout propio de la dependencia y lo que quede del plazo de la petición.
+    breaker = breakers[dependency]
+    if not breaker.allow():
+        raise DependencyUnavailable(dependency, f"Circuito abierto para '{dependency}'.")
+
+    budget = timeout if deadline is None else min(timeout, deadline.remaining())
+    if budget <= 0:
+        breaker.release()
+        raise DependencyUnavailable(dependency, "Plazo de la petición agotado.")
+
+    operation = getattr(func, "__name__", "call")
+    started = time.perf_counter()
+
+    def observe(outcome: str):
+        DEPENDENCY_SECONDS.labels(dependency, operation, outcome).observe(time.perf_counter() - started)
+
+    try:
+        result = await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), budget)
+    except asyncio.TimeoutError:
+        observe("timeout")
+        # Solo cuenta como fallo si se agotó el timeout propio de la dependencia,
+        # no el plazo de la petición
+        if budget >= timeout:
+            breaker.record_failure()
+        else:
+            breaker.release()
+        raise DependencyUnavailable(dependency, f"'{dependency}' no respondió en {budget:.1f}s.")
+    except asyncio.CancelledError:
+        observe("cancelled")
+        # Petición cancelada (p. ej. el cliente cerró la conexión): sin veredicto
+        breaker.release()
+        raise
+    except Exception as e:
+        observe("error")
+        breaker.record_failure()
+        raise DependencyUnavailable(dependency, f"Error en '{dependency}': {e}.") from e
+
+    observe("ok")
+    breaker.record_success()
+    return result
@@ -0,0 +1,53 @@
+import asyncio
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from prometheus_client import Counter, Gauge
+
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Llamadas a cálculos coalescibles, según se ejecutaron o se unieron a uno en curso.",
+    ["name", "result"],
+)
+SINGLEFLIGHT_IN_FLIGHT = Gauge(
+    "singleflight_in_flight",
+    "Cálculos distintos en curso.",
+    ["name"],
+)
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    return _SPACES_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip().lower()
+
+
+# ---------------------------
+# Singleflight: las llamadas concurrentes con la misma clave comparten un
+# único cálculo en curso. El cálculo corre en su propia tarea, así que
+# cancelar a quien lo inició no cancela a los demás.
+# ---------------------------
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        # Marca la excepción como recuperada aunque todos los llamantes se hayan ido
+        task.cancelled() or task.exception()
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        SINGLEFLIGHT_IN_FLIGHT.labels(self.name).set(len(self._calls))
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        # Devuelve (resultado, compartido): compartido = True si se reutilizó
+        # un cálculo iniciado por otra llamada
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.create_task(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            SINGLEFLIGHT_IN_FLIGHT.labels(self.name).set(len(self._calls))
+        SINGLEFLIGHT_CALLS.labels(self.name, "shared" if shared else "executed").inc()
+        return await asyncio.shield(task), shared
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import random
+from typing import Optional
+from fastapi import Request
+from app.core.config import settings
+
+
+# ---------------------------
+# Captura de tráfico (opt-in con TRAFFIC_CAPTURE_FILE): una línea JSON por
+# petición con su forma, sin contenido: ruta (plantilla, sin ids), método,
+# estado, duración, tamaño del cuerpo, longitud de la consulta y un cubo de
+# usuario (hash con clave del id). Cada línea se escribe con un solo write()
+# en modo O_APPEND, así que varios workers pueden compartir el fichero.
+# Claves: t (epoch s), m, r, s, ms, in (bytes), f (bytes del PDF),
+# q (caracteres de la consulta), n (consultas del lote), u (cubo).
+# ---------------------------
+class TrafficRecorder:
+    def __init__(self, path: str, sample_rate: float, user_buckets: int):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.user_buckets = max(1, user_buckets)
+        self._fd: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def sampled(self) -> bool:
+        return self.enabled and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def user_bucket(self, user_id: str) -> int:
+        digest = hashlib.blake2b(
+            user_id.encode(), key=(settings.DB_SECRET_KEY or "").encode()[:64], digest_size=4
+        ).digest()
+        return int.from_bytes(digest, "big") % self.user_buckets
+
+    def record(self, entry: dict):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        os.write(self._fd, (json.dumps(entry, separators=(",", ":")) + "\n").encode())
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+traffic_recorder = TrafficRecorder(
+    settings.TRAFFIC_CAPTURE_FILE,
+    settings.TRAFFIC_CAPTURE_SAMPLE_RATE,
+    settings.TRAFFIC_CAPTURE_USER_BUCKETS,
+)
+
+
+def capture_fields(request: Request, **fields):
+    # Los endpoints añaden campos a la línea que escribe el middleware
+    if traffic_recorder.enabled:
+        request.scope.setdefault("state", {}).setdefault("capture", {}).update(fields)
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+import aiofiles
+from nanoid import generate
+from app.core.config import settings
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+UPLOAD_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Un lock por sesión: dos PUT concurrentes no pueden escribir a la vez
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+class UploadSessionError(Exception):
+    def __init__(self, status_code: int, detail: str, offset: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.offset = offset
+
+
+# ---------------------------
+# Sesiones de subida reanudable: <id>.json (metadatos) + <id>.part (datos).
+# El offset es siempre el tamaño real del .part, así que una transferencia
+# cortada se reanuda exactamente donde se quedó.
+# ---------------------------
+def _paths(upload_id: str):
+    base = os.path.join(settings.UPLOAD_SPOOL_DIR, upload_id)
+    return f"{base}.json", f"{base}.part"
+
+
+def _offset(upload_id: str) -> int:
+    _, data_path = _paths(upload_id)
+    return os.path.getsize(data_path) if os.path.exists(data_path) else 0
+
+
+def session_view(session: dict) -> dict:
+    offset = _offset(session["upload_id"])
+    return {
+        "upload_id": session["upload_id"],
+        "filename": session["filename"],
+        "total_size": session["total_size"],
+        "offset": offset,
+        "complete": offset == session["total_size"],
+    }
+
+
+def purge_expired_sessions():
+    if not os.path.isdir(settings.UPLOAD_SPOOL_DIR):
+        return
+    expires = time.time() - settings.UPLOAD_SESSION_TTL_HOURS * 3600
+    for name in os.listdir(settings.UPLOAD_SPOOL_DIR):
+        if not name.endswith(".json"):
+            continue
+        upload_id = name[: -len(".json")]
+        # La última actividad es la última escritura en cualquiera de los dos ficheros
+        last_activity = max(
+            (os.path.getmtime(path) for path in _paths(upload_id) if os.path.exists(path)), default=None
+        )
+        if last_activity is None:  # borrada mientras se recorría el directorio
+            continue
+        in_progress = upload_id in _locks and _locks[upload_id].locked()
+        if last_activity < expires and not in_progress:
+            delete_upload_session(upload_id)
+
+
+def create_upload_session(user_id: str, filename: str, total_size: int) -> dict:
+    if not filename.lower().endswith(".pdf"):
+        raise UploadSessionError(400, "El archivo debe ser un PDF.")
+    if total_size <= 0 or total_size > settings.UPLOAD_MAX_BYTES:
+        raise UploadSessionError(400, f"Tamaño inválido (máximo {settings.UPLOAD_MAX_BYTES} bytes).")
+
+    os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+    purge_expired_sessions()
+    session = {
+        "upload_id": generate(),
+        "user_id": user_id,
+        "filename": os.path.basename(filename),
+        "total_size": total_size,
+        "created_at": time.time(),
+    }
+    meta_path, data_path = _paths(session["upload_id"])
+    open(data_path, "wb").close()
+    with open(meta_path, "w") as f:
+        json.dump(session, f)
+    return session
+
+
+def get_upload_session(upload_id: str, user_id: str) -> dict:
+    meta_path, _ = _paths(upload_id) if UPLOAD_ID_RE.match(upload_id) else (None, None)
+    if not meta_path or not os.path.exists(meta_path):
+        raise UploadSessionError(404, "Sesión de subida no encontrada.")
+    with open(meta_path) as f:
+        session = json.load(f)
+    if session["user_id"] != user_id:
+        raise UploadSessionError(404, "Sesión de subida no encontrada.")
+    return session
+
+
+def parse_content_range(header: Optional[str]):
+    match = CONTENT_RANGE_RE.match(header or "")
+    if not match:
+        raise UploadSessionError(400, "Cabecera Content-Range inválida (bytes inicio-fin/total).")
+    start, end, total = (int(value) for value in match.groups())
+    if end < start:
+        raise UploadSessionError(400, "Cabecera Content-Range inválida (bytes inicio-fin/total).")
+    return start, end, total
+
+
+async def append_range(
+    upload_id: str,
+    user_id: str,
+    content_range: Optional[str],
+    body: AsyncIterator[bytes],
+) -> dict:
+    session = get_upload_session(upload_id, user_id)
+    start, end, total = parse_content_range(content_range)
+    if total != session["total_size"] or end >= total:
+        raise UploadSessionError(400, "El rango no coincide con el tamaño de la sesión.")
+
+    lock = _locks.setdefault(upload_id, asyncio.Lock())
+    if lock.locked():
+        raise UploadSessionError(409, "Ya hay una transferencia en curso para esta sesión.", _offset(upload_id))
+
+    async with lock:
+        offset = _offset(upload_id)
+        if start != offset:
+            raise UploadSessionError(409, "El rango no empieza en el offset actual.", offset)
+
+        _, data_path = _paths(upload_id)
+        expected = end - start + 1
+        written = 0
+        # Se escribe cada bloque según llega: memoria acotada aunque la parte sea grande
+        async with aiofiles.open(data_path, "ab") as f:
+            async for block in body:
+                if written + len(block) > expected:
+                    block = block[: expected - written]
+                await f.write(block)
+                written += len(block)
+                if written == expected:
+                    break
+    return session_view(session)
+
+
+@asynccontextmanager
+async def finalize_upload_session(upload_id: str, user_id: str):
+    # Mantiene el lock de la sesión mientras se ingesta: un segundo finalize
+    # (o un PUT) concurrente recibe 409 en lugar de ingestar dos veces
+    session = get_upload_session(upload_id, user_id)
+    lock = _locks.setdefault(upload_id, asyncio.Lock())
+    if lock.locked():
+        raise UploadSessionError(409, "Ya hay una transferencia o finalización en curso para esta sesión.")
+    async with lock:
+        offset = _offset(upload_id)
+        if offset != session["total_size"]:
+            raise UploadSessionError(409, "La subida no está completa.", offset)
+        _, data_path = _paths(upload_id)
+        with open(data_path, "rb") as f:
+            if f.read(5) != b"%PDF-":
+                raise UploadSessionError(400, "El archivo debe ser un PDF.")
+        yield {**session, "path": data_path}
+
+
+def delete_upload_session(upload_id: str):
+    _locks.pop(upload_id, None)
+    for path in _paths(upload_id):
+        if os.path.exists(path):
+            os.remove(path)
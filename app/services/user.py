@@ -5,6 +5,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.logger import Logger
 from app.models.user import User
+from app.services.audit import ACTION_USER
+from app.services.auth_cache import principal_cache
+from app.services.user_search import user_search_index
+from app.services.http_cache import ME, response_cache
 from app.schemas.user import UserCreate, UserUpdate
 from typing import List, Optional
 
@@ -48,15 +52,16 @@ async def create_user(db: AsyncSession, usuario: UserCreate) -> User:
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    user_search_index.upsert(db_user)
     
     db_log = Logger(
         action=f"User '{db_user.name_complete}' registered.",
         created_at=datetime.now(pytz.utc),
-        user_id=db_user.id
+        user_id=db_user.id,
+        action_type=ACTION_USER
     )
     db.add(db_log)
     await db.commit()
-    await db.refresh(db_log)
     
     return db_user
 
@@ -66,16 +71,19 @@ async def update_user(db: AsyncSession, usuario_id: str, usuario_data: UserUpdat
         for field, value in usuario_data.dict(exclude_unset=True).items():
             setattr(db_user, field, value)        
         await db.commit() 
+        principal_cache.invalidate_user(db_user.id)
+        response_cache.bump(db_user.id, ME)
         await db.refresh(db_user) 
+        user_search_index.upsert(db_user)
         
     db_log = Logger(
         action=f"User '{db_user.name_complete}' updated.",
         created_at=datetime.now(pytz.utc),
-        user_id=db_user.id
+        user_id=db_user.id,
+        action_type=ACTION_USER
     )
     db.add(db_log)
     await db.commit()
-    await db.refresh(db_log)
         
     return db_user
 
@@ -85,16 +93,19 @@ async def deactivate_user(db: AsyncSession, usuario_id: str) -> bool:
         return False  
     db_user.active = 0  
     await db.commit()
+    principal_cache.invalidate_user(db_user.id)
+    response_cache.bump(db_user.id, ME)
     await db.refresh(db_user)
+    user_search_index.remove(db_user.id)
     
     db_log = Logger(
         action=f"User '{db_user.name_complete}' deactivated.",
         created_at=datetime.now(pytz.utc),
-        user_id=db_user.id
+        user_id=db_user.id,
+        action_type=ACTION_USER
     )
     db.add(db_log)
     await db.commit()
-    await db.refresh(db_log)
         
     return True 
 
@@ -104,16 +115,19 @@ async def activate_user(db: AsyncSession, user_id: str) -> bool:
         return False  
     db_user.active = True  
     await db.commit()
+    principal_cache.invalidate_user(db_user.id)
+    response_cache.bump(db_user.id, ME)
     await db.refresh(db_user)
+    user_search_index.upsert(db_user)
     
     db_log = Logger(
         action=f"User '{db_user.name_complete}' activated.",
         created_at=datetime.now(pytz.utc),
-        user_id=db_user.id
+        user_id=db_user.id,
+        action_type=ACTION_USER
     )
     db.add(db_log)
     await db.commit()
-    await db.refresh(db_log)
     
     return True 
 
@@ -122,53 +136,16 @@ async def filter_users(
     limit: int = Query(default=500, ge=1, le=1000),
     offset: int = Query(default=0, ge=0),
     search: Optional[str] = Query(default=None)        
-) -> List[User]:
-    
-    result = await db.execute(select(User).where(User.active == True))
-    all_users = result.scalars().all()
-
-    users_dict = [{
-        'id': user.id,
-        'name_complete': user.name_complete,
-        'email': user.email,
-    } for user in all_users]
-    
-    if search:
-        search_term = search.lower().strip()  
-        filtered_users = []
-        
-        for user in users_dict:
-            name_complete = user['name_complete'].lower()
-            email = user['email'].lower()
-                        
-            # Calcular la puntuación de coincidencia
-            score = 0
-            # Puntuar si el término de búsqueda es un prefijo del nombre completo
-            if name_complete.startswith(search_term):
-                score += 100  # Máxima prioridad para prefijos del nombre completo
-            # Puntuar si el término de búsqueda es un prefijo del first_name o last_name
-            if email.startswith(search_term):
-                score += 50  # Prioridad media para prefijos de first_name o last_name
-                        
-            if score > 0:
-                user['score'] = score
-                filtered_users.append(user)
-        
-        # Ordenar los clientes filtrados por puntuación (de mayor a menor) y luego por nombre completo
-        filtered_users.sort(key=lambda x: (-x['score'], x['name_complete']))
-        users_dict = filtered_users
-    
-        # Aplicar paginación a los resultados ya filtrados
-        total_users = len(users_dict)
-        paginated_users = users_dict[offset:offset + limit]
+) -> dict:
+    # Búsqueda sobre el índice en memoria (app/services/user_search.py): no
+    # recorre ni descifra la tabla en cada llamada
+    await user_search_index.ensure_built(db)
+    total_users, paginated_users = user_search_index.search(search, limit=limit, offset=offset)
 
-        # Retornar el total de clientes y los clientes paginados
-        return {
-            "total": total_users,
-            "users": paginated_users,
-            "limit": limit,
-            "offset": offset,
-        }
-        
-    
-    
\ No newline at end of file
+    # Retornar el total de usuarios y los usuarios paginados
+    return {
+        "total": total_users,
+        "users": paginated_users,
+        "limit": limit,
+        "offset": offset,
+    }
@@ -0,0 +1,176 @@
+import asyncio
+import bisect
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from prometheus_client import Counter, Gauge
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.models.user import User
+
+USER_SEARCH_REBUILDS = Counter(
+    "user_search_rebuilds_total",
+    "Reconstrucciones completas del índice de búsqueda de usuarios.",
+)
+USER_SEARCH_SIZE = Gauge(
+    "user_search_indexed_users",
+    "Usuarios activos en el índice de búsqueda.",
+)
+
+GRAM = 3
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def match_score(term: str, name_complete: str, email: str) -> int:
+    # Misma puntuación que tenía /users/filter: 100 si el término es prefijo,
+    # 50 si aparece en otra posición, sumando nombre y email
+    score = 0
+    for value in (name_complete, email):
+        if value.startswith(term):
+            score += 100
+        elif term in value:
+            score += 50
+    return score
+
+
+class UserEntry:
+    def __init__(self, user_id: str, name_complete: str, email: str):
+        self.id = user_id
+        self.name_complete = name_complete
+        self.email = email
+        self.name_key = name_complete.lower()
+        self.email_key = email.lower()
+        self.grams = trigrams(self.name_key) | trigrams(self.email_key)
+
+    @property
+    def sort_key(self) -> Tuple[str, str]:
+        return self.name_complete, self.id
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "name_complete": self.name_complete, "email": self.email}
+
+
+# ---------------------------
+# Índice en memoria de usuarios activos para /users/filter: trigramas de
+# nombre y email (ya descifrados) -> ids, más una lista ordenada por nombre
+# para paginar sin búsqueda. Se construye una vez desde la base de datos y se
+# mantiene en create/update/deactivate/activate; como cada worker tiene el
+# suyo, se reconstruye cada USER_SEARCH_REFRESH_SECONDS para ver los cambios
+# hechos en otros procesos.
+# ---------------------------
+class UserSearchIndex:
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._entries: Dict[str, UserEntry] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self._ordered: List[Tuple[str, str]] = []
+        self._built_at: Optional[float] = None
+        self._pending: Optional[list] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _add(self, entry: UserEntry):
+        self._remove(entry.id)
+        self._entries[entry.id] = entry
+        for gram in entry.grams:
+            self._grams.setdefault(gram, set()).add(entry.id)
+        bisect.insort(self._ordered, entry.sort_key)
+
+    def _remove(self, user_id: str):
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        for gram in entry.grams:
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(user_id)
+                if not ids:
+                    del self._grams[gram]
+        i = bisect.bisect_left(self._ordered, entry.sort_key)
+        if i < len(self._ordered) and self._ordered[i] == entry.sort_key:
+            del self._ordered[i]
+
+    def upsert(self, user: User):
+        if not user.active:
+            return self.remove(user.id)
+        entry = UserEntry(user.id, user.name_complete, user.email)
+        if self._pending is not None:
+            self._pending.append(("add", entry))
+        # Antes de la primera construcción no hay nada que mantener: la
+        # construcción leerá el usuario de la base de datos
+        if self._built_at is not None:
+            self._add(entry)
+        USER_SEARCH_SIZE.set(len(self._entries))
+
+    def remove(self, user_id: str):
+        if self._pending is not None:
+            self._pending.append(("remove", user_id))
+        self._remove(user_id)
+        USER_SEARCH_SIZE.set(len(self._entries))
+
+    async def ensure_built(self, db: AsyncSession):
+        if self._built_at is not None and time.monotonic() - self._built_at < self.refresh_seconds:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._built_at is not None and time.monotonic() - self._built_at < self.refresh_seconds:
+                return
+            # Los cambios que lleguen durante la lectura se vuelven a aplicar
+            # sobre el índice nuevo
+            self._pending = []
+            try:
+                result = await db.execute(
+                    select(User.id, User.name_complete, User.email).where(User.active == True)
+                )
+                rows = result.all()
+                fresh = UserSearchIndex(self.refresh_seconds)
+                for user_id, name_complete, email in rows:
+                    entry = UserEntry(user_id, name_complete, email)
+                    fresh._entries[user_id] = entry
+                    for gram in entry.grams:
+                        fresh._grams.setdefault(gram, set()).add(user_id)
+                fresh._ordered = sorted(entry.sort_key for entry in fresh._entries.values())
+                for op, value in self._pending:
+                    if op == "add":
+                        fresh._add(value)
+                    else:
+                        fresh._remove(value)
+            finally:
+                self._pending = None
+            self._entries, self._grams, self._ordered = fresh._entries, fresh._grams, fresh._ordered
+            self._built_at = time.monotonic()
+            USER_SEARCH_REBUILDS.inc()
+            USER_SEARCH_SIZE.set(len(self._entries))
+
+    def _candidates(self, term: str) -> List[UserEntry]:
+        if len(term) < GRAM:
+            # Términos de 1-2 caracteres: recorrido en memoria, sin base de datos
+            return list(self._entries.values())
+        sets = sorted((self._grams.get(gram, set()) for gram in trigrams(term)), key=len)
+        ids = set(sets[0]).intersection(*sets[1:]) if sets else set()
+        return [self._entries[user_id] for user_id in ids]
+
+    def search(self, term: Optional[str], limit: int, offset: int) -> Tuple[int, List[dict]]:
+        term = (term or "").lower().strip()
+        if not term:
+            page = self._ordered[offset:offset + limit]
+            return len(self._ordered), [self._entries[user_id].as_dict() for _, user_id in page]
+
+        ranked = []
+        for entry in self._candidates(term):
+            score = match_score(term, entry.name_key, entry.email_key)
+            if score > 0:
+                ranked.append((-score, entry.name_complete, entry.id, entry))
+        ranked.sort(key=lambda item: item[:3])
+        users = []
+        for negative_score, _, _, entry in ranked[offset:offset + limit]:
+            user = entry.as_dict()
+            user["score"] = -negative_score
+            users.append(user)
+        return len(ranked), users
+
+
+user_search_index = UserSearchIndex(settings.USER_SEARCH_REFRESH_SECONDS)
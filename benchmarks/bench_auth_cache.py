@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import statistics
+import time
+from nanoid import generate
+from sqlalchemy import delete
+from starlette.requests import Request
+from app.core.database import async_session, engine
+from app.core.dependencies import get_current_user
+from app.core.security import create_access_token
+from app.models.user import User
+from app.services.auth_cache import principal_cache
+
+# ---------------------------
+# Benchmark de get_current_user contra la base de datos configurada: búsqueda
+# del usuario en cada petición (flujo anterior) frente a la caché de usuarios
+# autenticados. Crea un usuario temporal y lo borra al terminar.
+#   python -m benchmarks.bench_auth_cache --requests 500 --concurrency 10
+# ---------------------------
+
+
+def make_request(token: str) -> Request:
+    cookie = f'access_token="Bearer {token}"'.encode()
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [(b"cookie", cookie)]})
+
+
+async def authenticate(request: Request):
+    # Misma forma que una petición real: una sesión por petición (get_db)
+    async with async_session() as db:
+        return await get_current_user(request, db)
+
+
+async def run_scenario(name: str, ttl: float, request: Request, total: int, concurrency: int) -> dict:
+    principal_cache.ttl = ttl
+    principal_cache.clear()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await authenticate(request)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "mode": name,
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+        "req_per_s": round(total / elapsed, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la caché de usuarios autenticados.")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    email = f"bench-{generate(size=10)}@example.com"
+    async with async_session() as db:
+        user = User(name_complete="Benchmark", email=email, password=generate(), role="User", active=True)
+        db.add(user)
+        await db.commit()
+        user_id = user.id
+
+    request = make_request(create_access_token(data={"sub": email, "role": "User"}))
+    ttl = principal_cache.ttl
+    try:
+        await authenticate(request)  # calentamiento del pool de conexiones
+        print(f"{'mode':<8} {'mean_ms':>8} {'p99_ms':>8} {'req/s':>9}")
+        for name, scenario_ttl in (("db", 0), ("cache", max(ttl, 60))):
+            r = await run_scenario(name, scenario_ttl, request, args.requests, args.concurrency)
+            print(f"{r['mode']:<8} {r['mean_ms']:>8} {r['p99_ms']:>8} {r['req_per_s']:>9}")
+    finally:
+        principal_cache.ttl = ttl
+        async with async_session() as db:
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
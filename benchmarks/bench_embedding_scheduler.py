@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import random
+import time
+import numpy as np
+from benchmarks.pdfgen import random_paragraph
+from app.services.embedding_scheduler import BULK, embedding_scheduler
+from app.services.embeddings import get_embedding_model
+
+# ---------------------------
+# Benchmark de latencia de consultas durante una ingesta masiva:
+# encode directo en hilos (flujo anterior) frente al planificador con prioridades.
+#   python -m benchmarks.bench_embedding_scheduler --docs 20 --chunks 200 --qps 10
+# ---------------------------
+
+
+def percentile(values, pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+async def direct_encode(model, texts, priority):
+    batch_size = 32 if priority == BULK else len(texts)
+    return await asyncio.to_thread(model.encode, texts, batch_size=batch_size)
+
+
+async def scheduled_encode(model, texts, priority):
+    return await embedding_scheduler.encode(texts, priority, model=model)
+
+
+async def run_scenario(name: str, encode, model, documents, queries, qps: float, concurrent_docs: int) -> dict:
+    latencies = []
+    ingest_done = asyncio.Event()
+
+    async def ingest():
+        semaphore = asyncio.Semaphore(concurrent_docs)
+
+        async def one(chunks):
+            async with semaphore:
+                await encode(model, chunks, BULK)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(chunks) for chunks in documents))
+        ingest_done.set()
+        return time.perf_counter() - started
+
+    async def query_load():
+        i = 0
+        while not ingest_done.is_set():
+            started = time.perf_counter()
+            await encode(model, [queries[i % len(queries)]], 0)
+            latencies.append((time.perf_counter() - started) * 1000)
+            i += 1
+            await asyncio.sleep(1 / qps)
+
+    ingest_seconds, _ = await asyncio.gather(ingest(), query_load())
+    chunks = sum(len(chunks) for chunks in documents)
+    return {
+        "mode": name,
+        "queries": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies, default=0.0), 1),
+        "ingest_chunks_per_s": round(chunks / ingest_seconds, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark del planificador de embeddings.")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=200, help="Chunks por documento.")
+    parser.add_argument("--concurrent-docs", type=int, default=4)
+    parser.add_argument("--qps", type=float, default=10, help="Consultas por segundo durante la ingesta.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    documents = [[random_paragraph(rng, 150) for _ in range(args.chunks)] for _ in range(args.docs)]
+    queries = [random_paragraph(rng, 12) for _ in range(50)]
+    model = get_embedding_model()
+    model.encode(queries[:4])  # calentamiento
+
+    print(f"{'mode':<10} {'queries':>7} {'p50_ms':>8} {'p99_ms':>8} {'max_ms':>8} {'ingest_chunks/s':>16}")
+    for name, encode in (("direct", direct_encode), ("scheduler", scheduled_encode)):
+        r = await run_scenario(name, encode, model, documents, queries, args.qps, args.concurrent_docs)
+        print(f"{r['mode']:<10} {r['queries']:>7} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['max_ms']:>8} "
+              f"{r['ingest_chunks_per_s']:>16}")
+    print("Planificador:", embedding_scheduler.snapshot())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
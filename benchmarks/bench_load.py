@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+from nanoid import generate
+from benchmarks.fake_groq import start_fake_groq
+from benchmarks.pdfgen import generate_pdf, random_paragraph
+
+# ---------------------------
+# Prueba de carga de la aplicación completa sin servicios externos: arranca
+# `main:app` con uvicorn en un subproceso, con Qdrant en memoria y un Groq
+# falso (latencia y tokens/s configurables). PostgreSQL es el del .env.
+# Crea usuarios sintéticos, lanza los escenarios login, upload y query con
+# concurrencia fija e informa req/s, p50/p95/p99 (solo respuestas correctas),
+# rechazos de admisión (429/503) y CPU/RSS del servidor. Los límites ADMISSION_*
+# se desactivan salvo con --admission-limits.
+#   python -m benchmarks.bench_load --users 10 --concurrency 10 --requests 200 --uploads 20
+# ---------------------------
+API = "/api/v1"
+# Rechazos de admisión (límite de tasa / cola llena): no cuentan en la latencia
+REJECTED = (429, 503)
+# Sin límites efectivos de admisión: el benchmark mide la aplicación, no los rechazos
+PERMISSIVE_ADMISSION = {
+    f"ADMISSION_{kind}_{name}": value
+    for kind in ("QUERY", "UPLOAD")
+    for name, value in (
+        ("USER_RATE", "1000000"), ("USER_BURST", "1000000"),
+        ("GLOBAL_RATE", "1000000"), ("GLOBAL_BURST", "1000000"),
+        ("USER_CONCURRENCY", "10000"), ("CONCURRENCY", "10000"), ("QUEUE", "10000"),
+    )
+}
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def process_tree(pid: int) -> List[int]:
+    # El servidor y sus hijos (pool de procesos de extracción de PDF)
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def tree_usage(pid: int) -> Dict[str, float]:
+    # CPU (s) y RSS (bytes) sumados de /proc: solo Linux
+    cpu, rss = 0.0, 0
+    for current in process_tree(pid):
+        try:
+            with open(f"/proc/{current}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / CLK_TCK
+            rss += int(fields[21]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            pass
+    return {"cpu": cpu, "rss": rss}
+
+
+class ResourceSampler:
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.max_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.max_rss = max(self.max_rss, tree_usage(self.pid)["rss"])
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.cpu_start = tree_usage(self.pid)["cpu"]
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        usage = tree_usage(self.pid)
+        self.cpu_seconds = usage["cpu"] - self.cpu_start
+        self.max_rss = max(self.max_rss, usage["rss"])
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def summarize(name: str, latencies: List[float], statuses: Counter, sampler: ResourceSampler) -> dict:
+    # `latencies` solo contiene las respuestas 2xx/3xx
+    ok = sum(count for code, count in statuses.items() if 200 <= code < 400)
+    rejected = sum(statuses[code] for code in REJECTED)
+    return {
+        "scenario": name,
+        "requests": sum(statuses.values()),
+        "errors": sum(statuses.values()) - ok - rejected,
+        "rejected": rejected,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "rps": round(ok / sampler.elapsed, 2) if sampler.elapsed else 0.0,
+        "mean_ms": round(statistics.mean(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "cpu_percent": round(sampler.cpu_seconds / sampler.elapsed * 100, 1) if sampler.elapsed else 0.0,
+        "rss_max_mb": round(sampler.max_rss / 1e6, 1),
+    }
+
+
+def print_report(results: List[dict]):
+    print(f"{'scenario':<10} {'reqs':>6} {'errors':>6} {'rejected':>8} {'req/s':>8} {'p50_ms':>9} "
+          f"{'p95_ms':>9} {'p99_ms':>9} {'cpu%':>7} {'rss_mb':>8}")
+    for r in results:
+        print(f"{r['scenario']:<10} {r['requests']:>6} {r['errors']:>6} {r['rejected']:>8} {r['rps']:>8} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['cpu_percent']:>7} {r['rss_max_mb']:>8}")
+        if r["errors"] or r["rejected"]:
+            print(f"{'':<10} códigos: {r['statuses']}")
+
+
+def start_server(port: int, env: Dict[str, str], log_path: Optional[str]) -> subprocess.Popen:
+    log = open(log_path, "ab") if log_path else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env={**os.environ, **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_ready(base_url: str, server: subprocess.Popen, timeout: float):
+    # El arranque carga el modelo de embeddings: puede tardar
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"El servidor terminó con código {server.returncode}")
+            try:
+                if (await client.get("/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+async def run_scenario(
+    name: str,
+    pid: int,
+    total: int,
+    concurrency: int,
+    request: Callable[[int], Awaitable[httpx.Response]],
+) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                status = (await request(i)).status_code
+            except httpx.HTTPError:
+                status = 599
+            if 200 <= status < 400:
+                latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+
+    with ResourceSampler(pid) as sampler:
+        await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize(name, latencies, statuses, sampler)
+
+
+async def create_users(base_url: str, prefix: str, count: int, ids: List[str]) -> List[dict]:
+    # Los ids se guardan según se crean: si el registro falla a medias, los
+    # usuarios ya creados también se borran
+    users = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        for i in range(count):
+            user = {"email": f"{prefix}-{i}@example.com", "password": generate(size=12)}
+            response = await client.post(f"{API}/auth/register", json={
+                "name_complete": f"Load {i}", "role": "User", **user,
+            })
+            response.raise_for_status()
+            ids.append(response.json()["id"])
+            users.append(user)
+    return users
+
+
+async def delete_users(ids: List[str]):
+    # Directamente en la base de datos: no hay endpoint para borrar usuarios.
+    # Por id: el email está cifrado en la columna y no admite LIKE.
+    if not ids:
+        return
+    from sqlalchemy import delete
+    from app.core.database import async_session, engine
+    from app.models import Document, LogDailySummary, Logger, User
+    from app.models.rag import History
+
+    async with async_session() as db:
+        for model in (History, Document, Logger, LogDailySummary):
+            await db.execute(delete(model).where(model.user_id.in_(ids)))
+        await db.execute(delete(User).where(User.id.in_(ids)))
+        await db.commit()
+    await engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con Groq falso y Qdrant en memoria.")
+    parser.add_argument("--scenarios", default="login,upload,query")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="peticiones de login y de query")
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=5, help="páginas de cada PDF sintético")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=250)
+    parser.add_argument("--llm-completion-tokens", type=int, default=150)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=180)
+    parser.add_argument("--server-log", default=None, help="fichero para la salida del servidor")
+    parser.add_argument("--output", default=None, help="guarda los resultados en JSON")
+    parser.add_argument("--keep-data", action="store_true", help="no borra los usuarios sintéticos")
+    parser.add_argument("--admission-limits", action="store_true",
+                        help="usa los límites ADMISSION_* del entorno en vez de desactivarlos")
+    args = parser.parse_args()
+
+    _, groq_url = start_fake_groq(0, args.llm_latency_ms, args.llm_tokens_per_second, args.llm_completion_tokens)
+    server = start_server(args.port, {
+        **({} if args.admission_limits else PERMISSIVE_ADMISSION),
+        "QDRANT_URL": ":memory:",
+        "GROQ_BASE_URL": groq_url,
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY") or "load-test",
+    }, args.server_log)
+    base_url = f"http://127.0.0.1:{args.port}"
+    prefix = f"load-{generate('abcdefghijklmnopqrstuvwxyz0123456789', 8)}"
+    rng = random.Random(0)
+    results, user_ids = [], []
+    try:
+        await wait_ready(base_url, server, args.startup_timeout)
+        users = await create_users(base_url, prefix, args.users, user_ids)
+        limits = httpx.Limits(max_connections=args.concurrency)
+        clients = [httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) for _ in users]
+        try:
+            # Una sesión por usuario: la cookie del login se reutiliza
+            for client, user in zip(clients, users):
+                (await client.post(f"{API}/auth/login", json=user)).raise_for_status()
+
+            scenarios = {
+                "login": (args.requests, lambda i: clients[i % len(clients)].post(
+                    f"{API}/auth/login", json=users[i % len(users)])),
+                "upload": (args.uploads, lambda i: clients[i % len(clients)].post(
+                    f"{API}/rags/upload-document",
+                    files={"file": (f"{prefix}-{i}.pdf", generate_pdf(args.pages, seed=i), "application/pdf")},
+                )),
+                "query": (args.requests, lambda i: clients[i % len(clients)].post(
+                    f"{API}/rags/query", json={"query": random_paragraph(rng, 10)})),
+            }
+            for name in args.scenarios.split(","):
+                total, request = scenarios[name.strip()]
+                results.append(await run_scenario(name.strip(), server.pid, total, args.concurrency, request))
+        finally:
+            for client in clients:
+                await client.aclose()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        if not args.keep_data:
+            await delete_users(user_ids)
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
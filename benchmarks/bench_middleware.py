@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+# Qdrant en memoria y sin Groq real: importar main no necesita servicios externos
+os.environ.setdefault("QDRANT_URL", ":memory:")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from fastapi import FastAPI, HTTPException, Response, status
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.responses import RedirectResponse
+from app.core.middleware import MetricsMiddleware
+from main import add_middlewares
+
+# ---------------------------
+# Micro-benchmark de la pila de middlewares sobre endpoints triviales,
+# llamando a la aplicación ASGI directamente (sin red ni servidor):
+# BaseHTTPMiddleware + SessionMiddleware (pila anterior) frente a la pila
+# actual de ASGI puro de main.add_middlewares.
+#   python -m benchmarks.bench_middleware --requests 5000 --concurrency 50
+# ---------------------------
+
+
+class LegacyAuthRedirectMiddleware(BaseHTTPMiddleware):
+    # Copia del middleware anterior de main.py, solo para comparar
+    async def dispatch(self, request, call_next):
+        try:
+            response = await call_next(request)
+            if response.status_code == status.HTTP_401_UNAUTHORIZED:
+                return RedirectResponse(url="/api/v1/auth/login")
+            return response
+        except HTTPException as ex:
+            if ex.status_code == status.HTTP_401_UNAUTHORIZED:
+                return RedirectResponse(url="/api/v1/auth/login")
+            raise ex
+
+
+def add_routes(app: FastAPI):
+    @app.get("/ping")
+    async def ping():
+        return Response("pong", media_type="text/plain")
+
+    @app.get("/private")
+    async def private():
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+
+
+def legacy_app() -> FastAPI:
+    app = FastAPI()
+    add_routes(app)
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True,
+                       allow_methods=["*"], allow_headers=["*"])
+    app.add_middleware(LegacyAuthRedirectMiddleware)
+    app.add_middleware(SessionMiddleware, secret_key="benchmark")
+    app.add_middleware(MetricsMiddleware)
+    return app
+
+
+def current_app() -> FastAPI:
+    app = FastAPI()
+    add_routes(app)
+    add_middlewares(app)
+    return app
+
+
+async def call(app, path: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"origin", b"http://front.example")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    received = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Como un servidor real: no hay más mensajes hasta que el cliente cierra
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    status_code = 0
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return status_code
+
+
+async def run(app, path: str, total: int, concurrency: int) -> dict:
+    for _ in range(50):
+        await call(app, path)  # calentamiento
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await call(app, path)
+            latencies.append((time.perf_counter() - started) * 1e6)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        "req_per_s": round(total / elapsed),
+        "mean_us": round(statistics.mean(latencies), 1),
+        "status": await call(app, path),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de la pila de middlewares.")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'stack':<10} {'endpoint':<10} {'status':>6} {'req/s':>9} {'mean_us':>9}")
+    for name, app in (("legacy", legacy_app()), ("asgi", current_app())):
+        for path in ("/ping", "/private"):
+            r = await run(app, path, args.requests, args.concurrency)
+            print(f"{name:<10} {path:<10} {r['status']:>6} {r['req_per_s']:>9} {r['mean_us']:>9}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
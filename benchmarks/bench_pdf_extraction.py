@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from benchmarks.pdfgen import generate_pdf
+from app.core.config import settings
+from app.services import pdf_extraction
+
+# ---------------------------
+# Benchmark de extracción de PDFs: motores × modo (secuencial / pool de procesos)
+#   python -m benchmarks.bench_pdf_extraction --docs 5 --pages 40 --tables 20
+# ---------------------------
+
+
+def build_corpus(directory: str, docs: int, pages: int, table_rows: int):
+    paths = []
+    for i in range(docs):
+        path = os.path.join(directory, f"doc_{i}.pdf")
+        with open(path, "wb") as f:
+            f.write(generate_pdf(pages=pages, table_rows=table_rows, seed=i))
+        paths.append(path)
+    return paths
+
+
+async def run_scenario(paths, engine: str, workers: int) -> dict:
+    settings.PDF_EXTRACT_WORKERS = workers
+    pdf_extraction.shutdown_pool()
+    # Calentamiento: arranque de procesos fuera de la medición
+    await pdf_extraction.extract_pages(paths[0], engine)
+
+    timings, pages, chars = [], 0, 0
+    for path in paths:
+        started = time.perf_counter()
+        texts = await pdf_extraction.extract_pages(path, engine)
+        timings.append(time.perf_counter() - started)
+        pages += len(texts)
+        chars += sum(len(text) for text in texts)
+    pdf_extraction.shutdown_pool()
+
+    total = sum(timings)
+    return {
+        "engine": engine,
+        "workers": workers,
+        "docs": len(paths),
+        "pages": pages,
+        "chars": chars,
+        "total_s": round(total, 3),
+        "median_doc_s": round(statistics.median(timings), 3),
+        "pages_per_s": round(pages / total, 1) if total else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de motores de extracción de PDF.")
+    parser.add_argument("--docs", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--tables", type=int, default=20, help="Filas de tabla por página.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--engines", nargs="*", default=None)
+    args = parser.parse_args()
+
+    engines = args.engines or pdf_extraction.available_extractors()
+    with tempfile.TemporaryDirectory() as directory:
+        paths = build_corpus(directory, args.docs, args.pages, args.tables)
+        print(f"{'engine':<10} {'workers':>7} {'pages':>6} {'total_s':>8} {'doc_p50_s':>9} {'pages/s':>8}")
+        for engine in engines:
+            for workers in (0, args.workers):
+                r = await run_scenario(paths, engine, workers)
+                print(f"{r['engine']:<10} {r['workers']:>7} {r['pages']:>6} {r['total_s']:>8} "
+                      f"{r['median_doc_s']:>9} {r['pages_per_s']:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
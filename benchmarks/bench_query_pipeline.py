@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Qdrant en memoria y sin Groq real: el benchmark no necesita servicios externos
+os.environ["QDRANT_URL"] = ":memory:"
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from qdrant_client.models import PointStruct
+from benchmarks.pdfgen import random_paragraph
+from app.services import rag
+
+# ---------------------------
+# Benchmark de /query: etapas en serie (flujo anterior) frente al grafo de
+# etapas concurrente, con LLM falso y Qdrant en memoria.
+#   python -m benchmarks.bench_query_pipeline --queries 30 --db-ms 40 --llm-ms 300
+# ---------------------------
+
+
+class FakeLLM:
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, max_tokens, temperature):
+        time.sleep(self.latency)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Respuesta simulada."))])
+
+
+class FakeSession:
+    # Simula la latencia de PostgreSQL (consulta + descifrado del historial)
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        now = datetime.now()
+        self.rows = [(f"Pregunta {i}", f"Respuesta {i}", now - timedelta(minutes=i)) for i in range(5)]
+
+    async def execute(self, stmt):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(fetchall=lambda: self.rows)
+
+    def add(self, instance):
+        pass
+
+    async def commit(self):
+        await asyncio.sleep(self.latency)
+
+    async def refresh(self, instance):
+        pass
+
+    # process_query abre su propia sesión para el historial (async_session())
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+async def process_query_sequential(query: str, user_id: str, db) -> str:
+    # Mismo trabajo que process_query, pero cada etapa espera a la anterior
+    history = await rag.get_memory_entries(user_id, db)
+    rag.refresh_active_version()
+    vector = (await asyncio.to_thread(rag.get_embedding_model().encode, query)).tolist()
+    results = await rag.query_embedding(vector)
+    prompt, _ = rag.build_prompt(query, history, results["documents"])
+    answer = await asyncio.to_thread(rag.generate_answer, prompt)
+    await rag.add_memory(user_id, query, answer, db)
+    await db.commit()
+    return answer
+
+
+def seed_collection(chunks: int, rng: random.Random):
+    texts = [random_paragraph(rng, 80) for _ in range(chunks)]
+    vectors = rag.get_embedding_model().encode(texts).tolist()
+    rag.qdrant_client.upsert(
+        collection_name=rag.COLLECTION_NAME,
+        points=[
+            PointStruct(id=i, vector=vector, payload={"text": text})
+            for i, (text, vector) in enumerate(zip(texts, vectors))
+        ],
+        wait=True,
+    )
+
+
+async def run_scenario(name: str, func, queries, db) -> dict:
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        await func(query, "benchmark", db)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "mode": name,
+        "queries": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+        "mean_ms": round(statistics.mean(latencies), 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latencia de process_query.")
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks en Qdrant.")
+    parser.add_argument("--db-ms", type=float, default=40, help="Latencia simulada de la BD.")
+    parser.add_argument("--llm-ms", type=float, default=300, help="Latencia simulada del LLM.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Sin los logs del servicio: no se mide la consola
+    logging.getLogger("app").setLevel(logging.ERROR)
+    rng = random.Random(args.seed)
+    rag.client = FakeLLM(args.llm_ms)
+    seed_collection(args.chunks, rng)
+    queries = [random_paragraph(rng, 12) for _ in range(args.queries)]
+    db = FakeSession(args.db_ms)
+    rag.async_session = lambda: db
+
+    # Calentamiento del modelo fuera de la medición
+    await rag.process_query(queries[0], "benchmark", db)
+
+    print(f"{'mode':<12} {'queries':>7} {'p50_ms':>8} {'p95_ms':>8} {'mean_ms':>8}")
+    for name, func in (("sequential", process_query_sequential), ("stage_graph", rag.process_query)):
+        r = await run_scenario(name, func, queries, db)
+        print(f"{r['mode']:<12} {r['queries']:>7} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['mean_ms']:>8}")
+
+    timings = {}
+    await rag.process_query(queries[0], "benchmark", db, timings)
+    print("Etapas (ms):", timings)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+# Qdrant en memoria y sin Groq real: el benchmark no necesita servicios externos
+os.environ.setdefault("QDRANT_URL", ":memory:")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, SearchParams, VectorParams
+from benchmarks.bench_load import percentile
+from benchmarks.pdfgen import random_paragraph
+from app.core.config import settings
+from app.services import rag
+from app.services.embeddings import get_model_spec, load_embedding_model
+from app.services.prompting import assemble_prompt
+
+# ---------------------------
+# Calidad de la recuperación frente a coste: recorre tamaño de chunk,
+# solapamiento, top_k y hnsw_ef sobre un corpus sintético de preguntas y
+# respuestas (cada pregunta tiene un único hecho que la responde, escondido
+# entre párrafos de relleno). Informa recall@k, MRR, vectores, tiempo de
+# ingesta, latencia de búsqueda y tokens del prompt.
+#   python -m benchmarks.bench_retrieval --docs 20 --chunk-sizes 500,1000,2000 --overlaps 0,200 --top-ks 1,3,5
+# Con Qdrant en memoria la búsqueda es exacta: hnsw_ef solo cambia algo con
+# --qdrant-url apuntando a un servidor.
+# ---------------------------
+NAMES = ["Lucía Romero", "Mateo Vidal", "Sofía Navarro", "Hugo Castillo", "Valeria Ortega", "Martín Iglesias",
+         "Daniela Cruz", "Pablo Medina", "Carmen Rubio", "Diego Serrano", "Elena Molina", "Andrés Fuentes"]
+CITIES = ["Valencia", "Bilbao", "Sevilla", "Zaragoza", "Málaga", "Granada", "Oviedo", "Murcia",
+          "Córdoba", "Alicante", "Santander", "Salamanca"]
+
+
+def build_corpus(docs: int, pages: int, facts_per_page: int, seed: int) -> Tuple[List[List[str]], List[dict]]:
+    # Cada hecho tiene un código único de ancho fijo (ninguno es prefijo de
+    # otro): un chunk es relevante si lo contiene
+    rng = random.Random(seed)
+    corpus, questions, used = [], [], set()
+    for _ in range(docs):
+        document = []
+        for _ in range(pages):
+            paragraphs = [random_paragraph(rng, rng.randint(30, 60)) for _ in range(8)]
+            for _ in range(facts_per_page):
+                code = f"{rng.choice(['EXP', 'CTR', 'FAC', 'POL'])}-{rng.randint(10000, 99999)}"
+                if code in used:
+                    continue
+                used.add(code)
+                name, city = rng.choice(NAMES), rng.choice(CITIES)
+                paragraphs.insert(
+                    rng.randint(0, len(paragraphs)),
+                    f"El expediente {code} fue aprobado por {name} en {city}.",
+                )
+                questions.append({"query": f"¿Quién aprobó el expediente {code} y en qué ciudad?", "code": code})
+            document.append("\n\n".join(paragraphs))
+        corpus.append(document)
+    return corpus, questions
+
+
+def rank_of_answer(results: List[str], code: str) -> Optional[int]:
+    for rank, text in enumerate(results, start=1):
+        if code in text:
+            return rank
+    return None
+
+
+def run_config(
+    client: QdrantClient,
+    model,
+    vector_size: int,
+    corpus: List[List[str]],
+    questions: List[dict],
+    query_vectors: List[List[float]],
+    chunk_size: int,
+    overlap: int,
+    top_ks: List[int],
+    hnsw_efs: List[int],
+) -> List[dict]:
+    # Ingesta como la de la aplicación: cada página se divide por separado
+    splitter = rag.make_text_splitter(chunk_size, overlap)
+    started = time.perf_counter()
+    chunks = [chunk for document in corpus for chunk in rag.split_pages_into_chunks(document, splitter)]
+    vectors = model.encode(chunks, batch_size=settings.EMBED_BATCH_SIZE)
+    collection = f"bench_retrieval_{chunk_size}_{overlap}"
+    client.create_collection(collection, vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE))
+    points = [PointStruct(id=i, vector=vector.tolist(), payload={"text": chunk})
+              for i, (chunk, vector) in enumerate(zip(chunks, vectors))]
+    for start in range(0, len(points), settings.QDRANT_UPSERT_BATCH_SIZE):
+        client.upsert(collection, points[start:start + settings.QDRANT_UPSERT_BATCH_SIZE])
+    ingest_seconds = time.perf_counter() - started
+
+    rows = []
+    try:
+        for hnsw_ef in hnsw_efs:
+            params = SearchParams(hnsw_ef=hnsw_ef) if hnsw_ef > 0 else None
+            # Una búsqueda con el top_k mayor sirve para todos los top_k menores
+            latencies, ranked = [], []
+            for vector in query_vectors:
+                search_started = time.perf_counter()
+                hits = client.search(collection, query_vector=vector, limit=max(top_ks), search_params=params)
+                latencies.append((time.perf_counter() - search_started) * 1000)
+                ranked.append([hit.payload["text"] for hit in hits])
+
+            for top_k in top_ks:
+                ranks = [rank_of_answer(results[:top_k], q["code"]) for results, q in zip(ranked, questions)]
+                tokens = [
+                    assemble_prompt(rag.CONTEXT_PROMPT, q["query"], [], results[:top_k], rag.NO_CONTEXT)[2]["total"]
+                    for results, q in zip(ranked, questions)
+                ]
+                rows.append({
+                    "chunk_size": chunk_size,
+                    "overlap": overlap,
+                    "top_k": top_k,
+                    "hnsw_ef": hnsw_ef,
+                    "vectors": len(chunks),
+                    "ingest_s": round(ingest_seconds, 2),
+                    "recall": round(sum(rank is not None for rank in ranks) / len(ranks), 3),
+                    "mrr": round(sum(1 / rank for rank in ranks if rank) / len(ranks), 3),
+                    "search_p50_ms": round(percentile(latencies, 50), 2),
+                    "search_p95_ms": round(percentile(latencies, 95), 2),
+                    "prompt_tokens": round(statistics.mean(tokens), 1),
+                })
+    finally:
+        client.delete_collection(collection)
+    return rows
+
+
+def int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calidad de la recuperación frente a coste (chunking y top_k).")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--facts-per-page", type=int, default=2)
+    parser.add_argument("--max-questions", type=int, default=200)
+    parser.add_argument("--chunk-sizes", type=int_list, default=[500, 1000, 2000])
+    parser.add_argument("--overlaps", type=int_list, default=[0, 200])
+    parser.add_argument("--top-ks", type=int_list, default=[1, 3, 5, 10])
+    parser.add_argument("--hnsw-efs", type=int_list, default=[0], help="0 = valor por defecto de la colección")
+    parser.add_argument("--model-version", default=settings.EMBEDDING_MODEL_VERSION)
+    parser.add_argument("--qdrant-url", default=":memory:")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="guarda los resultados en JSON")
+    args = parser.parse_args()
+
+    corpus, questions = build_corpus(args.docs, args.pages, args.facts_per_page, args.seed)
+    questions = questions[:args.max_questions]
+    model = load_embedding_model(args.model_version)
+    client = QdrantClient(args.qdrant_url)
+
+    # Los vectores de las preguntas no dependen del chunking: se calculan una vez
+    embed_latencies, query_vectors = [], []
+    for question in questions:
+        started = time.perf_counter()
+        query_vectors.append(model.encode([question["query"]])[0].tolist())
+        embed_latencies.append((time.perf_counter() - started) * 1000)
+    print(f"{len(questions)} preguntas sobre {args.docs} documentos de {args.pages} páginas "
+          f"(modelo {args.model_version}; embedding de la pregunta p50 {percentile(embed_latencies, 50):.2f} ms)")
+
+    rows = []
+    for chunk_size in args.chunk_sizes:
+        for overlap in args.overlaps:
+            if overlap >= chunk_size:
+                continue
+            rows.extend(run_config(
+                client, model, get_model_spec(args.model_version)["size"], corpus, questions, query_vectors,
+                chunk_size, overlap, args.top_ks, args.hnsw_efs,
+            ))
+
+    columns = ["chunk_size", "overlap", "top_k", "hnsw_ef", "vectors", "ingest_s", "recall", "mrr",
+               "search_p50_ms", "search_p95_ms", "prompt_tokens"]
+    print(" ".join(f"{column:>13}" for column in columns))
+    for row in rows:
+        print(" ".join(f"{row[column]:>13}" for column in columns))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
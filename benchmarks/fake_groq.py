@@ -0,0 +1,95 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+# ---------------------------
+# Servidor falso de la API de Groq (chat.completions) para pruebas de carga:
+# responde tras `latency_ms` + `completion_tokens / tokens_per_second`.
+# La aplicación lo usa con GROQ_BASE_URL=http://127.0.0.1:<puerto>.
+#   python -m benchmarks.fake_groq --port 8090 --latency-ms 300 --tokens-per-second 250
+# ---------------------------
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    latency_ms = 300.0
+    tokens_per_second = 250.0
+    completion_tokens = 150
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+        prompt = " ".join(str(message.get("content", "")) for message in request.get("messages", []))
+        completion = min(self.completion_tokens, request.get("max_tokens") or self.completion_tokens)
+        delay = self.latency_ms / 1000
+        if self.tokens_per_second > 0:
+            delay += completion / self.tokens_per_second
+        time.sleep(delay)
+
+        prompt_tokens = max(1, len(prompt) // 4)
+        body = json.dumps({
+            "id": f"chatcmpl-fake-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(["respuesta"] * completion)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion,
+                "total_tokens": prompt_tokens + completion,
+            },
+        }).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_groq(
+    port: int = 0,
+    latency_ms: float = 300,
+    tokens_per_second: float = 250,
+    completion_tokens: int = 150,
+) -> Tuple[ThreadingHTTPServer, str]:
+    # En un hilo del proceso que lo lanza; devuelve el servidor y su URL base
+    handler = type("Handler", (FakeGroqHandler,), {
+        "latency_ms": latency_ms,
+        "tokens_per_second": tokens_per_second,
+        "completion_tokens": completion_tokens,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-groq", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso de Groq para pruebas de carga.")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-second", type=float, default=250)
+    parser.add_argument("--completion-tokens", type=int, default=150)
+    args = parser.parse_args()
+
+    server, url = start_fake_groq(args.port, args.latency_ms, args.tokens_per_second, args.completion_tokens)
+    print(f"Groq falso en {url} (GROQ_BASE_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import random
+from typing import List, Optional
+
+# ---------------------------
+# Generador mínimo de PDFs sintéticos (sin dependencias) para benchmarks
+# ---------------------------
+WORDS = (
+    "documento contrato cliente factura servicio sistema consulta manual "
+    "capítulo sección tabla resultado análisis proceso usuario fecha informe "
+    "política seguridad acceso registro versión anexo cláusula pago plazo"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def random_paragraph(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def page_stream(lines: List[str], table_rows: int = 0, rng: Optional[random.Random] = None) -> bytes:
+    ops = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+    for line in lines:
+        ops.append(f"({_escape(line.encode('latin-1', 'replace').decode('latin-1'))}) '")
+    ops.append("ET")
+    # Tablas: una rejilla de celdas posicionadas una a una (costosas de extraer)
+    rng = rng or random.Random(0)
+    for row in range(table_rows):
+        y = 400 - row * 14
+        for col in range(6):
+            x = 50 + col * 85
+            ops.append(f"{x} {y} 85 14 re S")
+            ops.append(f"BT /F1 8 Tf {x + 2} {y + 4} Td ({rng.choice(WORDS)} {rng.randint(0, 9999)}) Tj ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def build_pdf(pages: List[bytes]) -> bytes:
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # /Pages se completa al final
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for stream in pages:
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def generate_pdf(pages: int = 10, lines_per_page: int = 50, table_rows: int = 0, seed: int = 0,
+                 page_texts: Optional[List[str]] = None) -> bytes:
+    rng = random.Random(seed)
+    streams = []
+    for page in range(pages):
+        if page_texts is not None:
+            text = page_texts[page]
+            lines = [text[i:i + 90] for i in range(0, len(text), 90)]
+        else:
+            lines = [random_paragraph(rng, 12) for _ in range(lines_per_page)]
+        streams.append(page_stream(lines, table_rows, rng))
+    return build_pdf(streams)
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+import httpx
+from nanoid import generate
+from benchmarks.bench_load import (
+    API, PERMISSIVE_ADMISSION, create_users, delete_users, percentile, start_server, wait_ready,
+)
+from benchmarks.fake_groq import start_fake_groq
+from benchmarks.pdfgen import generate_pdf, random_paragraph
+
+# ---------------------------
+# Reproduce un fichero de TRAFFIC_CAPTURE_FILE contra una instancia (o una
+# local con Groq falso y Qdrant en memoria) respetando los tiempos entre
+# peticiones, a 1x o acelerado, y compara las distribuciones de latencia
+# por ruta entre dos ejecuciones:
+#   python -m benchmarks.replay_traffic run captura.jsonl --speed 5 --output nueva.json
+#   python -m benchmarks.replay_traffic run captura.jsonl --target https://staging... --output nueva.json
+#   python -m benchmarks.replay_traffic compare base.json nueva.json
+# Solo se reproducen login, consultas, lotes, subidas y los GET sin parámetros
+# de ruta; el resto se cuenta como omitido.
+# ---------------------------
+LOGIN = f"{API}/auth/login"
+QUERY = f"{API}/rags/query"
+QUERY_BATCH = f"{API}/rags/query/batch"
+UPLOAD = f"{API}/rags/upload-document"
+
+
+def load_capture(path: str, limit: Optional[int]) -> List[dict]:
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    records.sort(key=lambda record: record["t"])
+    return records[:limit] if limit else records
+
+
+def synthetic_text(rng: random.Random, chars: int) -> str:
+    text = ""
+    while len(text) < max(1, chars):
+        text += random_paragraph(rng, 12) + " "
+    return text[:max(1, chars)]
+
+
+class PayloadBuilder:
+    # Cuerpos sintéticos con la forma capturada; se generan antes de empezar
+    def __init__(self, seed: int, max_pdf_pages: int):
+        self.rng = random.Random(seed)
+        self.max_pdf_pages = max_pdf_pages
+        self.bytes_per_page = len(generate_pdf(2)) / 2
+        self.uploads = 0
+
+    def build(self, record: dict) -> Optional[Tuple[str, str, dict]]:
+        method, route = record["m"], record["r"]
+        if method == "POST" and route == LOGIN:
+            return method, route, {}
+        if method == "POST" and route == QUERY:
+            return method, route, {"json": {"query": synthetic_text(self.rng, record.get("q", 40))}}
+        if method == "POST" and route == QUERY_BATCH:
+            count = max(1, record.get("n", 1))
+            chars = record.get("q", 40 * count) // count
+            return method, route, {"json": {"queries": [synthetic_text(self.rng, chars) for _ in range(count)]}}
+        if method == "POST" and route == UPLOAD:
+            size = record.get("f") or record.get("in", 0)
+            pages = min(self.max_pdf_pages, max(1, round(size / self.bytes_per_page)))
+            self.uploads += 1
+            pdf = generate_pdf(pages, seed=self.rng.randint(0, 2**31))
+            return method, route, {"files": {"file": (f"replay-{self.uploads}.pdf", pdf, "application/pdf")}}
+        if method == "GET" and "{" not in route:
+            return method, route, {}
+        return None
+
+
+def is_ok(status) -> bool:
+    return 200 <= int(status) < 400
+
+
+def route_stats(latencies: Dict[str, List[float]], statuses: Dict[str, Counter]) -> Dict[str, dict]:
+    # `latencies` solo contiene las respuestas correctas; el resto va en `errors`
+    stats = {}
+    for route in sorted(statuses):
+        values = latencies.get(route, [])
+        errors = sum(count for code, count in statuses[route].items() if not is_ok(code))
+        stats[route] = {
+            "requests": sum(statuses[route].values()),
+            "errors": errors,
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+        }
+    return stats
+
+
+async def replay(args) -> dict:
+    records = load_capture(args.capture, args.limit)
+    if not records:
+        raise SystemExit("La captura está vacía.")
+    builder = PayloadBuilder(args.seed, args.max_pdf_pages)
+    planned, skipped = [], Counter()
+    captured_latencies, captured_statuses = defaultdict(list), defaultdict(Counter)
+    for record in records:
+        request = builder.build(record)
+        if request is None:
+            skipped[f"{record['m']} {record['r']}"] += 1
+            continue
+        planned.append((record, request))
+        key = f"{record['m']} {record['r']}"
+        if is_ok(record["s"]):
+            captured_latencies[key].append(record["ms"])
+        captured_statuses[key][str(record["s"])] += 1
+
+    buckets = sorted({record["u"] for record, _ in planned if "u" in record})
+    server, base_url = None, args.target
+    prefix = f"replay-{generate('abcdefghijklmnopqrstuvwxyz0123456789', 8)}"
+    if base_url is None:
+        _, groq_url = start_fake_groq(0, args.llm_latency_ms, args.llm_tokens_per_second, args.llm_completion_tokens)
+        # Sin límites de admisión: a --speed > 1 convertirían los 200 capturados en 429
+        server = start_server(args.port, {
+            **({} if args.admission_limits else PERMISSIVE_ADMISSION),
+            "QDRANT_URL": ":memory:",
+            "GROQ_BASE_URL": groq_url,
+            "GROQ_API_KEY": "replay",
+        }, args.server_log)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    latencies, statuses = defaultdict(list), defaultdict(Counter)
+    max_lag, user_ids = 0.0, []
+    try:
+        if server is not None:
+            await wait_ready(base_url, server, args.startup_timeout)
+        # Un usuario sintético por cubo capturado (hasta --max-users)
+        users = await create_users(base_url, prefix, max(1, min(len(buckets), args.max_users)), user_ids)
+        user_of_bucket = {bucket: i % len(users) for i, bucket in enumerate(buckets)}
+        clients = [httpx.AsyncClient(base_url=base_url, timeout=args.timeout) for _ in users]
+        try:
+            for client, user in zip(clients, users):
+                (await client.post(LOGIN, json=user)).raise_for_status()
+
+            async def send(index: int, record: dict, request: Tuple[str, str, dict]):
+                method, route, kwargs = request
+                user_index = user_of_bucket.get(record.get("u"), index % len(users))
+                if route == LOGIN:
+                    kwargs = {"json": users[user_index]}
+                key = f"{method} {route}"
+                started = time.perf_counter()
+                try:
+                    status = (await clients[user_index].request(method, route, **kwargs)).status_code
+                except httpx.HTTPError:
+                    status = 599
+                if is_ok(status):
+                    latencies[key].append((time.perf_counter() - started) * 1000)
+                statuses[key][str(status)] += 1
+
+            # Bucle abierto: cada petición sale a su hora, sin esperar a las anteriores
+            first, started, tasks = planned[0][0]["t"], time.perf_counter(), []
+            for index, (record, request) in enumerate(planned):
+                due = (record["t"] - first) / args.speed
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+                tasks.append(asyncio.create_task(send(index, record, request)))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+        finally:
+            for client in clients:
+                await client.aclose()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        # También con --target: los usuarios sintéticos se borran de la base de
+        # datos del .env, que debe ser la de esa instancia
+        if not args.keep_data:
+            await delete_users(user_ids)
+
+    return {
+        "capture": args.capture,
+        "target": args.target or "local",
+        "speed": args.speed,
+        "requests": len(planned),
+        "skipped": dict(skipped),
+        "seconds": round(elapsed, 2),
+        "max_dispatch_lag_ms": round(max_lag * 1000, 2),
+        "routes": route_stats(latencies, statuses),
+        "captured": route_stats(captured_latencies, captured_statuses),
+    }
+
+
+def print_routes(title: str, routes: Dict[str, dict]):
+    print(title)
+    print(f"  {'route':<40} {'reqs':>6} {'errors':>6} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}")
+    for route, r in routes.items():
+        print(f"  {route:<40} {r['requests']:>6} {r['errors']:>6} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+
+
+def compare(baseline: dict, candidate: dict):
+    print(f"{'route':<40} {'metric':>7} {'base_ms':>9} {'new_ms':>9} {'cambio':>8}")
+    for route in sorted(set(baseline["routes"]) | set(candidate["routes"])):
+        base, new = baseline["routes"].get(route), candidate["routes"].get(route)
+        if base is None or new is None:
+            print(f"{route:<40} {'solo en ' + ('nueva' if base is None else 'base'):>27}")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            change = (new[metric] - base[metric]) / base[metric] * 100 if base[metric] else 0.0
+            print(f"{route:<40} {metric[:3]:>7} {base[metric]:>9} {new[metric]:>9} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce tráfico capturado y compara latencias.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="reproduce una captura")
+    run.add_argument("capture")
+    run.add_argument("--target", default=None, help="URL base; sin ella se arranca una instancia local")
+    run.add_argument("--speed", type=float, default=1.0, help="2 = el doble de rápido que la captura")
+    run.add_argument("--limit", type=int, default=None, help="solo las primeras N peticiones")
+    run.add_argument("--max-users", type=int, default=50)
+    run.add_argument("--max-pdf-pages", type=int, default=200)
+    run.add_argument("--timeout", type=float, default=120)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--llm-latency-ms", type=float, default=300)
+    run.add_argument("--llm-tokens-per-second", type=float, default=250)
+    run.add_argument("--llm-completion-tokens", type=int, default=150)
+    run.add_argument("--port", type=int, default=8766)
+    run.add_argument("--startup-timeout", type=float, default=180)
+    run.add_argument("--server-log", default=None)
+    run.add_argument("--output", default=None, help="guarda los resultados en JSON")
+    run.add_argument("--keep-data", action="store_true", help="no borra los usuarios sintéticos")
+    run.add_argument("--admission-limits", action="store_true",
+                     help="instancia local con los límites ADMISSION_* del entorno")
+    run.add_argument("--baseline", default=None, help="resultados JSON de otra versión para comparar")
+
+    diff = commands.add_parser("compare", help="compara dos resultados JSON")
+    diff.add_argument("baseline")
+    diff.add_argument("candidate")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline) as f, open(args.candidate) as g:
+            compare(json.load(f), json.load(g))
+        return
+
+    result = asyncio.run(replay(args))
+    print(f"{result['requests']} peticiones en {result['seconds']} s (x{args.speed}); "
+          f"retraso máximo de envío {result['max_dispatch_lag_ms']} ms; omitidas: {result['skipped'] or 0}")
+    print_routes("Reproducción:", result["routes"])
+    print_routes("Captura original:", result["captured"])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
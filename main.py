@@ -1,33 +1,55 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import RedirectResponse
-from starlette.middleware.sessions import SessionMiddleware
 from app.core.database import async_session
 from app.api.auth import router as auth_router
 from app.api.user import router as user_router
 from app.api.core import router as logger_router
 from app.api.rag import router as rag_router
+from app.api.metrics import router as metrics_router
 
 from app.services.user import get_user_by_email, create_user, get_user_by_email
 from app.schemas.user import UserCreate
 from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.core.middleware import (
+    AuthRedirectMiddleware,
+    MetricsMiddleware,
+    TraceHeadersMiddleware,
+    TrafficCaptureMiddleware,
+    UploadAdmissionMiddleware,
+)
+from app.services.pdf_extraction import shutdown_pool
+from app.services.audit import start_audit_maintenance, stop_audit_maintenance
+from app.services.traffic_capture import traffic_recorder
 
-class AuthRedirectMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        try:
-            response = await call_next(request)
-            if response.status_code == status.HTTP_401_UNAUTHORIZED:
-                return RedirectResponse(url="/api/v1/auth/login")  
-            return response
-        except HTTPException as ex:
-            if ex.status_code == status.HTTP_401_UNAUTHORIZED:
-                return RedirectResponse(url="/api/v1/auth/login")  
-            raise ex
+def add_middlewares(_app: FastAPI):
+    # Todos son ASGI puros. Ninguna ruta usa request.session: no hay
+    # SessionMiddleware global; una ruta que lo necesite debe montarse como
+    # sub-aplicación con su propio SessionMiddleware.
+    # El primero en añadirse es el más interno: los rechazos de admisión
+    # llevan las cabeceras CORS
+    _app.add_middleware(UploadAdmissionMiddleware)
+    _app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Server-Timing", "X-Profile-Id"],
+    )
+    
+    _app.add_middleware(TraceHeadersMiddleware)
+    _app.add_middleware(AuthRedirectMiddleware)
+
+    if traffic_recorder.enabled:
+        _app.add_middleware(TrafficCaptureMiddleware)
+
+    # El último en añadirse es el más externo: mide también los redirects
+    _app.add_middleware(MetricsMiddleware)
 
 
 def get_app() -> FastAPI:
+    setup_logging()
     _app = FastAPI(
         title="RAG System",
     )
@@ -36,18 +58,9 @@ def get_app() -> FastAPI:
     _app.include_router(user_router, prefix="/api/v1/users", tags=["Users"])
     _app.include_router(logger_router, prefix="/api/v1/loggers", tags=["Logs"])
     _app.include_router(rag_router, prefix="/api/v1/rags", tags=["RAGs"])
+    _app.include_router(metrics_router, tags=["Metrics"])
 
-    _app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
-    
-    _app.add_middleware(AuthRedirectMiddleware)
-    
-    _app.add_middleware(SessionMiddleware, secret_key=settings.DB_SECRET_KEY)
+    add_middlewares(_app)
 
     return _app
 
@@ -66,12 +79,16 @@ async def on_startup():
                 role="Admin"
             )
             await create_user(db, admin_user)  
+    start_audit_maintenance()
              
     
             
 @app.on_event("shutdown")
 async def shutdown():
+    stop_audit_maintenance()
+    traffic_recorder.close()
     await async_session.close_all()
+    shutdown_pool()
 
 if __name__ == "__main__":
     import uvicorn